@@ -189,7 +189,7 @@ class SpotifyTokensTestCase(TestCase):
 
         mock_load_dotenv.assert_called_once()
         mock_post.assert_called_once_with(
-            'https://accounts.spotify.com/api/tokens',
+            'https://accounts.spotify.com/api/token',
             data={
                 'grant_type': 'refresh_token',
                 'refresh_token': refresh_token,
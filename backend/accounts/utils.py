@@ -9,10 +9,12 @@ Functions:
     - update_or_create_user_tokens: Update or create Spotify tokens for a user in the database.
     - is_spotify_authenticated: Check if a user is authenticated with Spotify.
     - refresh_spotify_token: Refresh a user's Spotify access token using their refresh token.
+    - spotify_accounts_url: Build a URL on Spotify's accounts service (SPOTIFY_ACCOUNTS_BASE_URL).
 """
 from datetime import timedelta
 import os
 import secrets
+from django.conf import settings
 from django.utils import timezone
 from dotenv import load_dotenv
 from requests import post
@@ -115,7 +117,7 @@ def refresh_spotify_token(username):
     if not client_id or not client_secret:
         raise TypeError("SET UP CLIENT ENV VARIABLES")
 
-    response = post('https://accounts.spotify.com/api/tokens', data={
+    response = post(spotify_accounts_url('/api/token'), data={
         'grant_type': 'refresh_token',
         'refresh_token': refresh_token,
         'client_id': client_id,
@@ -131,6 +133,16 @@ def refresh_spotify_token(username):
                                  token_type=token_type, refresh_token=refresh_token,
                                  expires_in=expires_in)
 
+def spotify_accounts_url(path):
+    """
+    Build the URL of an endpoint of Spotify's accounts service, e.g. '/api/token'.
+
+    The service's address is the SPOTIFY_ACCOUNTS_BASE_URL setting, so that the OAuth flow
+    can run against the local stand-in (manage.py run_spotify_standin).
+    """
+    base_url = getattr(settings, 'SPOTIFY_ACCOUNTS_BASE_URL', 'https://accounts.spotify.com')
+    return f"{base_url.rstrip('/')}/{path.lstrip('/')}"
+
 def generate_state():
     '''Generates state for Spotify Encryption for more security'''
     return secrets.token_urlsafe(16)
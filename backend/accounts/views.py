@@ -29,7 +29,8 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from requests import Request, post
-from .utils import update_or_create_user_tokens, is_spotify_authenticated, generate_state, delete_user_data
+from .utils import (update_or_create_user_tokens, is_spotify_authenticated, generate_state,
+                    delete_user_data, spotify_accounts_url)
 
 from .forms import LoginForm, RegisterForm
 
@@ -78,7 +79,7 @@ class AuthURL(APIView):
         state = generate_state()
         request.session['spotify_auth_state'] = state
 
-        url = Request('GET', 'https://accounts.spotify.com/authorize', params={
+        url = Request('GET', spotify_accounts_url('/authorize'), params={
             'scope': scope,
             'response_type': 'code',
             'redirect_uri': redirect_uri,
@@ -122,7 +123,7 @@ def spotify_callback(request, format=None):
     if not code:
         return HttpResponse("Authentication Failed: Missing code parameter")
 
-    response = post('https://accounts.spotify.com/api/token', data={
+    response = post(spotify_accounts_url('/api/token'), data={
         'grant_type': 'authorization_code',
         'code': code,
         'redirect_uri': os.getenv('REDIRECT_URI'),
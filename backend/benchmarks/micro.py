@@ -0,0 +1,277 @@
+"""
+Microbenchmarks of the pure-Python hot paths of spotify_data: genre counting, quirkiest
+artists, list interleaving for duo wraps, snapshot projection and the model serializers.
+
+Every case runs over synthetic payloads with the full Spotify object shapes (the
+catalog of the Spotify stand-in, spotify_data/standins/spotify), shuffled, at several
+sizes from a realistic 20 items up to 10,000. Each measurement times enough calls to
+take --min-time seconds, repeated --repeat times; the fastest repeat is what is
+compared, since it is the least disturbed by the rest of the machine.
+
+Results can be saved as a baseline and later runs compared with it: a case whose time
+per call grew by more than --threshold (25% by default) is flagged as a regression and
+the script exits with status 1. Timings depend on the machine and Python version, so
+compare runs made on the same host.
+
+Usage (from backend/):
+    python benchmarks/micro.py --save-baseline          # writes benchmarks/baselines/micro.json
+    python benchmarks/micro.py --compare                # compares with it
+    python benchmarks/micro.py --only get_top_genres --sizes 20,10000 --json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotify_wrapper.settings')
+
+import django  # pylint: disable=wrong-import-position
+django.setup()
+
+# pylint: disable=wrong-import-position
+from django.http import JsonResponse
+from spotify_data.models import SpotifyUser, SpotifyWrapped
+from spotify_data.serializers import SpotifyUserSerializer, SpotifyWrappedSerializer
+from spotify_data.standins.spotify import SpotifyCatalog
+from spotify_data.utils import (TERMS, alternate_lists, build_spotify_user_snapshot,
+                                get_quirkiest_artists, get_top_genres)
+
+DEFAULT_SIZES = (20, 100, 1000, 10000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines',
+                                'micro.json')
+PAST_ROASTS = 5
+
+
+class Payloads:
+    """
+    Shuffled artists and tracks of a stand-in catalog, and the snapshot, wrap and user
+    built from them, at a given number of items.
+    """
+
+    def __init__(self, largest):
+        catalog = SpotifyCatalog(artists=largest, tracks=largest)
+        rng = random.Random(0)
+        self.artists = rng.sample(catalog.artists, largest)
+        self.tracks = rng.sample(catalog.tracks, largest)
+        self.profile = {'id': 'benchmark', 'email': 'benchmark@example.com',
+                        'images': [{'url': 'https://i.scdn.co/image/benchmark'}]}
+
+    def term_items(self, size):
+        """The top-items lists of every term as fetched from Spotify."""
+        items = {}
+        for term in TERMS:
+            items[f'artists_{term}'] = self.artists[:size]
+            items[f'tracks_{term}'] = self.tracks[:size]
+        return items
+
+    def snapshot(self, size):
+        """The SpotifyUser fields stored for `size` items per list."""
+        return build_spotify_user_snapshot(self.profile, self.term_items(size))
+
+    def wrap(self, size):
+        """An (unsaved) SpotifyWrapped with `size` artists and tracks."""
+        snapshot = self.snapshot(size)
+        return SpotifyWrapped(id=1, user='benchmark', term_selection='0',
+                              favorite_artists=snapshot['favorite_artists_short'],
+                              favorite_tracks=snapshot['favorite_tracks_short'],
+                              favorite_genres=snapshot['favorite_genres_short'],
+                              quirkiest_artists=snapshot['quirkiest_artists_short'],
+                              llama_description='You dress like a playlist.',
+                              slide_texts={'artists': ['text'] * 5, 'quirky': ['text']})
+
+    def user(self, size):
+        """An (unsaved) SpotifyUser with `size` items per list and PAST_ROASTS past wraps."""
+        wrap = SpotifyWrappedSerializer(self.wrap(size)).data
+        return SpotifyUser(id=1, user_id=1, display_name='benchmark',
+                           past_roasts=[wrap] * PAST_ROASTS, **self.snapshot(size))
+
+
+def case_get_top_genres(payloads, size):
+    """utils.get_top_genres over `size` full artist objects."""
+    artists = payloads.artists[:size]
+    return lambda: get_top_genres(artists)
+
+
+def case_get_quirkiest_artists(payloads, size):
+    """utils.get_quirkiest_artists over `size` full artist objects."""
+    artists = payloads.artists[:size]
+    return lambda: get_quirkiest_artists(artists)
+
+
+def case_alternate_lists(payloads, size):
+    """utils.alternate_lists interleaving two lists of `size` tracks."""
+    first, second = payloads.tracks[:size], payloads.tracks[-size:]
+    return lambda: alternate_lists(first, second, size, size)
+
+
+def case_build_snapshot(payloads, size):
+    """utils.build_spotify_user_snapshot projecting three terms of `size` artists and tracks."""
+    term_items = payloads.term_items(size)
+    return lambda: build_spotify_user_snapshot(payloads.profile, term_items)
+
+
+def case_spotify_wrapped_serializer(payloads, size):
+    """SpotifyWrappedSerializer(wrap).data for a wrap of `size` artists and tracks."""
+    wrap = payloads.wrap(size)
+    return lambda: SpotifyWrappedSerializer(wrap).data
+
+
+def case_spotify_user_serializer(payloads, size):
+    """SpotifyUserSerializer(user).data for a user with `size` items per list."""
+    user = payloads.user(size)
+    return lambda: SpotifyUserSerializer(user).data
+
+
+def case_spotify_user_response(payloads, size):
+    """The updateuser response: the serialized user encoded by JsonResponse."""
+    user = payloads.user(size)
+    return lambda: JsonResponse({'spotify_user': SpotifyUserSerializer(user).data})
+
+
+CASES = {
+    'get_top_genres': case_get_top_genres,
+    'get_quirkiest_artists': case_get_quirkiest_artists,
+    'alternate_lists': case_alternate_lists,
+    'build_spotify_user_snapshot': case_build_snapshot,
+    'SpotifyWrappedSerializer': case_spotify_wrapped_serializer,
+    'SpotifyUserSerializer': case_spotify_user_serializer,
+    'spotify_user_response': case_spotify_user_response,
+}
+
+
+def measure(function, repeat, min_time):
+    """
+    Time `function`: find how many calls take at least `min_time` seconds, then time
+    that many calls `repeat` times.
+
+    Returns:
+        Dictionary with the fastest and median time per call in microseconds and the
+        number of calls per repeat.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    times = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {'min_us': round(min(times), 3), 'median_us': round(statistics.median(times), 3),
+            'calls': number}
+
+
+def run(names, sizes, repeat, min_time):
+    """Measure every case at every size; results are keyed 'name[size]'."""
+    payloads = Payloads(max(sizes))
+    results = {}
+    for name in names:
+        for size in sizes:
+            results[f'{name}[{size}]'] = measure(CASES[name](payloads, size), repeat, min_time)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline's.
+
+    Returns:
+        Dictionary of case to {'baseline_us', 'ratio', 'status'}, where status is
+        'regression' if the case got slower by more than `threshold`, 'improvement' if
+        it got faster by more than that, 'new' if the baseline lacks it, and 'ok'.
+    """
+    comparison = {}
+    for case, result in results.items():
+        before = baseline.get(case)
+        if before is None:
+            comparison[case] = {'baseline_us': None, 'ratio': None, 'status': 'new'}
+            continue
+        ratio = result['min_us'] / before['min_us'] if before['min_us'] else float('inf')
+        status = ('regression' if ratio > 1 + threshold else
+                  'improvement' if ratio < 1 / (1 + threshold) else 'ok')
+        comparison[case] = {'baseline_us': before['min_us'], 'ratio': round(ratio, 3),
+                            'status': status}
+    return comparison
+
+
+def load_baseline(path):
+    """The results saved in a baseline file."""
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)['results']
+
+
+def save_baseline(path, results, sizes):
+    """Write results, with the Python version and machine they were measured on."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump({
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'sizes': list(sizes),
+            'results': results,
+        }, baseline, indent=2)
+        baseline.write('\n')
+
+
+def print_table(results, comparison):
+    """Print the results, with the baseline and ratio when comparing."""
+    header = f"{'case':<40} {'min us':>12} {'median us':>12}"
+    if comparison:
+        header += f" {'baseline us':>12} {'ratio':>7}  status"
+    print(header)
+    for case, result in results.items():
+        line = f"{case:<40} {result['min_us']:>12.2f} {result['median_us']:>12.2f}"
+        if comparison:
+            entry = comparison[case]
+            baseline = '-' if entry['baseline_us'] is None else f"{entry['baseline_us']:.2f}"
+            ratio = '-' if entry['ratio'] is None else f"{entry['ratio']:.2f}"
+            line += f" {baseline:>12} {ratio:>7}  {entry['status']}"
+        print(line)
+
+
+def main():
+    """Run the benchmarks, then save or compare with a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--only', action='append', choices=sorted(CASES),
+                        help="Run only this case (repeatable).")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated numbers of items.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed repeats per case.")
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help="Seconds each repeat runs for at least.")
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help=f"Save the results as a baseline (default {DEFAULT_BASELINE}).")
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help="Compare with a saved baseline and exit 1 on regressions.")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Slowdown that counts as a regression (0.25 = 25%%).")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run(args.only or list(CASES), sizes, args.repeat, args.min_time)
+    comparison = None
+    if args.compare:
+        comparison = compare(results, load_baseline(args.compare), args.threshold)
+
+    if args.json:
+        print(json.dumps({'results': results, 'comparison': comparison}, indent=2))
+    else:
+        print_table(results, comparison)
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, sizes)
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+
+    regressions = [case for case, entry in (comparison or {}).items()
+                   if entry['status'] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: "
+              f"{', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: size of the wrapped description prompt, before and after compact prompt
+rendering (spotify_data/prompts).
+
+Three renderings of the same favorite artists are compared:
+    - raw: full Spotify artist objects (what older snapshots stored and what the
+      prompt f-string used to receive)
+    - projected: the stored snapshot fields (see utils.project_artist) formatted as
+      Python dicts, as before compact rendering
+    - compact: names plus genres and popularity, cut to LLM_PROMPT_MAX_* (current)
+
+Sizes are reported in characters and estimated input tokens. With --latency, each
+rendering is also sent through utils.create_groq_completion (LLM response cache off)
+to the endpoint configured by GROQ_API_KEY and GROQ_BASE_URL: Groq itself, or a server
+started with `manage.py run_llm_standin`. Only a real endpoint says how the model's
+latency depends on the prompt; the stand-in's prefill time is a configured rate.
+
+Usage (from backend/):
+    python benchmarks/prompt_size.py
+    python benchmarks/prompt_size.py --artists 50 --json
+    GROQ_API_KEY=... python benchmarks/prompt_size.py --latency --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotify_wrapper.settings')
+
+import django  # pylint: disable=wrong-import-position
+django.setup()
+
+# pylint: disable=wrong-import-position
+from django.conf import settings
+from spotify_data.llm_cache import LLMResponseCache
+from spotify_data.prompts import estimate_tokens
+from spotify_data.utils import (ROAST_SYSTEM_PROMPT, create_groq_completion, description_prompt,
+                                is_llm_fallback, project_artist)
+
+GENRES = ['indie pop', 'bedroom pop', 'art pop', 'chamber pop', 'indie folk', 'slowcore']
+
+
+def raw_artist(i):
+    """An artist object shaped like the Spotify Web API's."""
+    artist_id = f'{i:022d}'
+    return {
+        'external_urls': {'spotify': f'https://open.spotify.com/artist/{artist_id}'},
+        'followers': {'href': None, 'total': 1000000 + i * 7919},
+        'genres': GENRES[i % 3:i % 3 + 4],
+        'href': f'https://api.spotify.com/v1/artists/{artist_id}',
+        'id': artist_id,
+        'images': [{'url': f'https://i.scdn.co/image/ab6761610000e5eb{artist_id}{size}',
+                    'height': size, 'width': size} for size in (640, 320, 160)],
+        'name': f'Artist Number {i}',
+        'popularity': 90 - i,
+        'type': 'artist',
+        'uri': f'spotify:artist:{artist_id}',
+    }
+
+
+def legacy_prompt(favorite_artists):
+    """The description prompt as it was built before compact rendering."""
+    return (f"Describe how someone who listens to artists like {favorite_artists} "
+            "tends to act, think, and dress.")
+
+
+def prompt_size(user_prompt):
+    """Characters and estimated input tokens of the description prompt with `user_prompt`."""
+    return {
+        'chars': len(ROAST_SYSTEM_PROMPT) + len(user_prompt),
+        'tokens': estimate_tokens(ROAST_SYSTEM_PROMPT) + estimate_tokens(user_prompt),
+    }
+
+
+def measure_latency(user_prompt, repeat):
+    """Time create_groq_completion for `user_prompt` against the configured endpoint."""
+    latencies = []
+    with patch('spotify_data.utils.get_llm_cache', return_value=LLMResponseCache(None)):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text = create_groq_completion(settings.GROQ_API_KEY, ROAST_SYSTEM_PROMPT,
+                                          user_prompt)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if is_llm_fallback(text):
+                raise SystemExit(f"Completion failed: {text}")
+    return {
+        'latency_ms_median': round(statistics.median(latencies), 1),
+        'latency_ms_max': round(max(latencies), 1),
+    }
+
+
+def main():
+    """Run the benchmark and print a table (or JSON)."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--artists', type=int, default=20, help="Favorite artists in the wrap.")
+    parser.add_argument('--latency', action='store_true',
+                        help="Also time completions against GROQ_BASE_URL (or Groq).")
+    parser.add_argument('--repeat', type=int, default=10,
+                        help="Completions per rendering with --latency.")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    artists = [raw_artist(i) for i in range(args.artists)]
+    prompts = {
+        'raw': legacy_prompt(artists),
+        'projected': legacy_prompt([project_artist(artist) for artist in artists]),
+        'compact': description_prompt(artists),
+    }
+    if args.latency and not settings.GROQ_API_KEY:
+        parser.error("--latency needs GROQ_API_KEY (and GROQ_BASE_URL for a stand-in)")
+    results = {}
+    for name, prompt in prompts.items():
+        results[name] = prompt_size(prompt)
+        if args.latency:
+            results[name].update(measure_latency(prompt, args.repeat))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    columns = f"{'prompt':<10} {'chars':>8} {'tokens':>8}"
+    print(columns + (f" {'median ms':>10} {'max ms':>8}" if args.latency else ''))
+    for name, result in results.items():
+        row = f"{name:<10} {result['chars']:>8} {result['tokens']:>8}"
+        if args.latency:
+            row += f" {result['latency_ms_median']:>10} {result['latency_ms_max']:>8}"
+        print(row)
+    print(f"compact prompts use {results['raw']['tokens'] / results['compact']['tokens']:.1f}x "
+          f"fewer input tokens than raw objects")
+
+
+if __name__ == '__main__':
+    main()
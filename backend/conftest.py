@@ -9,6 +9,7 @@ such as a test client and a test user.
 Fixtures:
     - client: Provides a Django test client instance for simulating HTTP requests.
     - test_user: Creates and returns a test user instance in the test database.
+    - llm_breaker: Gives every test a closed Groq circuit breaker (autouse).
 
 Functions:
     - pytest_configure: Configures the Django settings for pytest, initializing 
@@ -90,3 +91,14 @@ def test_user(db):
     from django.contrib.auth.models import User  # Import User after Django setup
     user = User.objects.create(username="testuser")
     return user
+
+@pytest.fixture(autouse=True)
+def llm_breaker():
+    """
+    Gives every test a fresh Groq circuit breaker, so that tests simulating Groq
+    failures do not leave it open for the tests that follow.
+    """
+    from spotify_data.llm_guard import reset_breaker  # Import after Django setup
+    reset_breaker()
+    yield
+    reset_breaker()
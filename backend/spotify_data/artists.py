@@ -0,0 +1,110 @@
+"""
+Artist metadata store backed by the ArtistMetadata table.
+
+Track objects only carry simplified artists (id and name). Genres, popularity and
+images are looked up here: ids already stored (and younger than
+SPOTIFY_ARTIST_METADATA_TTL) are read from the database and only the misses are
+fetched from Spotify, 50 per request, so enriching a list of tracks costs one or two
+round trips instead of one per artist. Syncing a user's snapshot uses this to count
+the artists of their top tracks towards each term's genres and quirkiest artists.
+
+Functions:
+    - smallest_image_url: URL of the smallest image of a Spotify artist object.
+    - get_artist_metadata: Metadata for a list of artist ids, fetching misses only.
+    - get_term_track_artists: Enriched artists of each term's top tracks, in one lookup.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import ArtistMetadata
+from .utils import get_several_artists
+
+
+def smallest_image_url(images):
+    """URL of the smallest image in a Spotify images list, or None if there are none."""
+    if not images:
+        return None
+    smallest = min(images, key=lambda image: (image.get('width') or 0) * (image.get('height') or 0))
+    return smallest['url']
+
+
+def _as_artist(row):
+    """Artist dict in the shape of a Spotify artist object, as used by utils.get_top_genres."""
+    return {
+        'id': row.spotify_id,
+        'name': row.name,
+        'genres': row.genres,
+        'popularity': row.popularity,
+        'images': [{'url': row.image_url}] if row.image_url else [],
+    }
+
+
+def get_artist_metadata(access_token, artist_ids):
+    """
+    Look up artists, fetching only those missing from (or stale in) the local table.
+
+    Parameters:
+        - access_token: the access token associated with the current session
+        - artist_ids: Spotify artist ids
+
+    Returns:
+        Dictionary mapping each known artist id to an artist dict with id, name,
+        genres, popularity and images. Ids Spotify could not resolve are left out;
+        if the Spotify request fails, only the stored artists are returned.
+    """
+    artist_ids = list(dict.fromkeys(artist_ids))
+    if not artist_ids:
+        return {}
+    ttl = getattr(settings, 'SPOTIFY_ARTIST_METADATA_TTL', 7 * 24 * 60 * 60)
+    fresh_after = timezone.now() - timedelta(seconds=ttl)
+    rows = {row.spotify_id: row for row in
+            ArtistMetadata.objects.filter(spotify_id__in=artist_ids)}  # pylint: disable=no-member
+    misses = [artist_id for artist_id in artist_ids
+              if artist_id not in rows or rows[artist_id].updated_at < fresh_after]
+
+    fetched = get_several_artists(access_token, misses) if misses else None
+    if fetched:
+        now = timezone.now()
+        new_rows, stale_rows = [], []
+        for artist in fetched:
+            row = rows.get(artist['id']) or ArtistMetadata(spotify_id=artist['id'])
+            row.name = artist.get('name', '')
+            row.genres = artist.get('genres', [])
+            row.popularity = artist.get('popularity', 0)
+            row.image_url = smallest_image_url(artist.get('images'))
+            row.updated_at = now
+            (new_rows if row.pk is None else stale_rows).append(row)
+            rows[artist['id']] = row
+        ArtistMetadata.objects.bulk_create(new_rows, ignore_conflicts=True)  # pylint: disable=no-member
+        ArtistMetadata.objects.bulk_update(  # pylint: disable=no-member
+            stale_rows, ['name', 'genres', 'popularity', 'image_url', 'updated_at'])
+
+    return {artist_id: _as_artist(rows[artist_id]) for artist_id in artist_ids
+            if artist_id in rows}
+
+
+def _track_artist_ids(tracks):
+    """Ids of the artists of a list of tracks, each once, in order of appearance."""
+    return list(dict.fromkeys(artist['id'] for track in tracks
+                              for artist in track.get('artists') or [] if artist.get('id')))
+
+
+def get_term_track_artists(access_token, term_items, terms):
+    """
+    Enrich the artists of the top tracks of several terms with a single metadata lookup.
+
+    Parameters:
+        - access_token: the access token associated with the current session
+        - term_items: dictionary with a 'tracks_<term>' list for each of `terms`
+        - terms: the terms to enrich
+
+    Returns:
+        Dictionary mapping each term to the enriched artists of its tracks (each
+        artist once, in order of appearance), as passed to
+        utils.build_spotify_user_snapshot.
+    """
+    term_ids = {term: _track_artist_ids(term_items[f'tracks_{term}']) for term in terms}
+    metadata = get_artist_metadata(access_token,
+                                   [artist_id for ids in term_ids.values() for artist_id in ids])
+    return {term: [metadata[artist_id] for artist_id in ids if artist_id in metadata]
+            for term, ids in term_ids.items()}
@@ -0,0 +1,290 @@
+"""
+asyncio versions of the Spotify fetchers and Groq helpers in spotify_data/utils.
+
+Each function mirrors its synchronous namesake (same arguments, same return values)
+but awaits the network instead of blocking a worker thread, so async views can
+serve many wrapped generations concurrently from one ASGI worker.
+"""
+
+import asyncio
+import logging
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from groq import GroqError
+from .groq_client import get_async_groq_client
+from .llm_cache import get_llm_cache
+from .llm_guard import guarded_call, remaining_budget
+from .prompts import record_prompt
+from .spotify_client import get_async_spotify_client
+from .utils import (GROQ_MODEL, ROAST_SYSTEM_PROMPT, COMPARISON_SYSTEM_PROMPT,
+                    BATCH_SYSTEM_PROMPT, SPOTIFY_RECOMMENDATIONS_URL, description_prompt,
+                    quirky_prompt, comparison_prompt, batch_prompt, parse_batch_response,
+                    LLMFallback, llm_error_text, llm_timeout_text, groq_messages,
+                    top_items_pages, top_items_params)
+
+logger = logging.getLogger(__name__)
+
+
+async def aget_spotify_user_data(access_token):
+    """
+    Retrieves current user data including spotify id, email, profile image, and username.
+
+    Parameters:
+        - access_token: the access token associated with the current session
+
+    Returns:
+        JSON response containing user data
+    """
+    response = await get_async_spotify_client().get('/me', access_token)
+    return response.json() if response.status_code == 200 else None
+
+async def aiter_top_items_pages(access_token, item_type, timelimit, limit=None, user_key=None):
+    """Async iter_top_items_pages: yield pages of top items, None for a failed page."""
+    limit = limit or getattr(settings, 'SPOTIFY_TOP_ITEMS_LIMIT', 20)
+    for offset, page_size in top_items_pages(limit):
+        response = await get_async_spotify_client().get_cached(
+            f'/me/top/{item_type}', access_token,
+            params=top_items_params(timelimit, offset, page_size), user_key=user_key)
+        page = response.json() if response.status_code == 200 else None
+        yield page
+        if page is None or len(page['items']) < page_size or not page.get('next', True):
+            return
+
+async def aiter_user_top_items(access_token, item_type, timelimit, limit=None, user_key=None):
+    """Async iter_user_top_items: yield top tracks or artists as each page arrives."""
+    async for page in aiter_top_items_pages(access_token, item_type, timelimit, limit, user_key):
+        if page is None:
+            return
+        for item in page['items']:
+            yield item
+
+async def aget_user_top_items(access_token, item_type, timelimit, limit=None, user_key=None):
+    """Async get_user_top_items: list of top items, or None if the first page failed."""
+    items = []
+    number = 0
+    async for page in aiter_top_items_pages(access_token, item_type, timelimit, limit, user_key):
+        if page is None:
+            return None if number == 0 else items
+        items.extend(page['items'])
+        number += 1
+    return items
+
+async def aget_user_favorite_tracks(access_token, timelimit, user_key=None, limit=None):
+    """
+    Returns a list of the user's favorite tracks (20 unless `limit` or the
+    SPOTIFY_TOP_ITEMS_LIMIT setting says otherwise) over one of three time periods
+    (short_term, medium_term or long_term).
+
+    Parameters:
+        - access_token: the access token associated with the current session
+        - timelimit: the desired term
+        - user_key: identifies the user in the conditional-request cache
+        - limit: how many tracks to read, paging 50 at a time
+
+    Returns:
+        JSON response containing user favorite tracks
+    """
+    return await aget_user_top_items(access_token, 'tracks', timelimit, limit, user_key)
+
+async def aget_user_favorite_artists(access_token, timelimit, user_key=None, limit=None):
+    """
+    Returns a list of the user's favorite artists (20 unless `limit` or the
+    SPOTIFY_TOP_ITEMS_LIMIT setting says otherwise) over one of three time periods
+    (short_term, medium_term or long_term).
+
+    Parameters:
+        - access_token: the access token associated with the current session
+        - timelimit: the desired term
+        - user_key: identifies the user in the conditional-request cache
+        - limit: how many artists to read, paging 50 at a time
+
+    Returns:
+        JSON response containing user favorite artists
+    """
+    return await aget_user_top_items(access_token, 'artists', timelimit, limit, user_key)
+
+async def aget_spotify_recommendations(user_token, seed_artists=None,
+                                       seed_tracks=None, seed_genres=None):
+    """
+    Fetches a list of recommended songs from Spotify based on provided seeds.
+
+    Returns:
+        list: A list of recommended songs (see utils.get_spotify_recommendations).
+    """
+    params = {
+        "limit": 5,
+    }
+    if seed_artists:
+        params["seed_artists"] = ",".join(seed_artists)
+    if seed_tracks:
+        params["seed_tracks"] = ",".join(seed_tracks)
+    if seed_genres:
+        params["seed_genres"] = ",".join(seed_genres)
+
+    try:
+        response = await get_async_spotify_client().get(SPOTIFY_RECOMMENDATIONS_URL, user_token,
+                                                        params=params)
+        response.raise_for_status()
+        data = response.json()['tracks']
+    except httpx.HTTPError as e:
+        print(f"Error fetching recommendations: {e}")
+        return []
+
+    return [
+        {
+            "id": track["id"],
+            "name": track["name"],
+            "artist": ", ".join([artist["name"] for artist in track["artists"]]),
+            "album": track["album"]["name"],
+            "preview_url": track["preview_url"],
+            "external_url": track["external_urls"]["spotify"]
+        }
+        for track in data
+    ]
+
+async def arun_concurrently(calls, deadline=None):
+    """
+    Await several coroutines together under a single overall deadline.
+
+    Parameters:
+        - calls: dictionary mapping a name to an awaitable
+        - deadline: seconds to wait for every call to finish (None waits forever)
+
+    Returns:
+        Dictionary mapping each name to its result. Calls that raised or did not
+        finish before the deadline map to None.
+    """
+    tasks = {name: asyncio.ensure_future(call) for name, call in calls.items()}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+
+    results = {}
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            results[name] = None
+        elif task.cancelled() or task.exception() is not None:
+            results[name] = None
+        else:
+            results[name] = task.result()
+    return results
+
+
+async def arequest_groq_completion(groq_api_key, system_prompt, user_prompt, timeout=None):
+    """
+    Async request_groq_completion: one uncached chat completion, guarded by the
+    circuit breaker and the request's time budget; errors propagate.
+    """
+    record_prompt(system_prompt, user_prompt)
+    with guarded_call(timeout) as timeout:
+        response = await get_async_groq_client(groq_api_key).chat.completions.create(
+            messages=groq_messages(system_prompt, user_prompt),
+            model=GROQ_MODEL,
+            timeout=timeout,
+        )
+    return response.choices[0].message.content
+
+async def acreate_groq_completion(groq_api_key, system_prompt, user_prompt, label="Description",
+                                  timeout=None):
+    """
+    Send one chat completion request to Groq without blocking the event loop,
+    going through the LLM response cache (and its single-flight coalescing) like
+    create_groq_completion.
+
+    Returns:
+        - llama_description: the text constructed by the LLM, or an error message
+    """
+    if not groq_api_key:
+        raise GroqError("GROQ_API_KEY environment variable is not set.")
+
+    try:
+        llama_description = await get_llm_cache().aget_or_generate(
+            GROQ_MODEL, system_prompt, user_prompt,
+            lambda: arequest_groq_completion(groq_api_key, system_prompt, user_prompt, timeout))
+    except KeyError as e:
+        llama_description = LLMFallback(f"Key error: {str(e)}")
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        llama_description = llm_error_text(label, e)
+    return llama_description
+
+async def acreate_groq_description(groq_api_key, favorite_artists):
+    """Async create_groq_description: roast the user's lifestyle from favorite artists."""
+    return await acreate_groq_completion(groq_api_key, ROAST_SYSTEM_PROMPT,
+                                         description_prompt(favorite_artists))
+
+async def acreate_groq_quirky(groq_api_key, favorite_artists):
+    """Async create_groq_quirky: roast the user for their quirkiest artists."""
+    return await acreate_groq_completion(groq_api_key, ROAST_SYSTEM_PROMPT,
+                                         quirky_prompt(favorite_artists))
+
+async def acreate_groq_comparison(groq_api_key, artist_1, artist_2):
+    """Async create_groq_comparison: roast two artists by comparing them."""
+    return await acreate_groq_completion(groq_api_key, COMPARISON_SYSTEM_PROMPT,
+                                         comparison_prompt(artist_1, artist_2),
+                                         label="Comparison")
+
+def _cached_texts(cache, prompts):
+    """The cached text of each prompt, or None; read in one go off the event loop."""
+    return [cache.get(GROQ_MODEL, system, user) for system, user, _ in prompts]
+
+def _cache_texts(cache, items):
+    """Store the (prompt, text) pairs in the LLM response cache."""
+    for (system, user, _), text in items:
+        cache.set(GROQ_MODEL, system, user, text)
+
+async def acreate_groq_batch(groq_api_key, prompts):
+    """
+    Async create_groq_batch: generate every item of a slide with one completion,
+    falling back to parallel per-item completions if the answer cannot be parsed.
+    """
+    if not groq_api_key:
+        raise GroqError("GROQ_API_KEY environment variable is not set.")
+
+    cache = get_llm_cache()
+    texts = await sync_to_async(_cached_texts)(cache, prompts)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if len(missing) > 1:
+        try:
+            answer = await arequest_groq_completion(
+                groq_api_key, BATCH_SYSTEM_PROMPT,
+                batch_prompt([prompts[i][1] for i in missing]))
+            answers = parse_batch_response(answer, len(missing))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Batched completion failed: %s", e)
+            answers = None
+        if answers is not None:
+            for i, text in zip(missing, answers):
+                texts[i] = text
+            await sync_to_async(_cache_texts)(cache, [(prompts[i], texts[i]) for i in missing])
+            missing = []
+
+    fallbacks = await acreate_groq_completions(groq_api_key, [prompts[i] for i in missing])
+    for i, text in zip(missing, fallbacks):
+        texts[i] = text
+    return texts
+
+async def acreate_groq_completions(groq_api_key, prompts, call_timeout=None, deadline=None):
+    """
+    Async create_groq_completions: per-item completions run concurrently (at most
+    GROQ_MAX_CONCURRENCY at a time for this slide), each limited to `call_timeout`
+    seconds and all of them to `deadline`; texts are returned in item order.
+    """
+    if not groq_api_key:
+        raise GroqError("GROQ_API_KEY environment variable is not set.")
+    if call_timeout is None:
+        call_timeout = getattr(settings, 'GROQ_CALL_TIMEOUT', 15)
+    if deadline is None:
+        deadline = getattr(settings, 'GROQ_SLIDE_DEADLINE', 25)
+    if remaining_budget() is not None:
+        deadline = min(deadline, remaining_budget())
+    semaphore = asyncio.Semaphore(getattr(settings, 'GROQ_MAX_CONCURRENCY', 5))
+
+    async def complete(system, user, label):
+        async with semaphore:
+            return await acreate_groq_completion(groq_api_key, system, user, label, call_timeout)
+
+    results = await arun_concurrently(
+        {i: complete(*prompt) for i, prompt in enumerate(prompts)}, deadline=deadline)
+    return [results[i] if results[i] is not None else llm_timeout_text(prompt[2])
+            for i, prompt in enumerate(prompts)]
@@ -0,0 +1,213 @@
+"""
+Async variants of the spotify_data views.
+
+They return the same responses as their synchronous namesakes in spotify_data/views,
+but await Spotify and Groq through spotify_data/async_utils, so under ASGI a single
+worker can serve many wrapped generations at once. Database access goes through
+sync_to_async.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import JsonResponse
+from django.shortcuts import HttpResponse
+from accounts.models import SpotifyToken
+from .artists import get_term_track_artists
+from .async_utils import (aget_spotify_user_data, aget_user_favorite_tracks,
+                          aget_user_favorite_artists, arun_concurrently,
+                          acreate_groq_description)
+from .utils import (TERMS, build_spotify_user_snapshot, get_stale_terms,
+                    select_term_data, select_duo_term_data)
+from .slides import aget_slide_texts, schedule_slide_texts
+from .timing import timed
+from .models import SpotifyUser, SpotifyWrapped, DuoWrapped
+from .serializers import SpotifyUserSerializer, SpotifyWrappedSerializer, DuoWrappedSerializer
+
+
+def _load_wrapped(wrapped_id, is_duo):
+    """Return the stored values of a SpotifyWrapped/DuoWrapped, or None if it does not exist."""
+    model = DuoWrapped if is_duo == 'true' else SpotifyWrapped
+    rows = list(model.objects.filter(id=wrapped_id).values())  # pylint: disable=no-member
+    return rows[0] if rows else None
+
+
+def _load_user_snapshot(user):
+    """Return the user's stored SpotifyUser, or None if there is none yet."""
+    return SpotifyUser.objects.filter(user=user).first()  # pylint: disable=no-member
+
+
+def _save_user_snapshot(user, snapshot):
+    """update_or_create the SpotifyUser for a fetched snapshot and serialize it."""
+    spotify_user, _ = SpotifyUser.objects.update_or_create(  # pylint: disable=no-member
+        spotify_id=snapshot['spotify_id'],
+        defaults={'user': user, 'display_name': user.username, **snapshot}
+    )
+    with timed('serialize'):
+        return SpotifyUserSerializer(spotify_user).data
+
+
+def _record_wrapped(model, serializer_class, spotify_users, **fields):
+    """Create a wrapped and append its serialized form to each user's past roasts."""
+    wrapped = model.objects.create(**fields)
+    with timed('serialize'):
+        wrapped_data = serializer_class(wrapped).data
+    for spotify_user in spotify_users:
+        spotify_user.past_roasts.append(wrapped_data)
+        spotify_user.save(update_fields=['past_roasts'])
+    return wrapped_data
+
+
+async def aupdate_or_add_spotify_user(request):
+    """
+    Async update_or_add_spotify_user: fetch the profile and the stale top-items lists
+    concurrently and store them on the user's SpotifyUser.
+    """
+    user = await sync_to_async(lambda: request.user)()
+    try:
+        token_entry = await sync_to_async(SpotifyToken.objects.get)(  # pylint: disable=no-member
+            username=user.username)
+    except ObjectDoesNotExist:
+        return HttpResponse("User add/update failed: missing access token", status=500)
+
+    spotify_user = await sync_to_async(_load_user_snapshot)(user)
+    force = request.GET.get('force') in ('1', 'true')
+    terms = list(TERMS) if force else get_stale_terms(spotify_user)
+    if not terms:
+        with timed('serialize'):
+            data = await sync_to_async(lambda: SpotifyUserSerializer(spotify_user).data)()
+        return JsonResponse({'spotify_user': data})
+
+    access_token = token_entry.access_token
+    term_calls = {}
+    for term in terms:
+        term_args = (access_token, f'{term}_term', user.username)
+        term_calls[f'tracks_{term}'] = aget_user_favorite_tracks(*term_args)
+        term_calls[f'artists_{term}'] = aget_user_favorite_artists(*term_args)
+    results = await arun_concurrently(
+        {'user_data': aget_spotify_user_data(access_token), **term_calls},
+        deadline=getattr(settings, 'SPOTIFY_FETCH_DEADLINE', 10))
+    user_data = results['user_data']
+
+    if user_data and all(results[name] is not None for name in term_calls):
+        track_artists = await sync_to_async(get_term_track_artists)(access_token, results, terms)
+        snapshot = build_spotify_user_snapshot(
+            user_data, results, terms, spotify_user.synced_terms if spotify_user else None,
+            track_artists)
+        data = await sync_to_async(_save_user_snapshot)(user, snapshot)
+        return JsonResponse({'spotify_user': data})
+
+    return JsonResponse({'error': 'Could not fetch user data from Spotify'}, status=500)
+
+
+async def aadd_spotify_wrapped(request):
+    """Async add_spotify_wrapped: create a wrapped for the selected term."""
+    groq_api_key = settings.GROQ_API_KEY
+    term_selection = request.GET.get('termselection')
+    user = await sync_to_async(lambda: request.user)()
+    spotify_user = await sync_to_async(SpotifyUser.objects.get)(  # pylint: disable=no-member
+        display_name=user.username)
+    term_data = select_term_data(spotify_user, term_selection)
+    if term_data is None:
+        return HttpResponse("Bad term selection", status=400)
+
+    description = await acreate_groq_description(groq_api_key, term_data['favorite_artists'])
+    wrapped_data = await sync_to_async(_record_wrapped)(
+        SpotifyWrapped, SpotifyWrappedSerializer, [spotify_user],
+        user=spotify_user.display_name, **term_data, llama_description=description,
+        llama_songrecs=["placeholder1", "placeholder2", "placeholder3"])
+    await sync_to_async(schedule_slide_texts)(SpotifyWrapped, wrapped_data, False)
+    return JsonResponse({'spotify_wrapped': wrapped_data})
+
+
+async def aadd_duo_wrapped(request):
+    """Async add_duo_wrapped: create a wrapped combining two users' favorites."""
+    groq_api_key = settings.GROQ_API_KEY
+    term_selection = request.GET.get('termselection')
+    get_user = sync_to_async(SpotifyUser.objects.get)  # pylint: disable=no-member
+    spotify_user1 = await get_user(display_name=request.GET.get('user1'))
+    try:
+        spotify_user2 = await get_user(display_name=request.GET.get('user2'))
+    except SpotifyUser.DoesNotExist:  # pylint: disable=no-member
+        return HttpResponse("User display name not found", status=500)
+
+    term_data = select_duo_term_data(spotify_user1, spotify_user2, term_selection)
+    if term_data is None:
+        return HttpResponse("Bad term selection", status=400)
+
+    description = await acreate_groq_description(groq_api_key, term_data['favorite_artists'])
+    wrapped_data = await sync_to_async(_record_wrapped)(
+        DuoWrapped, DuoWrappedSerializer, [spotify_user1, spotify_user2],
+        user=spotify_user1.display_name, user2=spotify_user2.display_name, **term_data,
+        llama_description=description, llama_songrecs='none')
+    await sync_to_async(schedule_slide_texts)(DuoWrapped, wrapped_data, True)
+    return JsonResponse({'duo_wrapped': wrapped_data})
+
+
+async def adisplay_artists(request):
+    """Async display_artists: stored (or batch-generated) texts for the top 5 artists."""
+    is_duo = request.GET.get('isDuo')
+    wrapped_data = await sync_to_async(_load_wrapped)(request.GET.get('id'), is_duo)
+    if wrapped_data is None:
+        return HttpResponse("Wrapped grab failed: no data", status=500)
+
+    artists = wrapped_data['favorite_artists'][:5]
+    descriptions = await aget_slide_texts(settings.GROQ_API_KEY, wrapped_data,
+                                          is_duo == 'true', 'artists')
+
+    out = [
+        {'name': artist['name'], 'image': artist['images'][0]['url'], 'desc': desc}
+        for artist, desc in zip(artists, descriptions)
+    ]
+    return JsonResponse(out, safe=False, status=200)
+
+
+async def adisplay_genres(request):
+    """Async display_genres: describe the top genres of a wrapped."""
+    is_duo = request.GET.get('isDuo')
+    wrapped_data = await sync_to_async(_load_wrapped)(request.GET.get('id'), is_duo)
+    if wrapped_data is None:
+        return HttpResponse("Wrapped grab failed: no data", status=500)
+
+    texts = await aget_slide_texts(settings.GROQ_API_KEY, wrapped_data, is_duo == 'true',
+                                   'genres')
+    out = {
+        'genres': ', '.join(wrapped_data['favorite_genres'][:5]),
+        'desc': texts[0]
+    }
+    return JsonResponse(out, safe=False, status=200)
+
+
+async def adisplay_songs(request):
+    """Async display_songs: stored (or batch-generated) texts for the top 5 tracks."""
+    is_duo = request.GET.get('isDuo')
+    wrapped_data = await sync_to_async(_load_wrapped)(request.GET.get('id'), is_duo)
+    if wrapped_data is None:
+        return HttpResponse("Wrapped grab failed: no data", status=500)
+
+    tracks = wrapped_data['favorite_tracks'][:5]
+    descriptions = await aget_slide_texts(settings.GROQ_API_KEY, wrapped_data,
+                                          is_duo == 'true', 'songs')
+
+    out = [
+        {
+            'name': track['name'],
+            'artist': track['artists'][0]['name'],
+            'image': track['album']['images'][0]['url'],
+            'desc': desc,
+        }
+        for track, desc in zip(tracks, descriptions)
+    ]
+    return JsonResponse(out, safe=False, status=200)
+
+
+async def adisplay_quirky(request):
+    """Async display_quirky: roast the quirkiest artists of a wrapped."""
+    is_duo = request.GET.get('isDuo')
+    wrapped_data = await sync_to_async(_load_wrapped)(request.GET.get('id'), is_duo)
+    if wrapped_data is None:
+        return HttpResponse("Wrapped grab failed: no data", status=500)
+
+    texts = await aget_slide_texts(settings.GROQ_API_KEY, wrapped_data, is_duo == 'true',
+                                   'quirky')
+    return JsonResponse(texts[0], safe=False, status=200)
@@ -0,0 +1,153 @@
+"""
+Descriptions of single artists and tracks, shared by every user.
+
+A solo artists or songs slide asks Groq to describe one artist name or one
+"<track> by <artist>" string per item; the answer depends only on that entity, so it
+is stored once in the EntityDescription table under the entity's Spotify id and
+reused by every wrap that shows it. A stored description is regenerated once it is
+older than ENTITY_DESCRIPTION_TTL or was written for an older DESCRIPTION_VERSION.
+warm_entity_descriptions fills the table ahead of time with the artists and tracks
+that appear most often across SpotifyUser snapshots.
+
+Functions:
+    - track_label: "<track> by <artist>" as used in the song prompts.
+    - entity_prompt: The prompt describing one entity.
+    - stored_descriptions: Fresh stored descriptions for a list of entities.
+    - save_descriptions: Store (or refresh) generated descriptions.
+    - popular_entities: The artists or tracks found in the most snapshots.
+    - warm_entity_descriptions: Generate descriptions of the most popular entities ahead of time.
+"""
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import EntityDescription, SpotifyUser
+from .utils import (TERMS, ROAST_SYSTEM_PROMPT, description_prompt, create_groq_batch,
+                    is_llm_fallback)
+
+# Bump when ROAST_SYSTEM_PROMPT or description_prompt changes so that descriptions
+# written with the old prompt are regenerated.
+DESCRIPTION_VERSION = 1
+
+ARTIST = EntityDescription.ARTIST
+TRACK = EntityDescription.TRACK
+
+
+def track_label(track):
+    """How a track is named in prompts: '<track> by <first artist>'."""
+    return track['name'] + ' by ' + track['artists'][0]['name']
+
+
+def entity_prompt(name):
+    """(system_prompt, user_prompt, label) describing one artist or track."""
+    return (ROAST_SYSTEM_PROMPT, description_prompt(name), "Description")
+
+
+def _fresh_after():
+    return timezone.now() - timedelta(
+        seconds=getattr(settings, 'ENTITY_DESCRIPTION_TTL', 30 * 24 * 60 * 60))
+
+
+def stored_descriptions(entities):
+    """
+    Look up stored descriptions.
+
+    Parameters:
+        - entities: list of (kind, spotify_id, name) tuples, or None for items that
+          are not a single entity
+
+    Returns:
+        List with the stored description of each entity, in order; None for entities
+        without a fresh description (and for None items).
+    """
+    ids = {entity[1] for entity in entities if entity is not None}
+    rows = {}
+    if ids:
+        rows = {(row.kind, row.spotify_id): row.text for row in
+                EntityDescription.objects.filter(  # pylint: disable=no-member
+                    spotify_id__in=ids, version=DESCRIPTION_VERSION,
+                    updated_at__gte=_fresh_after())}
+    return [rows.get(entity[:2]) if entity is not None else None for entity in entities]
+
+
+def save_descriptions(described):
+    """
+    Store generated descriptions, replacing older ones. Fallback (error) texts are
+    skipped so that they are generated again next time.
+
+    Parameters:
+        - described: list of ((kind, spotify_id, name), text) pairs
+    """
+    described = {entity[:2]: (entity[2], text) for entity, text in described
+                 if entity is not None and not is_llm_fallback(text)}
+    if not described:
+        return
+    now = timezone.now()
+    rows = {(row.kind, row.spotify_id): row for row in
+            EntityDescription.objects.filter(  # pylint: disable=no-member
+                spotify_id__in={spotify_id for _, spotify_id in described})}
+    new_rows, old_rows = [], []
+    for (kind, spotify_id), (name, text) in described.items():
+        row = rows.get((kind, spotify_id)) or EntityDescription(kind=kind, spotify_id=spotify_id)
+        row.name = name[:255]
+        row.text = text
+        row.version = DESCRIPTION_VERSION
+        row.updated_at = now
+        (new_rows if row.pk is None else old_rows).append(row)
+    EntityDescription.objects.bulk_create(new_rows, ignore_conflicts=True)  # pylint: disable=no-member
+    EntityDescription.objects.bulk_update(  # pylint: disable=no-member
+        old_rows, ['name', 'text', 'version', 'updated_at'])
+
+
+def popular_entities(kind, limit):
+    """
+    Return the `limit` artists (or tracks) found in the most SpotifyUser snapshots,
+    counting every term, as (kind, spotify_id, name) tuples, most common first.
+    """
+    field = 'favorite_artists' if kind == ARTIST else 'favorite_tracks'
+    fields = [f'{field}_{term}' for term in TERMS]
+    counts = Counter()
+    names = {}
+    for snapshot in SpotifyUser.objects.values_list(*fields).iterator():  # pylint: disable=no-member
+        for items in snapshot:
+            for item in items or []:
+                if not item.get('id'):
+                    continue
+                counts[item['id']] += 1
+                if item['id'] not in names:
+                    names[item['id']] = item['name'] if kind == ARTIST else track_label(item)
+    return [(kind, spotify_id, names[spotify_id])
+            for spotify_id, _ in counts.most_common(limit)]
+
+
+def warm_entity_descriptions(groq_api_key, limit, batch_size=10, force=False,
+                             kinds=(ARTIST, TRACK)):
+    """
+    Generate and store descriptions of the `limit` most popular artists and tracks.
+
+    Parameters:
+        - groq_api_key: API key for Groq
+        - limit: how many entities of each kind to describe
+        - batch_size: entities described by one batched completion
+        - force: regenerate descriptions that are still fresh
+        - kinds: which kinds of entities to describe
+
+    Returns:
+        Dictionary with the number of entities 'generated', already 'fresh' and
+        'failed' (their completion failed).
+    """
+    counts = {'generated': 0, 'fresh': 0, 'failed': 0}
+    for kind in kinds:
+        entities = popular_entities(kind, limit)
+        if not force:
+            stored = stored_descriptions(entities)
+            counts['fresh'] += sum(1 for text in stored if text is not None)
+            entities = [entity for entity, text in zip(entities, stored) if text is None]
+        for start in range(0, len(entities), batch_size):
+            batch = entities[start:start + batch_size]
+            texts = create_groq_batch(groq_api_key, [entity_prompt(name) for _, _, name in batch])
+            save_descriptions(list(zip(batch, texts)))
+            failed = sum(1 for text in texts if is_llm_fallback(text))
+            counts['failed'] += failed
+            counts['generated'] += len(batch) - failed
+    return counts
@@ -0,0 +1,150 @@
+"""
+Process-wide Groq clients sharing a keep-alive connection pool.
+
+Building a Groq client per completion sets up a new HTTP client (and a new TLS
+connection to api.groq.com) every time. Instead every completion in a process goes
+through one httpx connection pool, with the API key and pool settings read once
+from Django settings (GROQ_API_KEY is loaded from .env when settings are imported).
+GROQ_BASE_URL points the clients at another server speaking the same API, such as
+the local stand-in in spotify_data/standins/llm.
+
+The async clients are bound to their event loop, so each loop gets its own pool,
+which is closed when the loop shuts down (asyncio.run, or an ASGI server, finalizes
+the loop's async generators on the way out).
+
+Functions:
+    - get_groq_client: Return the shared Groq client for the current process.
+    - get_async_groq_client: Return the shared AsyncGroq client for the running event loop.
+    - groq_client_stats: Requests and new connections of the current process's client.
+    - reset_groq_clients: Close and discard the current process's clients.
+"""
+import asyncio
+import os
+import threading
+import weakref
+import httpx
+from django.conf import settings
+from groq import Groq, AsyncGroq
+
+_lock = threading.Lock()
+_http_client = None
+_clients = {}
+_pid = None
+_requests = 0
+_connections = 0
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _pool_settings():
+    """(limits, timeout) for the Groq connection pools, from the GROQ_* settings."""
+    pool_size = getattr(settings, 'GROQ_POOL_SIZE', 10)
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return limits, httpx.Timeout(getattr(settings, 'GROQ_TIMEOUT', 30))
+
+
+def _trace(event, info):  # pylint: disable=unused-argument
+    """httpx trace callback counting the connections the shared pool opens."""
+    global _connections  # pylint: disable=global-statement
+    if event == 'connection.connect_tcp.complete':
+        with _lock:
+            _connections += 1
+
+
+def _count_request(request):
+    """httpx request hook counting requests sent through the shared pool."""
+    global _requests  # pylint: disable=global-statement
+    request.extensions.setdefault('trace', _trace)
+    with _lock:
+        _requests += 1
+
+
+async def _close_at_shutdown(http_client):
+    """
+    Async generator that closes `http_client` once its event loop finalizes it, which
+    a loop shutting down does to every async generator still suspended.
+    """
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+
+
+def get_groq_client(api_key=None):
+    """
+    Return the Groq client for `api_key` (GROQ_API_KEY by default) and GROQ_BASE_URL,
+    creating it on first use. All clients of a process share one httpx connection
+    pool, which is rebuilt after a fork so worker processes never share sockets with
+    their parent.
+    """
+    global _http_client, _pid, _requests, _connections  # pylint: disable=global-statement
+    api_key = api_key or getattr(settings, 'GROQ_API_KEY', None)
+    base_url = getattr(settings, 'GROQ_BASE_URL', None)
+    pid = os.getpid()
+    with _lock:
+        if _pid != pid:
+            limits, timeout = _pool_settings()
+            _http_client = httpx.Client(limits=limits, timeout=timeout,
+                                        event_hooks={'request': [_count_request]})
+            _clients.clear()
+            _requests = 0
+            _connections = 0
+            _pid = pid
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            client = Groq(api_key=api_key, base_url=base_url, http_client=_http_client)
+            _clients[(api_key, base_url)] = client
+    return client
+
+
+def get_async_groq_client(api_key=None):
+    """
+    Return the AsyncGroq client for `api_key` on the running event loop. An
+    httpx.AsyncClient is bound to its loop, so each loop gets its own pool, closed
+    when the loop shuts down.
+    """
+    api_key = api_key or getattr(settings, 'GROQ_API_KEY', None)
+    base_url = getattr(settings, 'GROQ_BASE_URL', None)
+    loop = asyncio.get_running_loop()
+    loop_clients = _async_clients.get(loop)
+    if loop_clients is None:
+        limits, timeout = _pool_settings()
+        http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        closer = _close_at_shutdown(http_client)
+        # The loop only holds its async generators weakly; the task starts this one
+        loop_clients = {'http_client': http_client, 'closer': closer,
+                        'started': loop.create_task(closer.__anext__())}
+        _async_clients[loop] = loop_clients
+    client = loop_clients.get((api_key, base_url))
+    if client is None:
+        client = AsyncGroq(api_key=api_key, base_url=base_url,
+                           http_client=loop_clients['http_client'])
+        loop_clients[(api_key, base_url)] = client
+    return client
+
+
+def groq_client_stats():
+    """
+    Return statistics of the current process's Groq clients: requests sent through
+    the shared pool and connections it opened for them (fewer connections than
+    requests means connections were reused).
+    """
+    with _lock:
+        return {
+            'pool_size': getattr(settings, 'GROQ_POOL_SIZE', 10),
+            'clients': len(_clients),
+            'requests': _requests,
+            'connections_opened': _connections,
+        }
+
+
+def reset_groq_clients():
+    """Close and discard the current process's clients (used by tests and after reconfiguration)."""
+    global _http_client, _pid, _requests, _connections  # pylint: disable=global-statement
+    with _lock:
+        if _http_client is not None and _pid == os.getpid():
+            _http_client.close()
+        _http_client = None
+        _clients.clear()
+        _pid = None
+        _requests = 0
+        _connections = 0
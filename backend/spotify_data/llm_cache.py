@@ -0,0 +1,439 @@
+"""
+Content-addressed cache for Groq completions.
+
+A completion is stored under a hash of (model, system prompt, user prompt), so the
+same question about the same artists is answered from the cache however many times
+a slide is visited. Entries expire after LLM_CACHE_TTL seconds and the least
+recently used ones are evicted beyond LLM_CACHE_MAX_ENTRIES. To keep reads cheap, a
+hit only refreshes an entry's last use when that is older than
+LLM_CACHE_TOUCH_INTERVAL seconds, and the entries are counted and evicted once every
+LLM_CACHE_EVICT_EVERY stores rather than on each one. Error fallback texts are never
+cached.
+
+Misses are generated once however many callers ask at the same time (see
+spotify_data/singleflight), and hot entries are refreshed a little before they
+expire: each hit recomputes the entry early with a probability that grows as expiry
+nears and with how long the completion took to generate ("XFetch", Vattani et al.,
+"Optimal Probabilistic Cache Stampede Prevention"), so one caller refreshes it while
+the others keep getting hits, instead of all of them missing together at expiry.
+
+Classes:
+    - DatabaseLLMCacheBackend: stores entries in the LLMResponse table.
+    - FileLLMCacheBackend: stores one JSON file per entry in a directory.
+    - LLMResponseCache: hashes prompts, keeps hit/miss counters, tolerates backend errors,
+      coalesces concurrent misses and refreshes hot entries early.
+
+Functions:
+    - get_llm_cache: Return the process-wide LLMResponseCache.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from .llm_guard import remaining_budget
+from .singleflight import AsyncSingleFlight, SingleFlight, release_lease, try_lease
+
+logger = logging.getLogger(__name__)
+
+
+class _BatchedEviction:
+    """Counts stores so that a backend evicts once every `evict_every` of them."""
+
+    def __init__(self, evict_every):
+        self.evict_every = max(int(evict_every), 1)
+        self._stores = 0
+        self._lock = threading.Lock()
+
+    def due(self):
+        """Count one store; True when it is time to evict."""
+        with self._lock:
+            self._stores += 1
+            return self._stores % self.evict_every == 0
+
+
+class DatabaseLLMCacheBackend:
+    """
+    Entries live in the LLMResponse table; `last_used` orders LRU eviction.
+
+    Parameters:
+        - ttl: seconds an entry is served after it was stored
+        - max_entries: rows kept before the least recently used are deleted
+        - touch_interval: a hit updates `last_used` only once it is older than this
+        - evict_every: the table is trimmed to max_entries once every this many stores
+    """
+
+    def __init__(self, ttl, max_entries, touch_interval=0, evict_every=1):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._eviction = _BatchedEviction(evict_every)
+
+    @staticmethod
+    def _model():
+        from .models import LLMResponse  # pylint: disable=import-outside-toplevel
+        return LLMResponse
+
+    def get(self, key):
+        """
+        Return (text, expired, ttl_left, compute_time): the stored text or None,
+        whether it had expired, the seconds it has left and how long it took to generate.
+        """
+        model = self._model()
+        row = model.objects.filter(key=key).first()
+        if row is None:
+            return None, False, 0, 0
+        now = timezone.now()
+        ttl_left = (row.created_at + timedelta(seconds=self.ttl) - now).total_seconds()
+        if ttl_left < 0:
+            row.delete()
+            return None, True, 0, 0
+        if (now - row.last_used).total_seconds() >= self.touch_interval:
+            model.objects.filter(pk=row.pk).update(last_used=now)
+        return row.text, False, ttl_left, row.compute_time
+
+    def set(self, key, model_name, text, compute_time=0):
+        """Store an entry and return how many entries were evicted to make room."""
+        model = self._model()
+        now = timezone.now()
+        model.objects.update_or_create(
+            key=key, defaults={'model': model_name, 'text': text, 'created_at': now,
+                               'last_used': now, 'compute_time': compute_time})
+        if not self._eviction.due():
+            return 0
+        excess = model.objects.count() - self.max_entries
+        if excess <= 0:
+            return 0
+        oldest = list(model.objects.order_by('last_used').values_list('pk', flat=True)[:excess])
+        model.objects.filter(pk__in=oldest).delete()
+        return len(oldest)
+
+
+class FileLLMCacheBackend:
+    """
+    One JSON file per entry under `directory`; the file's mtime orders LRU eviction.
+
+    Parameters:
+        - directory: where entry files are written (created on first use)
+        - ttl: seconds an entry is served after it was stored
+        - max_entries: files kept before the least recently used are deleted
+        - touch_interval: a hit updates the file's mtime only once it is older than this
+        - evict_every: the directory is trimmed to max_entries once every this many stores
+    """
+
+    def __init__(self, directory, ttl, max_entries, touch_interval=0, evict_every=1):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._eviction = _BatchedEviction(evict_every)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        """
+        Return (text, expired, ttl_left, compute_time): the stored text or None,
+        whether it had expired, the seconds it has left and how long it took to generate.
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as entry_file:
+                entry = json.load(entry_file)
+                last_used = os.fstat(entry_file.fileno()).st_mtime
+        except (OSError, ValueError):
+            return None, False, 0, 0
+        now = time.time()
+        ttl_left = entry['created_at'] + self.ttl - now
+        if ttl_left < 0:
+            os.remove(path)
+            return None, True, 0, 0
+        if now - last_used >= self.touch_interval:
+            os.utime(path)
+        return entry['text'], False, ttl_left, entry.get('compute_time', 0)
+
+    def set(self, key, model_name, text, compute_time=0):
+        """Store an entry and return how many entries were evicted to make room."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as entry_file:
+            json.dump({'model': model_name, 'text': text, 'created_at': time.time(),
+                       'compute_time': compute_time}, entry_file)
+        os.replace(temp_path, path)
+        if not self._eviction.due():
+            return 0
+
+        with os.scandir(self.directory) as entries:
+            files = [entry for entry in entries if entry.name.endswith('.json')]
+        excess = len(files) - self.max_entries
+        if excess <= 0:
+            return 0
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:excess]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        return excess
+
+
+class LLMResponseCache:
+    """
+    Front of the cache used by the Groq helpers.
+
+    A failing backend (e.g. the database being unavailable) is logged and treated as
+    a miss, so the cache can never stop a completion from being generated.
+
+    Parameters:
+        - backend: a DatabaseLLMCacheBackend or FileLLMCacheBackend, or None to disable
+        - beta: XFetch eagerness; 0 turns early refresh off, above 1 refreshes earlier
+    """
+
+    def __init__(self, backend, beta=1.0):
+        self.backend = backend
+        self.beta = beta
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._async_flights = AsyncSingleFlight()
+        self.counters = {'hits': 0, 'misses': 0, 'stored': 0, 'expired': 0, 'evicted': 0,
+                         'errors': 0, 'early_refreshes': 0, 'coalesced': 0}
+
+    @staticmethod
+    def key(model, system_prompt, user_prompt):
+        """Cache key for one (model, system prompt, user prompt) combination."""
+        raw = json.dumps([model, system_prompt, user_prompt])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def count(self, name, amount=1):
+        """Increment one of the counters."""
+        with self._lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        """Return a copy of the counters."""
+        with self._lock:
+            return dict(self.counters, coalesced=self.counters['coalesced'] +
+                        self._flights.shared + self._async_flights.shared)
+
+    def _read(self, key):
+        """backend.get(key), with a failing backend read as a miss."""
+        try:
+            return self.backend.get(key)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("LLM cache lookup failed: %s", e)
+            self.count('errors')
+            return None, False, 0, 0
+
+    def should_refresh_early(self, ttl_left, compute_time):
+        """XFetch: whether this hit should regenerate the entry before it expires."""
+        if self.beta <= 0 or compute_time <= 0:
+            return False
+        return -compute_time * self.beta * math.log(1.0 - random.random()) >= ttl_left
+
+    def lookup(self, model, system_prompt, user_prompt):
+        """
+        Return (text, refresh): the cached completion or None, and whether this caller
+        was picked to regenerate it early (text is then still the cached one).
+        """
+        if self.backend is None:
+            return None, False
+        text, expired, ttl_left, compute_time = self._read(
+            self.key(model, system_prompt, user_prompt))
+        if expired:
+            self.count('expired')
+        if text is None:
+            self.count('misses')
+            return None, False
+        if self.should_refresh_early(ttl_left, compute_time):
+            self.count('early_refreshes')
+            return text, True
+        self.count('hits')
+        return text, False
+
+    def get(self, model, system_prompt, user_prompt):
+        """Return the cached completion, or None on a miss or when due for an early refresh."""
+        text, refresh = self.lookup(model, system_prompt, user_prompt)
+        return None if refresh else text
+
+    def set(self, model, system_prompt, user_prompt, text, compute_time=0):
+        """Store a completion and how many seconds it took to generate."""
+        if self.backend is None:
+            return
+        try:
+            evicted = self.backend.set(self.key(model, system_prompt, user_prompt), model, text,
+                                       compute_time)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("LLM cache store failed: %s", e)
+            self.count('errors')
+            return
+        self.count('stored')
+        self.count('evicted', evicted)
+
+    @staticmethod
+    def _wait_limit():
+        """
+        Seconds to wait for another process generating the same key: at most
+        LLM_SINGLE_FLIGHT_LOCK_TIMEOUT, and no longer than the request's LLM budget.
+        """
+        limit = getattr(settings, 'LLM_SINGLE_FLIGHT_LOCK_TIMEOUT', 30)
+        budget = remaining_budget()
+        return limit if budget is None else min(limit, budget)
+
+    def _claim(self, key, refresh):
+        """
+        Claim the generation of `key` host-wide (see singleflight.try_lease), or wait
+        for the process that holds it to cache its answer.
+
+        Returns:
+            (leased, text): whether the caller holds the lease, and the text another
+            process generated meanwhile (None if the caller is to generate it).
+        """
+        leased = try_lease(key)
+        if refresh:
+            return leased, None
+        deadline = time.monotonic() + self._wait_limit()
+        interval = getattr(settings, 'LLM_SINGLE_FLIGHT_POLL_INTERVAL', 0.1)
+        while not leased and time.monotonic() < deadline:
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            text = self._read(key)[0]
+            if text is not None:
+                return False, text
+            leased = try_lease(key)
+        return leased, None
+
+    def _generate_once(self, model, system_prompt, user_prompt, generate, refresh):
+        """
+        Run generate() for a miss and cache its text, unless another process is
+        generating the same key: a miss then waits for that answer (generating it after
+        all if none comes in time), an early refresh leaves it to the other process and
+        returns None. Once the lease is held the cache is read again, in case another
+        process stored the entry just before.
+        """
+        key = self.key(model, system_prompt, user_prompt)
+        leased, text = self._claim(key, refresh)
+        if text is not None:
+            self.count('coalesced')
+            return text
+        if refresh and not leased:
+            return None
+        try:
+            if not refresh and self.backend is not None:
+                text = self._read(key)[0]
+                if text is not None:
+                    self.count('coalesced')
+                    return text
+            start = time.monotonic()
+            text = generate()
+            self.set(model, system_prompt, user_prompt, text, time.monotonic() - start)
+            return text
+        finally:
+            if leased:
+                release_lease(key)
+
+    def get_or_generate(self, model, system_prompt, user_prompt, generate):
+        """
+        Return the cached completion, or generate() it once for all concurrent callers
+        and cache it. Exceptions from generate() propagate to every waiting caller and
+        nothing is cached, except that a failed early refresh serves the cached text.
+        """
+        text, refresh = self.lookup(model, system_prompt, user_prompt)
+        if text is not None and not refresh:
+            return text
+        try:
+            generated = self._flights.do(
+                self.key(model, system_prompt, user_prompt),
+                lambda: self._generate_once(model, system_prompt, user_prompt, generate,
+                                            refresh))
+        except Exception:
+            if text is not None:
+                return text
+            raise
+        return text if generated is None else generated
+
+    async def _aclaim(self, key, refresh):
+        """Async _claim: the lease files are touched off the event loop."""
+        lease = sync_to_async(try_lease, thread_sensitive=False)
+        leased = await lease(key)
+        if refresh:
+            return leased, None
+        deadline = time.monotonic() + self._wait_limit()
+        interval = getattr(settings, 'LLM_SINGLE_FLIGHT_POLL_INTERVAL', 0.1)
+        while not leased and time.monotonic() < deadline:
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            text = (await sync_to_async(self._read)(key))[0]
+            if text is not None:
+                return False, text
+            leased = await lease(key)
+        return leased, None
+
+    async def aget_or_generate(self, model, system_prompt, user_prompt, agenerate):
+        """Async get_or_generate; `agenerate` is a coroutine function."""
+        text, refresh = await sync_to_async(self.lookup)(model, system_prompt, user_prompt)
+        if text is not None and not refresh:
+            return text
+        key = self.key(model, system_prompt, user_prompt)
+
+        async def generate_once():
+            leased, text = await self._aclaim(key, refresh)
+            if text is not None:
+                self.count('coalesced')
+                return text
+            if refresh and not leased:
+                return None
+            try:
+                if not refresh and self.backend is not None:
+                    text = (await sync_to_async(self._read)(key))[0]
+                    if text is not None:
+                        self.count('coalesced')
+                        return text
+                start = time.monotonic()
+                text = await agenerate()
+                await sync_to_async(self.set)(model, system_prompt, user_prompt, text,
+                                              time.monotonic() - start)
+                return text
+            finally:
+                if leased:
+                    await sync_to_async(release_lease, thread_sensitive=False)(key)
+
+        try:
+            generated = await self._async_flights.do(key, generate_once)
+        except Exception:
+            if text is not None:
+                return text
+            raise
+        return text if generated is None else generated
+
+
+_llm_cache = None
+
+
+def get_llm_cache():
+    """Return the process-wide LLMResponseCache configured from the LLM_CACHE_* settings."""
+    global _llm_cache  # pylint: disable=global-statement
+    if _llm_cache is None:
+        backend_name = getattr(settings, 'LLM_CACHE_BACKEND', 'db')
+        ttl = getattr(settings, 'LLM_CACHE_TTL', 7 * 24 * 60 * 60)
+        max_entries = getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 10000)
+        upkeep = {'touch_interval': getattr(settings, 'LLM_CACHE_TOUCH_INTERVAL', 60 * 60),
+                  'evict_every': getattr(settings, 'LLM_CACHE_EVICT_EVERY', 100)}
+        if backend_name == 'db':
+            backend = DatabaseLLMCacheBackend(ttl, max_entries, **upkeep)
+        elif backend_name == 'file':
+            backend = FileLLMCacheBackend(
+                getattr(settings, 'LLM_CACHE_DIR',
+                        os.path.join(tempfile.gettempdir(), 'llm_cache')),
+                ttl, max_entries, **upkeep)
+        else:
+            backend = None
+        _llm_cache = LLMResponseCache(backend, getattr(settings, 'LLM_CACHE_XFETCH_BETA', 1.0))
+    return _llm_cache
@@ -0,0 +1,322 @@
+"""
+Circuit breaker and per-request time budget for Groq calls.
+
+When Groq is down or slow, every slide item would otherwise wait out the full client
+timeout before showing its fallback text, and worker threads pile up behind it.
+Instead:
+
+- A process-wide CircuitBreaker watches the outcome and latency of recent calls.
+  Once enough of them fail (or take longer than LLM_BREAKER_SLOW_CALL seconds) it
+  opens, and for LLM_BREAKER_OPEN_SECONDS calls fail immediately with
+  CircuitOpenError. After that a single trial call is let through: if it succeeds
+  the breaker closes again, otherwise it stays open for another window. Only the
+  trial call itself decides; other calls that were already running when the breaker
+  opened do not.
+- Each request carries an overall LLM time budget (LLM_REQUEST_BUDGET seconds, set by
+  LLMBudgetMiddleware or llm_budget). Every call's timeout is cut to what is left of
+  it, and once it is spent calls fail with LLMBudgetExceeded. Streamed responses are
+  generated after the view (and the middleware) returned, so they apply their own
+  budget with budgeted().
+
+The create_groq_* helpers turn both errors into their usual fallback text (or serve a
+cached completion that was due for a refresh), so a slide degrades quickly.
+
+Classes:
+    - CircuitOpenError / LLMBudgetExceeded: raised instead of calling Groq.
+    - CircuitBreaker: closed/open/half-open breaker over a rolling window of calls.
+    - LLMBudgetMiddleware: gives every request an LLM_REQUEST_BUDGET.
+
+Functions:
+    - get_breaker: Return the process-wide CircuitBreaker.
+    - reset_breaker: Discard the process-wide CircuitBreaker.
+    - llm_budget: Context manager bounding the Groq time of the calls made inside it.
+    - remaining_budget: Seconds left in the current budget, or None.
+    - budgeted: Iterate a generator with its Groq calls under one budget.
+    - guarded_call: Context manager wrapping one Groq call in the breaker and the budget.
+    - guarded_stream: guarded_call for a streamed completion, including its reading.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .timing import timed
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_deadline = contextvars.ContextVar('llm_budget_deadline', default=None)
+
+
+class CircuitOpenError(Exception):
+    """Groq is failing; the call was not attempted."""
+
+
+class LLMBudgetExceeded(Exception):
+    """The request's time budget for Groq calls is spent; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Opens when at least `failure_rate` of the calls finished in the last `window`
+    seconds failed or were slower than `slow_call` seconds (once there were at least
+    `min_calls` of them), and stays open for `open_seconds`.
+
+    Parameters:
+        - window: seconds of call history considered
+        - min_calls: calls needed in the window before the breaker may open
+        - failure_rate: fraction of failed or slow calls that opens the breaker
+        - slow_call: seconds after which a successful call still counts as failed
+        - open_seconds: how long the breaker fails calls fast before a trial call
+    """
+
+    def __init__(self, window=30, min_calls=5, failure_rate=0.5, slow_call=10,
+                 open_seconds=30):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._state = CLOSED
+        self._opened_at = 0
+        self._trial = None
+        self.rejected = 0
+        self.opened = 0
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    @property
+    def state(self):
+        """CLOSED, OPEN or HALF_OPEN (open, but due for a trial call)."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """
+        Whether a call may go to Groq now; rejected calls are counted.
+
+        Returns:
+            False if the call is rejected, otherwise a token to pass to record(): the
+            trial call's token is what lets its outcome close or reopen the breaker.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if (time.monotonic() - self._opened_at >= self.open_seconds
+                    and self._trial is None):
+                self._trial = object()
+                return self._trial
+            self.rejected += 1
+            return False
+
+    def record(self, ok, elapsed, token=None):
+        """Record the outcome of a call that was allowed with the given allow() token."""
+        failed = not ok or elapsed > self.slow_call
+        now = time.monotonic()
+        with self._lock:
+            if token is not None and token is self._trial:
+                self._trial = None
+                if failed:
+                    self._opened_at = now
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                return
+            self._calls.append((now, failed, elapsed))
+            self._trim(now)
+            failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            if (self._state == CLOSED and len(self._calls) >= self.min_calls
+                    and failures >= self.failure_rate * len(self._calls)):
+                self._state = OPEN
+                self._opened_at = now
+                self.opened += 1
+
+    def stats(self):
+        """State, recent error rate and latency, and how often the breaker opened or rejected."""
+        state = self.state
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = list(self._calls)
+        failures = sum(1 for _, failed, _ in calls if failed)
+        return {
+            'state': state,
+            'calls': len(calls),
+            'error_rate': failures / len(calls) if calls else 0.0,
+            'average_latency': (sum(elapsed for _, _, elapsed in calls) / len(calls)
+                                if calls else 0.0),
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker():
+    """Return the process-wide CircuitBreaker configured from the LLM_BREAKER_* settings."""
+    global _breaker  # pylint: disable=global-statement
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                window=getattr(settings, 'LLM_BREAKER_WINDOW', 30),
+                min_calls=getattr(settings, 'LLM_BREAKER_MIN_CALLS', 5),
+                failure_rate=getattr(settings, 'LLM_BREAKER_FAILURE_RATE', 0.5),
+                slow_call=getattr(settings, 'LLM_BREAKER_SLOW_CALL', 10),
+                open_seconds=getattr(settings, 'LLM_BREAKER_OPEN_SECONDS', 30))
+        return _breaker
+
+
+def reset_breaker():
+    """Discard the process-wide breaker so the next call builds a closed one (used by tests)."""
+    global _breaker  # pylint: disable=global-statement
+    with _breaker_lock:
+        _breaker = None
+
+
+@contextmanager
+def llm_budget(seconds):
+    """
+    Give the Groq calls made inside the block (including those on executor threads
+    started with a copy of the context) `seconds` in total; None adds no limit. A
+    budget nested in a tighter one keeps the tighter deadline.
+    """
+    deadline = None if seconds is None else time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget():
+    """Seconds left in the current LLM budget (never negative), or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+
+def budgeted(iterable, seconds):
+    """
+    Iterate `iterable` with every step run under one llm_budget(seconds). The budget
+    is entered and left around each step rather than held across yields, so it also
+    holds for a generator consumed after its view returned (a streamed response).
+    """
+    deadline = None if seconds is None else time.monotonic() + seconds
+    iterator = iter(iterable)
+    while True:
+        with llm_budget(None if deadline is None else max(deadline - time.monotonic(), 0)):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def call_timeout(timeout=None):
+    """
+    The timeout for a Groq call: `timeout` (or GROQ_TIMEOUT) cut to the remaining
+    budget. Raises LLMBudgetExceeded if nothing is left.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'GROQ_TIMEOUT', 30)
+    remaining = remaining_budget()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise LLMBudgetExceeded("the request's time budget for Groq is spent")
+    return min(timeout, remaining)
+
+
+@contextmanager
+def guarded_call(timeout=None):
+    """
+    Wrap one Groq call: fail fast if the breaker is open or the budget is spent,
+    yield the timeout to use, and record the call's outcome and latency (also in the
+    request's 'groq' timing, see spotify_data/timing).
+    """
+    timeout = call_timeout(timeout)
+    breaker = get_breaker()
+    allowed = breaker.allow()
+    if not allowed:
+        raise CircuitOpenError("Groq is failing, not calling it for now")
+    start = time.monotonic()
+    ok = False
+    try:
+        with timed('groq'):
+            yield timeout
+        ok = True
+    finally:
+        breaker.record(ok, time.monotonic() - start, allowed)
+
+
+class _StreamCall:
+    """What guarded_stream yields: the timeout to use, and opened() to call once the
+    stream has started."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.start = time.monotonic()
+        self.latency = None
+
+    def opened(self):
+        """Note that the stream has started; its latency is measured until now."""
+        self.latency = time.monotonic() - self.start
+
+
+@contextmanager
+def guarded_stream(timeout=None):
+    """
+    guarded_call for a streamed completion: the block opens the stream and reads it
+    to the end, so a failure while reading counts against the breaker as well. The
+    latency recorded is the time until the block calls opened(), so a long answer
+    that streams steadily is not a slow call. Closing the block early (the client
+    went away) is not a failure.
+    """
+    call = _StreamCall(call_timeout(timeout))
+    breaker = get_breaker()
+    allowed = breaker.allow()
+    if not allowed:
+        raise CircuitOpenError("Groq is failing, not calling it for now")
+    ok = False
+    try:
+        yield call
+        ok = True
+    except GeneratorExit:
+        ok = True
+        raise
+    finally:
+        breaker.record(ok, time.monotonic() - call.start if call.latency is None
+                       else call.latency, allowed)
+
+
+class LLMBudgetMiddleware:
+    """Run every request under llm_budget(LLM_REQUEST_BUDGET); works for sync and async views."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with llm_budget(getattr(settings, 'LLM_REQUEST_BUDGET', 20)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with llm_budget(getattr(settings, 'LLM_REQUEST_BUDGET', 20)):
+            return await self.get_response(request)
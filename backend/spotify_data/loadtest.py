@@ -0,0 +1,326 @@
+"""
+End-to-end load test of the wrapped flow.
+
+Simulated users go through what the frontend does for a new account, over HTTP
+against a running backend:
+
+    register -> get-csrf-token -> get-auth-url -> (Spotify authorize) -> callback
+    -> updateuser -> addwrapped -> addduo -> display{artists,genres,tracks,quirky,summary}
+    for the solo and the duo wrap -> displayhistory
+
+`users` sessions run at once, each going through the flow `iterations` times with a
+fresh account; the duo wrap pairs the user with another simulated user who already
+has a Spotify snapshot. Every request's latency and status is recorded and
+summarize() turns them into throughput, p50/p95/p99 latency and error rate per
+endpoint, as JSON that can be compared between releases. The accounts are deleted
+(delete-account) once every session has finished, outside the measured run.
+
+The backend has to talk to the Spotify and Groq stand-ins (spotify_data/standins),
+not the real services: either start it with SPOTIFY_API_BASE_URL,
+SPOTIFY_ACCOUNTS_BASE_URL and GROQ_BASE_URL pointing at them, or let the load_test
+command start the stand-ins and serve the app in-process (start_app_server).
+
+Classes:
+    - Recorder: Thread-safe store of request timings.
+
+Functions:
+    - percentile: Percentile of a sorted list, interpolating between ranks.
+    - run_session: Take one simulated user through the flow.
+    - delete_account: Delete a simulated user's account.
+    - run_load_test: Run the simulated users and return the Recorder.
+    - summarize: Throughput, latency percentiles and error rates of a run.
+    - start_app_server: Serve the Django app on a background thread.
+"""
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import requests
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+
+SLIDES = ('artists', 'genres', 'tracks', 'quirky', 'summary')
+TERM_SELECTIONS = ('0', '1', '2')
+
+
+class StepFailed(Exception):
+    """A step the rest of the session depends on failed."""
+
+
+class Recorder:
+    """
+    Request timings of a load test, shared by the session threads.
+
+    Attributes:
+        - samples: (endpoint, seconds, status or None for a connection error, ok) tuples
+        - sessions: counts of 'completed' and 'failed' sessions
+        - wraps: number of solo and duo wraps created
+        - undeleted: accounts whose deletion failed
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+        self.sessions = {'completed': 0, 'failed': 0}
+        self.wraps = 0
+        self.undeleted = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, endpoint, seconds, status, ok):
+        """Record one request."""
+        with self._lock:
+            self.samples.append((endpoint, seconds, status, ok))
+
+    def count(self, name, amount=1):
+        """
+        Count finished sessions ('completed' or 'failed'), created wraps ('wraps') or
+        accounts that could not be deleted ('undeleted').
+        """
+        with self._lock:
+            if name in self.sessions:
+                self.sessions[name] += amount
+            else:
+                setattr(self, name, getattr(self, name) + amount)
+
+
+def percentile(values, q):
+    """
+    The `q`th percentile (0-100) of a sorted, non-empty list, interpolating linearly
+    between the two closest ranks.
+    """
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class _Session:
+    """One simulated user: a requests.Session against the backend that records every step."""
+
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def step(self, endpoint, method, path, expect=(200,), required=True, **kwargs):
+        """
+        Send one request and record it under `endpoint`. A response with a status
+        outside `expect` counts as an error and, if `required`, ends the session.
+        """
+        url = path if path.startswith('http') else self.base_url + path
+        start = time.monotonic()
+        try:
+            response = self.http.request(method, url, timeout=self.timeout,
+                                         allow_redirects=False, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.recorder.record(endpoint, time.monotonic() - start, None, False)
+            if required:
+                raise StepFailed(f'{endpoint}: {e}') from e
+            return None
+        ok = response.status_code in expect
+        self.recorder.record(endpoint, time.monotonic() - start, response.status_code, ok)
+        if not ok and required:
+            raise StepFailed(f'{endpoint}: HTTP {response.status_code}')
+        return response
+
+    def csrf_headers(self):
+        """Headers passing Django's CSRF check for a POST."""
+        return {'X-CSRFToken': self.http.cookies.get('csrftoken', '')}
+
+
+def _sign_up_and_link_spotify(session, username):
+    password = secrets.token_urlsafe(12)
+    session.step('register', 'POST', '/spotify/register/', data={
+        'username': username, 'email': f'{username}@example.com',
+        'password1': password, 'password2': password})
+    session.step('get-csrf-token', 'GET', '/spotify/get-csrf-token/')
+
+    # The backend redirects to Spotify's authorize page, which redirects to the
+    # frontend with a code; the frontend then hands the code to the callback
+    auth = session.step('get-auth-url', 'GET', '/spotify/get-auth-url/', expect=(302,))
+    try:
+        authorized = session.http.get(auth.headers['Location'], allow_redirects=False,
+                                      timeout=session.timeout)
+        query = parse_qs(urlsplit(authorized.headers['Location']).query)
+    except (requests.exceptions.RequestException, KeyError) as e:
+        raise StepFailed(f'Spotify authorize: {e}') from e
+    session.step('callback', 'GET', '/spotify/callback/', expect=(302,),
+                 params={'code': query['code'][0], 'state': query.get('state', [''])[0]})
+
+
+def _view_slides(session, wrap_id, is_duo):
+    suffix = ' duo' if is_duo else ''
+    for slide in SLIDES:
+        session.step(f'display{slide}{suffix}', 'GET', f'/spotify_data/display{slide}',
+                     required=False,
+                     params={'id': wrap_id, 'isDuo': 'true' if is_duo else 'false'})
+
+
+def run_session(base_url, username, recorder, partners, timeout=60):
+    """
+    Take one new user through the flow (see the module docstring).
+
+    Parameters:
+        - base_url: URL of the backend
+        - username: name of the account to create
+        - recorder: Recorder the requests are recorded in
+        - partners: shared list of usernames with a Spotify snapshot; the user is added
+          to it and one of the others is invited to the duo wrap
+        - timeout: seconds to wait for each response
+
+    Returns:
+        The user's session (logged in, unless registering failed), to delete the
+        account with. Whether the flow succeeded is counted in the recorder.
+    """
+    session = _Session(base_url, recorder, timeout)
+    try:
+        _sign_up_and_link_spotify(session, username)
+        session.step('updateuser', 'GET', '/spotify_data/updateuser')
+        partner = random.choice(partners) if partners else username
+        partners.append(username)
+
+        term = random.choice(TERM_SELECTIONS)
+        solo = session.step('addwrapped', 'GET', '/spotify_data/addwrapped/',
+                            params={'termselection': term}).json()['spotify_wrapped']
+        recorder.count('wraps')
+        duo = session.step('addduo', 'GET', '/spotify_data/addduo/', params={
+            'user1': username, 'user2': partner, 'termselection': term}).json()['duo_wrapped']
+        recorder.count('wraps')
+
+        _view_slides(session, solo['id'], False)
+        _view_slides(session, duo['id'], True)
+        session.step('displayhistory', 'GET', '/spotify_data/displayhistory', required=False)
+    except (StepFailed, ValueError, KeyError):
+        recorder.count('failed')
+        return session
+    recorder.count('completed')
+    return session
+
+
+def delete_account(session):
+    """Delete the account a session is logged in to; returns whether that succeeded."""
+    try:
+        response = session.http.post(session.base_url + '/spotify/delete-account/',
+                                     headers=session.csrf_headers(), timeout=session.timeout)
+        return response.status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+    finally:
+        session.http.close()
+
+
+def run_load_test(base_url, users=10, iterations=1, ramp_up=0, timeout=60, keep_data=False,
+                  prefix=None):
+    """
+    Run `users` simulated users at once, each going through the flow `iterations`
+    times, starting them evenly over `ramp_up` seconds.
+
+    Parameters:
+        - base_url: URL of the backend
+        - users: number of concurrent users
+        - iterations: sessions per user, each with a new account
+        - ramp_up: seconds over which the users are started
+        - timeout: seconds to wait for each response
+        - keep_data: keep the accounts instead of deleting them after the run
+        - prefix: start of the generated usernames (random by default)
+
+    Returns:
+        The Recorder with every request of the run.
+    """
+    prefix = prefix or f'lt{secrets.token_hex(3)}'
+    recorder = Recorder()
+    partners = []
+    sessions = []
+
+    def user(number):
+        time.sleep(ramp_up * number / users)
+        for iteration in range(iterations):
+            sessions.append(run_session(base_url, f'{prefix}u{number}i{iteration}', recorder,
+                                        partners, timeout))
+
+    with ThreadPoolExecutor(max_workers=users, thread_name_prefix='load-test') as executor:
+        list(executor.map(user, range(users)))
+        recorder.finished = time.monotonic()
+        if not keep_data:
+            recorder.count('undeleted', sum(not deleted for deleted in
+                                            executor.map(delete_account, sessions)))
+    return recorder
+
+
+def _latency_ms(seconds):
+    values = sorted(seconds)
+    return {
+        'mean': round(sum(values) / len(values) * 1000, 1),
+        'p50': round(percentile(values, 50) * 1000, 1),
+        'p95': round(percentile(values, 95) * 1000, 1),
+        'p99': round(percentile(values, 99) * 1000, 1),
+        'max': round(values[-1] * 1000, 1),
+    }
+
+
+def summarize(recorder):
+    """
+    Summarize a run.
+
+    Returns:
+        Dictionary with the run's duration, session counts, throughput (requests,
+        sessions and wraps per second), overall request and error counts, and per
+        endpoint the number of requests, errors, error rate, statuses and latency
+        percentiles in milliseconds.
+    """
+    duration = (recorder.finished or time.monotonic()) - recorder.started
+    endpoints = {}
+    for endpoint, seconds, status, ok in recorder.samples:
+        entry = endpoints.setdefault(endpoint, {'seconds': [], 'errors': 0, 'statuses': {}})
+        entry['seconds'].append(seconds)
+        entry['errors'] += not ok
+        status = str(status) if status is not None else 'connection_error'
+        entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+
+    errors = sum(1 for *_, ok in recorder.samples if not ok)
+    total = len(recorder.samples)
+    return {
+        'duration_seconds': round(duration, 3),
+        'sessions': dict(recorder.sessions),
+        'throughput': {
+            'requests_per_second': round(total / duration, 2) if duration else 0,
+            'sessions_per_second': round(recorder.sessions['completed'] / duration, 3)
+                                   if duration else 0,
+            'wraps_per_second': round(recorder.wraps / duration, 3) if duration else 0,
+        },
+        'requests': {'total': total, 'errors': errors,
+                     'error_rate': round(errors / total, 4) if total else 0},
+        'accounts_not_deleted': recorder.undeleted,
+        'endpoints': {
+            endpoint: {
+                'count': len(entry['seconds']),
+                'errors': entry['errors'],
+                'error_rate': round(entry['errors'] / len(entry['seconds']), 4),
+                'statuses': entry['statuses'],
+                'latency_ms': _latency_ms(entry['seconds']),
+            }
+            for endpoint, entry in endpoints.items()
+        },
+    }
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def start_app_server(host='127.0.0.1', port=0):
+    """
+    Serve the Django app with a threaded WSGI server on a daemon thread (like runserver,
+    without autoreload or request logging). Its URL is `server.base_url`; stop it with
+    shutdown().
+    """
+    server = ThreadedWSGIServer((host, port), _QuietRequestHandler)
+    server.set_app(get_wsgi_application())
+    server.base_url = f'http://{server.server_address[0]}:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True, name='load-test-app').start()
+    return server
@@ -0,0 +1,134 @@
+"""
+Management command that load-tests the wrapped flow end to end (spotify_data/loadtest).
+
+By default it starts the Spotify and Groq stand-ins and serves the app in-process
+pointed at them, using the configured database; the wraps the run creates are deleted
+afterwards unless --keep-data is given. With --target it drives an already running
+backend instead, which must itself be configured to use the stand-ins
+(SPOTIFY_API_BASE_URL, SPOTIFY_ACCOUNTS_BASE_URL, GROQ_BASE_URL) and to have CLIENT_ID,
+SCOPE and REDIRECT_URI set.
+
+The report is JSON (see loadtest.summarize) written to stdout or --output.
+
+Usage:
+    python manage.py load_test --users 20 --iterations 3 --output before.json
+    python manage.py load_test --users 20 --spotify-config '{"rate_limit_rate": 0.02}' \
+        --llm-config '{"latency_ms": 800, "error_rate": 0.05}'
+    python manage.py load_test --target http://127.0.0.1:8000 --users 50
+"""
+import json
+import os
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from spotify_data.groq_client import reset_groq_clients
+from spotify_data.loadtest import run_load_test, start_app_server, summarize
+from spotify_data.models import DuoWrapped, SpotifyWrapped
+from spotify_data.spotify_client import reset_spotify_client
+from spotify_data.standins.llm import start_llm_server
+from spotify_data.standins.spotify import start_spotify_server
+
+
+def _json_object(value):
+    try:
+        config = json.loads(value)
+    except ValueError as e:
+        raise CommandError(f"Not valid JSON: {value}") from e
+    if not isinstance(config, dict):
+        raise CommandError(f"Expected a JSON object: {value}")
+    return config
+
+
+class Command(BaseCommand):
+    """Simulate concurrent users creating and viewing wraps, and report latencies."""
+    help = "Load-test sign-up, Spotify linking, wrap creation and every slide endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10,
+                            help="Concurrent simulated users.")
+        parser.add_argument('--iterations', type=int, default=1,
+                            help="Sessions per user, each with a new account.")
+        parser.add_argument('--ramp-up', type=float, default=0,
+                            help="Seconds over which the users are started.")
+        parser.add_argument('--timeout', type=float, default=60,
+                            help="Seconds to wait for each response.")
+        parser.add_argument('--target',
+                            help="URL of a running backend (default: serve the app in-process).")
+        parser.add_argument('--spotify-config', type=_json_object, default={},
+                            help="JSON settings of the in-process Spotify stand-in.")
+        parser.add_argument('--llm-config', type=_json_object, default={},
+                            help="JSON settings of the in-process Groq stand-in.")
+        parser.add_argument('--keep-data', action='store_true',
+                            help="Keep the accounts and wraps the run creates.")
+        parser.add_argument('--output', help="File to write the JSON report to.")
+
+    def handle(self, *args, **options):
+        run = {
+            'users': options['users'],
+            'iterations': options['iterations'],
+            'ramp_up': options['ramp_up'],
+            'timeout': options['timeout'],
+            'keep_data': options['keep_data'],
+        }
+        report = {'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+        if options['target']:
+            report['target'] = options['target']
+            recorder = run_load_test(options['target'], **run)
+        else:
+            report['target'] = 'in-process'
+            recorder, report['standins'] = self._run_in_process(
+                run, options['spotify_config'], options['llm_config'])
+        report['config'] = {**run, 'spotify_config': options['spotify_config'],
+                            'llm_config': options['llm_config']}
+        report.update(summarize(recorder))
+
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(text + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(text)
+
+    def _run_in_process(self, run, spotify_config, llm_config):
+        """Run against the app served on a thread, with both stand-ins; returns the recorder
+        and the stand-ins' counters."""
+        try:
+            spotify = start_spotify_server(**spotify_config)
+            llm = start_llm_server(**llm_config)
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+        # The OAuth views read these from the environment; any value works with the stand-in
+        for name, value in (('CLIENT_ID', 'load-test'), ('CLIENT_SECRET', 'load-test'),
+                            ('SCOPE', 'user-read-private user-read-email user-top-read'),
+                            ('REDIRECT_URI', 'http://localhost:3000/callback')):
+            os.environ.setdefault(name, value)
+        prefix = f"lt{os.getpid() % 10000}"
+        app = None
+        try:
+            with override_settings(
+                    SPOTIFY_API_BASE_URL=spotify.base_url + '/v1',
+                    SPOTIFY_ACCOUNTS_BASE_URL=spotify.base_url,
+                    GROQ_BASE_URL=llm.base_url,
+                    GROQ_API_KEY=settings.GROQ_API_KEY or 'load-test',
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, '127.0.0.1']):
+                reset_spotify_client()
+                reset_groq_clients()
+                app = start_app_server()
+                self.stderr.write(f"Serving the app on {app.base_url} (Spotify stand-in "
+                                  f"{spotify.base_url}, Groq stand-in {llm.base_url})")
+                recorder = run_load_test(app.base_url, prefix=prefix, **run)
+        finally:
+            for server in (app, spotify, llm):
+                if server is not None:
+                    server.shutdown()
+                    server.server_close()
+            reset_spotify_client()
+            reset_groq_clients()
+
+        if not run['keep_data']:
+            SpotifyWrapped.objects.filter(user__startswith=prefix).delete()  # pylint: disable=no-member
+            DuoWrapped.objects.filter(user__startswith=prefix).delete()  # pylint: disable=no-member
+        return recorder, {'spotify': spotify.standin.snapshot()[1],
+                          'groq': llm.standin.snapshot()[1]}
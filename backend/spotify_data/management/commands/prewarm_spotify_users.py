@@ -0,0 +1,46 @@
+"""
+Management command that keeps active users' Spotify snapshots warm.
+
+Usage:
+    python manage.py prewarm_spotify_users            # one pass
+    python manage.py prewarm_spotify_users --loop     # keep running, one pass per interval
+"""
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from spotify_data.prewarm import active_spotify_users, prewarm_users
+
+
+class Command(BaseCommand):
+    """Refresh tokens and top-items snapshots of recently active users in batches."""
+    help = "Refresh the Spotify tokens and snapshots of recently active users in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--active-days', type=float,
+                            default=getattr(settings, 'SPOTIFY_PREWARM_ACTIVE_DAYS', 7),
+                            help="Only users who logged in within this many days.")
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'SPOTIFY_PREWARM_BATCH_SIZE', 10),
+                            help="Users whose Spotify calls run concurrently.")
+        parser.add_argument('--force', action='store_true',
+                            help="Refetch every term, even those still fresh.")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep running, starting a new pass every --interval seconds.")
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'SPOTIFY_PREWARM_INTERVAL', 5 * 60),
+                            help="Seconds between passes with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            users = active_spotify_users(timedelta(days=options['active_days']))
+            counts = prewarm_users(users.iterator(), batch_size=options['batch_size'],
+                                   force=options['force'])
+            self.stdout.write(
+                f"Pre-warmed Spotify snapshots: {counts['synced']} synced, "
+                f"{counts['skipped']} already fresh, {counts['failed']} failed "
+                f"in {time.monotonic() - started:.1f}s")
+            if not options['loop']:
+                return
+            time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
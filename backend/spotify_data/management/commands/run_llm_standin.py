@@ -0,0 +1,38 @@
+"""
+Management command that runs the local Groq stand-in (spotify_data/standins/llm).
+
+Usage:
+    python manage.py run_llm_standin --port 8100 --latency-ms 300 --error-rate 0.05
+    GROQ_BASE_URL=http://127.0.0.1:8100 GROQ_API_KEY=standin python manage.py runserver
+"""
+from django.core.management.base import BaseCommand
+from spotify_data.standins.llm import DEFAULTS, make_llm_server
+
+
+class Command(BaseCommand):
+    """Serve the chat-completions stand-in until interrupted."""
+    help = "Serve a local stand-in for Groq's chat-completions API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument('--verbose-requests', action='store_true',
+                            help="Log every request.")
+        for name, default in DEFAULTS.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", dest=name, default=default,
+                                type=int if name in ('words', 'seed') else float,
+                                help=f"Default: {default}.")
+
+    def handle(self, *args, **options):
+        config = {name: options[name] for name in DEFAULTS}
+        server = make_llm_server(options['host'], options['port'],
+                                 verbose=options['verbose_requests'], **config)
+        self.stdout.write(f"LLM stand-in listening on {server.base_url} "
+                          f"(set GROQ_BASE_URL={server.base_url})")
+        self.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,43 @@
+"""
+Management command that runs the local Spotify Web API stand-in (spotify_data/standins/spotify).
+
+Usage:
+    python manage.py run_spotify_standin --port 8200 --latency-ms 80 --rate-limit-rate 0.02
+    SPOTIFY_API_BASE_URL=http://127.0.0.1:8200/v1 \
+        SPOTIFY_ACCOUNTS_BASE_URL=http://127.0.0.1:8200 python manage.py runserver
+"""
+from django.core.management.base import BaseCommand
+from spotify_data.standins.spotify import DEFAULTS, make_spotify_server
+
+FLOAT_SETTINGS = ('latency_ms', 'latency_sigma', 'rate_limit_rate', 'expired_rate',
+                  'error_rate', 'retry_after', 'skew')
+
+
+class Command(BaseCommand):
+    """Serve the Spotify Web API stand-in until interrupted."""
+    help = "Serve a local stand-in for the Spotify Web API and accounts service."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8200)
+        parser.add_argument('--verbose-requests', action='store_true',
+                            help="Log every request.")
+        for name, default in DEFAULTS.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", dest=name, default=default,
+                                type=float if name in FLOAT_SETTINGS else int,
+                                help=f"Default: {default}.")
+
+    def handle(self, *args, **options):
+        config = {name: options[name] for name in DEFAULTS}
+        server = make_spotify_server(options['host'], options['port'],
+                                     verbose=options['verbose_requests'], **config)
+        self.stdout.write(f"Spotify stand-in listening on {server.base_url} "
+                          f"(set SPOTIFY_API_BASE_URL={server.base_url}/v1 and "
+                          f"SPOTIFY_ACCOUNTS_BASE_URL={server.base_url})")
+        self.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,38 @@
+"""
+Management command that pre-populates the shared artist and track descriptions.
+
+Usage:
+    python manage.py warm_entity_descriptions               # 500 top artists and tracks
+    python manage.py warm_entity_descriptions --top 2000 --kind artist
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from spotify_data.entities import ARTIST, TRACK, warm_entity_descriptions
+
+
+class Command(BaseCommand):
+    """Describe the artists and tracks found in the most SpotifyUser snapshots."""
+    help = "Describe the artists and tracks found in the most SpotifyUser snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int,
+                            default=getattr(settings, 'ENTITY_DESCRIPTION_WARM_TOP', 500),
+                            help="How many of the most common artists and tracks to describe.")
+        parser.add_argument('--kind', choices=[ARTIST, TRACK],
+                            help="Only describe artists or only tracks.")
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help="Entities described by one batched completion.")
+        parser.add_argument('--force', action='store_true',
+                            help="Regenerate descriptions that are still fresh.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        kinds = (options['kind'],) if options['kind'] else (ARTIST, TRACK)
+        counts = warm_entity_descriptions(settings.GROQ_API_KEY, options['top'],
+                                          batch_size=options['batch_size'],
+                                          force=options['force'], kinds=kinds)
+        self.stdout.write(
+            f"Entity descriptions: {counts['generated']} generated, "
+            f"{counts['fresh']} already fresh, {counts['failed']} failed "
+            f"in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0006_alter_duowrapped_datetime_created_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spotifyuser',
+            name='last_synced',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='spotifyuser',
+            name='synced_terms',
+            field=models.JSONField(blank=True, default=dict, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0007_spotifyuser_last_synced_spotifyuser_synced_terms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistMetadata',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_id', models.CharField(max_length=100, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('genres', models.JSONField(blank=True, default=list)),
+                ('popularity', models.IntegerField(default=0)),
+                ('image_url', models.URLField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,108 @@
+# One-off data migration: trim the Spotify objects already stored in JSONFields down
+# to the fields kept on ingest. The projection is a frozen copy of project_track /
+# project_artist in spotify_data/utils as of this migration, so that later changes to
+# them do not change what it does.
+
+from django.db import migrations
+
+TERMS = ('short', 'medium', 'long')
+BATCH_SIZE = 200
+TRACK_LISTS = {'favorite_tracks'}
+ARTIST_LISTS = {'favorite_artists', 'quirkiest_artists'}
+
+IMAGE_KEYS = ('url', 'height', 'width')
+ARTIST_KEYS = ('id', 'name', 'genres', 'popularity')
+ALBUM_KEYS = ('id', 'name', 'release_date')
+TRACK_KEYS = ('id', 'name', 'duration_ms', 'popularity')
+
+
+def project(item, keys):
+    """Copy the listed keys that are present in a Spotify object."""
+    return {key: item[key] for key in keys if key in item}
+
+
+def project_images(images):
+    """Keep the url and size of each image."""
+    return [project(image, IMAGE_KEYS) for image in images]
+
+
+def project_artist(artist):
+    """Keep id, name, genres, popularity and images of an artist."""
+    projected = project(artist, ARTIST_KEYS)
+    if 'images' in artist:
+        projected['images'] = project_images(artist['images'] or [])
+    return projected
+
+
+def project_track(track):
+    """Keep id, name, duration_ms, popularity, the artists and the album of a track."""
+    projected = project(track, TRACK_KEYS)
+    if 'artists' in track:
+        projected['artists'] = [project_artist(artist) for artist in track['artists']]
+    if track.get('album') is not None:
+        projected['album'] = project(track['album'], ALBUM_KEYS)
+        if 'images' in track['album']:
+            projected['album']['images'] = project_images(track['album']['images'] or [])
+    return projected
+
+
+def slim_items(field, items):
+    """Project a stored list of tracks or artists, leaving anything unexpected alone."""
+    if not isinstance(items, list):
+        return items
+    projection = project_track if field in TRACK_LISTS else project_artist
+    return [projection(item) if isinstance(item, dict) else item for item in items]
+
+
+def slim_wrap(wrap):
+    """Project the lists inside a serialized wrap (as stored in past_roasts)."""
+    if not isinstance(wrap, dict):
+        return wrap
+    return {key: slim_items(key, value) if key in TRACK_LISTS | ARTIST_LISTS else value
+            for key, value in wrap.items()}
+
+
+def slim_rows(model, fields, slim_row):
+    """Rewrite every row of a model in batches."""
+    batch = []
+    for row in model.objects.all().iterator(chunk_size=BATCH_SIZE):
+        slim_row(row)
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, fields)
+
+
+def slim_payloads(apps, schema_editor):
+    """Project SpotifyUser favorites and past roasts and the lists on every wrap."""
+    user_fields = [f'{field}_{term}' for term in TERMS
+                   for field in ('favorite_tracks', 'favorite_artists', 'quirkiest_artists')]
+
+    def slim_user(row):
+        for name in user_fields:
+            setattr(row, name, slim_items(name.rsplit('_', 1)[0], getattr(row, name)))
+        if isinstance(row.past_roasts, list):
+            row.past_roasts = [slim_wrap(wrap) for wrap in row.past_roasts]
+
+    def slim_wrapped(row):
+        for name in TRACK_LISTS | ARTIST_LISTS:
+            setattr(row, name, slim_items(name, getattr(row, name)))
+
+    slim_rows(apps.get_model('spotify_data', 'SpotifyUser'), user_fields + ['past_roasts'],
+              slim_user)
+    wrap_fields = sorted(TRACK_LISTS | ARTIST_LISTS)
+    slim_rows(apps.get_model('spotify_data', 'SpotifyWrapped'), wrap_fields, slim_wrapped)
+    slim_rows(apps.get_model('spotify_data', 'DuoWrapped'), wrap_fields, slim_wrapped)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0008_artistmetadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(slim_payloads, migrations.RunPython.noop),
+    ]
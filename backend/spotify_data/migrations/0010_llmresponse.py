@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0009_slim_stored_spotify_payloads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('model', models.CharField(max_length=100)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('last_used', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0010_llmresponse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='duowrapped',
+            name='slide_texts',
+            field=models.JSONField(blank=True, default=dict, null=True),
+        ),
+        migrations.AddField(
+            model_name='spotifywrapped',
+            name='slide_texts',
+            field=models.JSONField(blank=True, default=dict, null=True),
+        ),
+    ]
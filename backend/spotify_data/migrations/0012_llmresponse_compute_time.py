@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0011_wrapbase_slide_texts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmresponse',
+            name='compute_time',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-17 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0012_llmresponse_compute_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntityDescription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('artist', 'Artist'), ('track', 'Track')], max_length=10)),
+                ('spotify_id', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=255)),
+                ('text', models.TextField()),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'spotify_id'), name='unique_entity_description')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_data', '0013_entitydescription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='duowrapped',
+            name='slide_texts_pending_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='spotifywrapped',
+            name='slide_texts_pending_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -40,6 +40,9 @@ class SpotifyUser(models.Model):
         - llama_description: gives a description of how the user acts/thinks/dresses using an LLM
         - llama_songrecs: a string containing song recommendation as pulled from the LLM
         - past_roasts: a collection of past Spotify Roasts by this user
+        - last_synced: when any part of the Spotify snapshot was last fetched
+        - synced_terms: when each term ('short', 'medium', 'long') was last fetched,
+          as ISO timestamps; updateuser skips terms fetched within SPOTIFY_SYNC_TTL
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     spotify_id = models.CharField(max_length=100, unique=True)
@@ -61,6 +64,47 @@ class SpotifyUser(models.Model):
     quirkiest_artists_medium = models.JSONField(default=list, blank=True, null=True)
     quirkiest_artists_long = models.JSONField(default=list, blank=True, null=True)
     past_roasts = models.JSONField(default=list, blank=True, null=True)
+    last_synced = models.DateTimeField(blank=True, null=True)
+    synced_terms = models.JSONField(default=dict, blank=True, null=True)
+
+class ArtistMetadata(models.Model):
+    """
+    Local copy of the Spotify artist fields the app needs, shared by all users.
+    Filled in batches from the several-artists endpoint (see spotify_data/artists).
+
+    Parameters:
+        - spotify_id: Spotify artist id
+        - name: artist name
+        - genres: list of genre names
+        - popularity: Spotify popularity, 0 to 100
+        - image_url: the artist's smallest image, if any
+        - updated_at: when the row was last fetched from Spotify
+    """
+    spotify_id = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=255)
+    genres = models.JSONField(default=list, blank=True)
+    popularity = models.IntegerField(default=0)
+    image_url = models.URLField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class LLMResponse(models.Model):
+    """
+    A cached Groq completion (see spotify_data/llm_cache).
+
+    Parameters:
+        - key: sha256 of (model, system prompt, user prompt)
+        - model: the model that generated the text
+        - text: the completion
+        - created_at: when the completion was stored, for the TTL
+        - last_used: when it was last served, for LRU eviction
+        - compute_time: seconds the completion took, for early refresh
+    """
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    text = models.TextField()
+    created_at = models.DateTimeField()
+    last_used = models.DateTimeField(db_index=True)
+    compute_time = models.FloatField(default=0)
 
 class WrapBase(models.Model):
     """
@@ -75,6 +119,10 @@ class WrapBase(models.Model):
     quirkiest_artists = models.JSONField(default=list, blank=True, null=True)
     llama_description = models.TextField(blank=True, null=True)
     llama_songrecs = models.TextField(blank=True, null=True)
+    # LLM text of every slide, generated once after creation (see spotify_data/slides)
+    slide_texts = models.JSONField(default=dict, blank=True, null=True)
+    # Set while they are being generated in the background, so display views wait for them
+    slide_texts_pending_since = models.DateTimeField(blank=True, null=True)
     datetime_created = models.CharField(default=datetime_to_str(datetime.now()), max_length=50)
 
     class Meta:
@@ -94,3 +142,34 @@ class DuoWrapped(WrapBase):
     Model for Duo Wrapped.
     """
     user2 = models.CharField(max_length=100)  # Additional field for DuoWrapped
+
+class EntityDescription(models.Model):
+    """
+    LLM description of one artist or track, shared by every wrap that shows it
+    (see spotify_data/entities). The text depends only on the entity, so it is
+    generated once and reused until it is refreshed.
+
+    Parameters:
+        - kind: 'artist' or 'track'
+        - spotify_id: Spotify id of the artist or track
+        - name: what the prompt described (the artist name, or "<track> by <artist>")
+        - text: the description
+        - version: entities.DESCRIPTION_VERSION when it was generated; older versions
+          are regenerated
+        - updated_at: when it was generated, for ENTITY_DESCRIPTION_TTL
+    """
+    ARTIST = 'artist'
+    TRACK = 'track'
+    KINDS = [(ARTIST, 'Artist'), (TRACK, 'Track')]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    spotify_id = models.CharField(max_length=100)
+    name = models.CharField(max_length=255)
+    text = models.TextField()
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        '''Meta'''
+        constraints = [models.UniqueConstraint(fields=['kind', 'spotify_id'],
+                                               name='unique_entity_description')]
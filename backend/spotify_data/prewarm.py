@@ -0,0 +1,140 @@
+"""
+Background pre-warming of SpotifyUser snapshots.
+
+Recently active users have their access tokens refreshed and their stale terms
+refetched ahead of time, so that updateuser finds a fresh snapshot and returns
+without calling Spotify. Users are synced in batches: each batch's Spotify calls run
+together on the shared executor at LOW priority, so they leave the rate limiter's
+low-priority headroom to the web workers' user-facing requests even though the
+command runs in its own process; the results are written back with one bulk_update.
+
+Functions:
+    - active_spotify_users: SpotifyUsers whose Django user logged in recently.
+    - prewarm_batch: Refresh tokens and snapshots for one batch of users.
+    - prewarm_users: Pre-warm users batch by batch and report what happened.
+"""
+import logging
+from django.conf import settings
+from django.utils import timezone
+from accounts.utils import get_user_tokens, is_spotify_authenticated
+from .artists import get_term_track_artists
+from .models import SpotifyUser
+from .ratelimit import LOW, request_priority
+from .utils import (TERMS, build_spotify_user_snapshot, get_spotify_user_data,
+                    get_stale_terms, get_user_favorite_artists, get_user_favorite_tracks,
+                    run_concurrently)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ['email', 'profile_image_url', 'last_synced', 'synced_terms'] + [
+    f'{field}_{term}' for term in TERMS
+    for field in ('favorite_tracks', 'favorite_artists', 'favorite_genres', 'quirkiest_artists')
+]
+
+
+def active_spotify_users(active_within):
+    """
+    Return the SpotifyUsers whose Django user logged in within `active_within`.
+
+    Parameters:
+        - active_within: a timedelta, e.g. timedelta(days=7)
+    """
+    cutoff = timezone.now() - active_within
+    return (SpotifyUser.objects  # pylint: disable=no-member
+            .filter(user__last_login__gte=cutoff)
+            .select_related('user')
+            .order_by('last_synced', 'id'))
+
+
+def _refresh_token(username):
+    """Refresh the user's access token if it expired; return it, or None on failure."""
+    try:
+        if not is_spotify_authenticated(username):
+            return None
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.warning("Could not refresh the Spotify token of %s: %s", username, e)
+        return None
+    return get_user_tokens(username).access_token
+
+
+def prewarm_batch(spotify_users, force=False, deadline=None):
+    """
+    Refresh the tokens and stale terms of a batch of users and bulk_update the results.
+
+    Parameters:
+        - spotify_users: the SpotifyUsers to sync
+        - force: refetch every term, even those still within SPOTIFY_SYNC_TTL
+        - deadline: seconds to wait for the batch's Spotify calls
+
+    Returns:
+        Dictionary with the number of users 'synced', 'skipped' (already fresh)
+        and 'failed' (no token, or a Spotify call failed).
+    """
+    counts = {'synced': 0, 'skipped': 0, 'failed': 0}
+    plans = {}
+    calls = {}
+    for spotify_user in spotify_users:
+        terms = list(TERMS) if force else get_stale_terms(spotify_user)
+        if not terms:
+            counts['skipped'] += 1
+            continue
+        username = spotify_user.user.username
+        access_token = _refresh_token(username)
+        if access_token is None:
+            counts['failed'] += 1
+            continue
+        plans[spotify_user.pk] = (spotify_user, terms, access_token)
+        calls[f'{spotify_user.pk}:user_data'] = (get_spotify_user_data, (access_token,))
+        for term in terms:
+            term_args = (access_token, f'{term}_term', username)
+            calls[f'{spotify_user.pk}:tracks_{term}'] = (get_user_favorite_tracks, term_args)
+            calls[f'{spotify_user.pk}:artists_{term}'] = (get_user_favorite_artists, term_args)
+
+    with request_priority(LOW):
+        results = run_concurrently(calls, deadline=deadline)
+
+    synced = []
+    for pk, (spotify_user, terms, access_token) in plans.items():
+        user_results = {name.split(':', 1)[1]: result for name, result in results.items()
+                        if name.startswith(f'{pk}:')}
+        if not user_results['user_data'] or any(result is None
+                                                for result in user_results.values()):
+            counts['failed'] += 1
+            continue
+        with request_priority(LOW):
+            track_artists = get_term_track_artists(access_token, user_results, terms)
+        snapshot = build_spotify_user_snapshot(user_results['user_data'], user_results,
+                                               terms, spotify_user.synced_terms, track_artists)
+        for field in SNAPSHOT_FIELDS:
+            if field in snapshot:
+                setattr(spotify_user, field, snapshot[field])
+        synced.append(spotify_user)
+
+    if synced:
+        SpotifyUser.objects.bulk_update(synced, SNAPSHOT_FIELDS)  # pylint: disable=no-member
+    counts['synced'] = len(synced)
+    return counts
+
+
+def prewarm_users(spotify_users, batch_size=None, force=False, deadline=None):
+    """
+    Pre-warm users in batches of `batch_size` (SPOTIFY_PREWARM_BATCH_SIZE by default).
+
+    Returns:
+        Dictionary with the total number of users synced, skipped and failed.
+    """
+    batch_size = batch_size or getattr(settings, 'SPOTIFY_PREWARM_BATCH_SIZE', 10)
+    deadline = deadline or getattr(settings, 'SPOTIFY_PREWARM_DEADLINE', 60)
+    totals = {'synced': 0, 'skipped': 0, 'failed': 0}
+    batch = []
+    for spotify_user in spotify_users:
+        batch.append(spotify_user)
+        if len(batch) == batch_size:
+            for name, count in prewarm_batch(batch, force, deadline).items():
+                totals[name] += count
+            batch = []
+    if batch:
+        for name, count in prewarm_batch(batch, force, deadline).items():
+            totals[name] += count
+    return totals
+
@@ -0,0 +1,127 @@
+"""
+Compact rendering of the music data put into Groq prompts.
+
+The prompt helpers in spotify_data/utils render their subjects (artist names, artist
+dicts or lists of them) through render_subject: each artist becomes its name plus
+its top genres and popularity, leaving out the image URLs, hrefs and follower counts
+the model does not need, and the list is cut to LLM_PROMPT_MAX_ITEMS items and
+LLM_PROMPT_MAX_CHARS characters. The size of every prompt sent to Groq is recorded
+and reported by prompt_stats.
+
+Functions:
+    - render_artist: "Name (genre, genre; popularity N)" for one artist.
+    - render_subject: Compact text for a string, an artist, or a list of either.
+    - estimate_tokens: Rough token count of a prompt.
+    - record_prompt: Record the size of a prompt sent to Groq.
+    - prompt_stats: Sizes of the prompts sent by this process.
+"""
+import logging
+import math
+import threading
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ARTIST_GENRES = 2
+SEPARATOR = '; '
+
+_lock = threading.Lock()
+_stats = {'prompts': 0, 'chars': 0, 'tokens': 0, 'max_tokens': 0, 'truncated': 0}
+
+
+def render_artist(artist):
+    """
+    Name of an artist dict followed by its first genres and popularity, when known,
+    e.g. "Phoebe Bridgers (indie pop, sad girl; popularity 74)".
+    """
+    details = []
+    if artist.get('genres'):
+        details.append(', '.join(artist['genres'][:ARTIST_GENRES]))
+    if artist.get('popularity') is not None:
+        details.append(f"popularity {artist['popularity']}")
+    name = artist.get('name', '')
+    return f"{name} ({'; '.join(details)})" if details else name
+
+
+def _render_item(item):
+    return render_artist(item) if isinstance(item, dict) else str(item)
+
+
+def render_subject(subject, max_items=None, max_chars=None):
+    """
+    Render what a prompt is about: strings are kept as they are, artist dicts are
+    reduced with render_artist, and lists keep their first `max_items` entries
+    (LLM_PROMPT_MAX_ITEMS) joined with '; '. The result is cut to `max_chars`
+    (LLM_PROMPT_MAX_CHARS), dropping whole list entries where possible.
+    """
+    if max_items is None:
+        max_items = getattr(settings, 'LLM_PROMPT_MAX_ITEMS', 10)
+    if max_chars is None:
+        max_chars = getattr(settings, 'LLM_PROMPT_MAX_CHARS', 1000)
+
+    if not isinstance(subject, (list, tuple)):
+        text = _render_item(subject)
+        if len(text) <= max_chars:
+            return text
+        _count_truncated()
+        return text[:max_chars].rstrip()
+
+    rendered = []
+    length = 0
+    truncated = len(subject) > max_items
+    for item in subject[:max_items]:
+        text = _render_item(item)
+        added = len(text) + (len(SEPARATOR) if rendered else 0)
+        if length + added > max_chars:
+            if not rendered:
+                rendered.append(text[:max_chars].rstrip())
+            truncated = True
+            break
+        rendered.append(text)
+        length += added
+    if truncated:
+        _count_truncated()
+    return SEPARATOR.join(rendered)
+
+
+def _count_truncated():
+    with _lock:
+        _stats['truncated'] += 1
+
+
+def estimate_tokens(text):
+    """
+    Approximate number of tokens in `text` (about four characters per token for
+    English with Llama-style tokenizers), good enough for sizing prompts.
+    """
+    return math.ceil(len(text) / 4)
+
+
+def record_prompt(system_prompt, user_prompt):
+    """
+    Record the size of one prompt sent to Groq and log it at debug level.
+
+    Returns:
+        The estimated number of input tokens.
+    """
+    chars = len(system_prompt) + len(user_prompt)
+    tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+    with _lock:
+        _stats['prompts'] += 1
+        _stats['chars'] += chars
+        _stats['tokens'] += tokens
+        _stats['max_tokens'] = max(_stats['max_tokens'], tokens)
+    logger.debug("Groq prompt: %d characters, ~%d tokens", chars, tokens)
+    return tokens
+
+
+def prompt_stats():
+    """
+    Return the number of prompts this process sent, their total characters and
+    estimated tokens, the largest prompt, and how many subjects render_subject cut
+    to fit the caps.
+    """
+    with _lock:
+        stats = dict(_stats)
+    stats['average_tokens'] = stats['tokens'] / stats['prompts'] if stats['prompts'] else 0
+    return stats
@@ -0,0 +1,283 @@
+"""
+Shared, 429-aware rate limiting for outbound Spotify Web API calls.
+
+All worker processes draw from one token bucket whose state lives in a small JSON
+file guarded by an exclusive file lock, so together they stay under the app's
+Spotify quota. Within a process, callers waiting for a token are served in priority
+order. Across processes, LOW-priority callers (background work such as the
+prewarm_spotify_users command) may not take the last `low_priority_headroom` tokens
+of the bucket, which stay available to user-facing requests in the web workers. When
+Spotify answers 429, the Retry-After delay is written to the shared state so every
+process backs off.
+
+Classes:
+    - FileTokenBucket: token bucket shared between processes through a lock file.
+    - SpotifyRequestScheduler: priority queue in front of the bucket, with counters.
+
+Functions:
+    - get_scheduler: Return the process-wide SpotifyRequestScheduler.
+    - request_priority: Context manager setting the priority of calls made inside it.
+    - retry_after_seconds: Parse the Retry-After header of a 429 response.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: the bucket is then only shared between threads of one process
+    fcntl = None
+
+HIGH = 0
+NORMAL = 5
+LOW = 10
+
+_priority = contextvars.ContextVar('spotify_request_priority', default=NORMAL)
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Run the enclosed Spotify calls at the given priority (HIGH, NORMAL or LOW).
+    Lower numbers are served first when callers queue for the rate limit.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    """Priority of Spotify calls made from the current context."""
+    return _priority.get()
+
+
+def retry_after_seconds(response, default=1):
+    """Seconds to wait before retrying, from a 429 response's Retry-After header."""
+    try:
+        return max(float(response.headers.get('Retry-After')), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+class FileTokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `capacity`, with its state
+    stored in `path` so that every process using the same file shares one budget.
+
+    Parameters:
+        - path: the JSON state file (created on first use)
+        - rate: tokens added per second (the sustained request rate)
+        - capacity: maximum tokens stored (the allowed burst)
+        - low_priority_headroom: tokens LOW-priority callers leave in the bucket
+    """
+
+    def __init__(self, path, rate, capacity, low_priority_headroom=0):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity
+        self.low_priority_headroom = min(max(low_priority_headroom, 0), capacity - 1)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked_state(self):
+        """Yield the shared state dict under an exclusive lock and write it back afterwards."""
+        with self._thread_lock, open(self.path, 'a+', encoding='utf-8') as state_file:
+            if fcntl is not None:
+                fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                try:
+                    state = json.loads(state_file.read() or '{}')
+                except ValueError:
+                    state = {}
+                yield state
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(json.dumps(state))
+                state_file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    def reserve(self, priority=NORMAL):
+        """
+        Take one token if one is available to a caller of this priority: LOW callers
+        need `low_priority_headroom` tokens to remain after theirs.
+
+        Returns:
+            0 if a token was taken, otherwise the number of seconds until one will be
+            (including any Retry-After back-off currently in force).
+        """
+        needed = 1 + (self.low_priority_headroom if priority >= LOW else 0)
+        now = time.time()
+        with self._locked_state() as state:
+            blocked_until = state.get('blocked_until', 0)
+            if blocked_until > now:
+                return blocked_until - now
+            elapsed = max(now - state.get('updated', now), 0)
+            tokens = min(self.capacity, state.get('tokens', self.capacity) + elapsed * self.rate)
+            state['updated'] = now
+            if tokens >= needed:
+                state['tokens'] = tokens - 1
+                return 0
+            state['tokens'] = tokens
+            return (needed - tokens) / self.rate
+
+    def block_for(self, seconds):
+        """Stop handing out tokens in every process for the next `seconds` seconds."""
+        until = time.time() + seconds
+        with self._locked_state() as state:
+            state['blocked_until'] = max(state.get('blocked_until', 0), until)
+            state['tokens'] = 0
+            state['updated'] = until
+
+
+class SpotifyRequestScheduler:
+    """
+    Paces Spotify calls through a FileTokenBucket.
+
+    Waiting callers in this process are queued by priority; only the caller at the
+    head of the queue may take the next token. Callers that would wait longer than
+    `max_wait` seconds give up so that a user-facing request is not held forever.
+
+    Parameters:
+        - bucket: the shared FileTokenBucket
+        - max_wait: longest a caller waits for a token, in seconds
+        - max_retries: how many times a request answered with 429 is retried
+    """
+
+    def __init__(self, bucket, max_wait=30, max_retries=2):
+        self.bucket = bucket
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.counters = {'requests': 0, 'queued': 0, 'throttled': 0, 'retried': 0,
+                         'gave_up': 0}
+
+    def count(self, name, amount=1):
+        """Increment one of the counters."""
+        with self._condition:
+            self.counters[name] += amount
+
+    def stats(self):
+        """Return a copy of the counters plus the current queue length."""
+        with self._condition:
+            return {**self.counters, 'waiting': len(self._waiters)}
+
+    def acquire(self, priority=None):
+        """
+        Block until this caller may send one request.
+
+        Only the head of the queue takes tokens, and it does so without holding the
+        queue's condition: the bucket's file lock can be slow under contention, and the
+        other threads must still be able to join or leave the queue meanwhile.
+
+        Returns:
+            True once a token was taken, False if it would take longer than max_wait.
+        """
+        priority = current_priority() if priority is None else priority
+        deadline = time.monotonic() + self.max_wait
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+        queued = False
+        try:
+            while True:
+                with self._condition:
+                    while self._waiters[0] != entry:
+                        if not queued:
+                            queued = True
+                            self.counters['queued'] += 1
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.counters['gave_up'] += 1
+                            return False
+                        self._condition.wait(timeout=remaining)
+                wait = self.bucket.reserve(priority)
+                if wait <= 0:
+                    self.count('requests')
+                    return True
+                with self._condition:
+                    if not queued:
+                        queued = True
+                        self.counters['queued'] += 1
+                    if wait > deadline - time.monotonic():
+                        self.counters['gave_up'] += 1
+                        return False
+                    self._condition.wait(timeout=wait)
+        finally:
+            with self._condition:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    async def aacquire(self, priority=None):
+        """
+        Async acquire(): sleep on the event loop until a token is available.
+        Async callers are paced by the same shared bucket (and its LOW-priority
+        headroom) but are not queued in priority order; the bucket's file is read and
+        locked on a worker thread, off the event loop.
+        """
+        priority = current_priority() if priority is None else priority
+        deadline = time.monotonic() + self.max_wait
+        queued = False
+        while True:
+            wait = await sync_to_async(self.bucket.reserve, thread_sensitive=False)(priority)
+            if wait <= 0:
+                self.count('requests')
+                return True
+            if not queued:
+                queued = True
+                self.count('queued')
+            if time.monotonic() + wait > deadline:
+                self.count('gave_up')
+                return False
+            await asyncio.sleep(wait)
+
+    def throttled(self, response):
+        """Record a 429 response and make every process honor its Retry-After."""
+        self.count('throttled')
+        self.bucket.block_for(retry_after_seconds(response))
+
+    async def athrottled(self, response):
+        """Async throttled(): writes the back-off to the shared state off the event loop."""
+        self.count('throttled')
+        await sync_to_async(self.bucket.block_for, thread_sensitive=False)(
+            retry_after_seconds(response))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide SpotifyRequestScheduler configured from SPOTIFY_RATE_LIMIT_*."""
+    global _scheduler  # pylint: disable=global-statement
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                bucket = FileTokenBucket(
+                    getattr(settings, 'SPOTIFY_RATE_LIMIT_STATE_FILE',
+                            os.path.join(tempfile.gettempdir(), 'spotify_ratelimit.json')),
+                    rate=getattr(settings, 'SPOTIFY_RATE_LIMIT_PER_SECOND', 10),
+                    capacity=getattr(settings, 'SPOTIFY_RATE_LIMIT_BURST', 20),
+                    low_priority_headroom=getattr(
+                        settings, 'SPOTIFY_RATE_LIMIT_LOW_PRIORITY_HEADROOM', 5))
+                _scheduler = SpotifyRequestScheduler(
+                    bucket,
+                    max_wait=getattr(settings, 'SPOTIFY_RATE_LIMIT_MAX_WAIT', 30),
+                    max_retries=getattr(settings, 'SPOTIFY_RATE_LIMIT_RETRIES', 2))
+    return _scheduler
@@ -0,0 +1,224 @@
+"""
+Conditional-request (ETag / If-None-Match) cache for Spotify Web API responses.
+
+Responses are stored in the Django cache under a key derived from
+(user, endpoint, params) together with the ETag Spotify sent. Later requests for
+the same key are answered according to the entry's age:
+
+    - younger than SPOTIFY_CACHE_FRESH_SECONDS: served from the cache, no request
+    - within the following SPOTIFY_CACHE_STALE_SECONDS: served from the cache while
+      a conditional request revalidates it in the background (stale-while-revalidate)
+    - older: a conditional request is sent and a 304 serves the cached body
+
+Classes:
+    - CachedResponse: minimal stand-in for a response served from the cache.
+    - SpotifyResponseCache: stores entries and decides how each lookup is served.
+
+Functions:
+    - get_response_cache: Return the process-wide SpotifyResponseCache.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import caches
+
+FRESH = 'fresh'
+STALE = 'stale'
+REVALIDATE = 'revalidate'
+
+
+class CachedResponse:
+    """
+    Response-like object for a body served from the cache, so callers can keep
+    checking `status_code` and calling `json()` as they do for live responses.
+    """
+
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self):
+        """Return the cached JSON body."""
+        return self.body
+
+
+class SpotifyResponseCache:
+    """
+    ETag cache for Spotify GET responses.
+
+    Parameters:
+        - alias: name of the Django cache (settings.CACHES) entries are stored in
+        - fresh_for: seconds an entry is served without contacting Spotify
+        - stale_for: further seconds an entry is served while it is revalidated
+        - timeout: seconds an entry (and its ETag) is kept at all
+    """
+
+    def __init__(self, alias='default', fresh_for=0, stale_for=0, timeout=24 * 60 * 60):
+        self.alias = alias
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._tasks = set()
+        self._executor = None
+        self.counters = {'fresh_hits': 0, 'stale_hits': 0, 'not_modified': 0,
+                         'misses': 0, 'stored': 0}
+
+    @property
+    def cache(self):
+        """The Django cache backend entries live in."""
+        return caches[self.alias]
+
+    @staticmethod
+    def key(user_key, path, params=None):
+        """Cache key for one (user, endpoint, params) combination."""
+        raw = json.dumps([user_key, path, params or {}], sort_keys=True, default=str)
+        return 'spotify_response:' + hashlib.sha256(raw.encode()).hexdigest()
+
+    def count(self, name):
+        """Increment one of the hit/miss counters."""
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """Return a copy of the hit/miss counters."""
+        with self._lock:
+            return dict(self.counters)
+
+    def plan(self, entry):
+        """Decide how a lookup is served: FRESH, STALE or REVALIDATE."""
+        if entry is None:
+            return REVALIDATE
+        age = time.time() - entry['stored_at']
+        if age < self.fresh_for:
+            return FRESH
+        if age < self.fresh_for + self.stale_for:
+            return STALE
+        return REVALIDATE
+
+    @staticmethod
+    def conditional_headers(entry):
+        """If-None-Match header for an entry, if it has an ETag."""
+        if entry and entry.get('etag'):
+            return {'If-None-Match': entry['etag']}
+        return {}
+
+    def new_entry(self, response, entry):
+        """
+        Work out what to cache after a (conditional) request.
+
+        Returns:
+            (result, entry_to_store): the response-like object to hand back to the
+            caller and the entry to write to the cache (None to leave it alone).
+        """
+        if response.status_code == 304 and entry is not None:
+            self.count('not_modified')
+            return CachedResponse(entry['body']), {**entry, 'stored_at': time.time()}
+        self.count('misses')
+        etag = response.headers.get('ETag')
+        if response.status_code == 200 and isinstance(etag, str):
+            self.count('stored')
+            body = response.json()
+            return (CachedResponse(body),
+                    {'etag': etag, 'body': body, 'stored_at': time.time()})
+        return response, None
+
+    def fetch(self, key, send):
+        """
+        Serve one GET through the cache.
+
+        Parameters:
+            - key: the entry's cache key (see key())
+            - send: function taking extra request headers and returning a response
+
+        Returns:
+            A CachedResponse, or the live response when it could not be cached.
+        """
+        entry = self.cache.get(key)
+        plan = self.plan(entry)
+        if plan == FRESH:
+            self.count('fresh_hits')
+            return CachedResponse(entry['body'])
+        if plan == STALE:
+            self.count('stale_hits')
+            self._revalidate_later(key, entry, send)
+            return CachedResponse(entry['body'])
+
+        result, new_entry = self.new_entry(send(self.conditional_headers(entry)), entry)
+        if new_entry is not None:
+            self.cache.set(key, new_entry, self.timeout)
+        return result
+
+    async def afetch(self, key, send):
+        """Async fetch(): `send` is a coroutine function taking extra request headers."""
+        entry = await self.cache.aget(key)
+        plan = self.plan(entry)
+        if plan == FRESH:
+            self.count('fresh_hits')
+            return CachedResponse(entry['body'])
+        if plan == STALE:
+            self.count('stale_hits')
+            with self._lock:
+                if key not in self._revalidating:
+                    self._revalidating.add(key)
+                    task = asyncio.ensure_future(self._arevalidate(key, entry, send))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            return CachedResponse(entry['body'])
+
+        result, new_entry = self.new_entry(await send(self.conditional_headers(entry)), entry)
+        if new_entry is not None:
+            await self.cache.aset(key, new_entry, self.timeout)
+        return result
+
+    async def _arevalidate(self, key, entry, send):
+        """Refresh a stale entry from a background asyncio task."""
+        try:
+            _, new_entry = self.new_entry(await send(self.conditional_headers(entry)), entry)
+            if new_entry is not None:
+                await self.cache.aset(key, new_entry, self.timeout)
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    def _revalidate_later(self, key, entry, send):
+        """Refresh a stale entry on a background thread (at most once at a time per key)."""
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2,
+                                                    thread_name_prefix='spotify-revalidate')
+
+        def revalidate():
+            try:
+                _, new_entry = self.new_entry(send(self.conditional_headers(entry)), entry)
+                if new_entry is not None:
+                    self.cache.set(key, new_entry, self.timeout)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        self._executor.submit(revalidate)
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Return the process-wide SpotifyResponseCache configured from the SPOTIFY_CACHE_* settings."""
+    global _response_cache  # pylint: disable=global-statement
+    if _response_cache is None:
+        _response_cache = SpotifyResponseCache(
+            alias=getattr(settings, 'SPOTIFY_CACHE_ALIAS', 'default'),
+            fresh_for=getattr(settings, 'SPOTIFY_CACHE_FRESH_SECONDS', 0),
+            stale_for=getattr(settings, 'SPOTIFY_CACHE_STALE_SECONDS', 0),
+            timeout=getattr(settings, 'SPOTIFY_CACHE_TIMEOUT', 24 * 60 * 60),
+        )
+    return _response_cache
@@ -0,0 +1,150 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+Popular artists appear in many wraps, so the same Groq prompt is often asked for by
+several requests at once. Callers that share a key share one call instead: within a
+process, followers wait for the leader's result (SingleFlight for threads,
+AsyncSingleFlight for one event loop); across processes, the leader claims the key
+by creating its lease file (try_lease), and the leaders of other processes poll the
+cache for its answer instead of asking Groq again. Nothing is locked while Groq
+generates, so unrelated keys never wait on each other.
+
+Classes:
+    - SingleFlight: Run one call per key at a time across threads; share its result.
+    - AsyncSingleFlight: The same for coroutines on one event loop.
+
+Functions:
+    - try_lease: Claim the generation of a key for this process, host-wide.
+    - release_lease: Give up a claim.
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import weakref
+from django.conf import settings
+
+
+class _Call:
+    """A call in flight: followers wait on `event`, then read `result` or `error`."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key. The first caller (the leader) runs
+    the function; callers arriving while it runs wait and get its result, or its
+    exception, instead of running the function themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, function):
+        """Return function(), sharing one run among concurrent callers with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: one run per key per event loop."""
+
+    def __init__(self):
+        self._loops = weakref.WeakKeyDictionary()
+        self.shared = 0
+
+    async def do(self, key, function):
+        """Return await function(), sharing one run among concurrent callers with the same key."""
+        calls = self._loops.setdefault(asyncio.get_running_loop(), {})
+        future = calls.get(key)
+        if future is not None:
+            self.shared += 1
+            # Shielded so that a cancelled follower does not cancel the leader's call
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(function())
+        calls[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                calls.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: calls.pop(key, None))
+
+
+def _lease_path(key):
+    """Lease file of a key; it only exists while some process is generating the key."""
+    directory = getattr(settings, 'LLM_SINGLE_FLIGHT_LOCK_DIR',
+                        os.path.join(tempfile.gettempdir(), 'llm_single_flight'))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{key}.lease')
+
+
+def try_lease(key):
+    """
+    Claim the generation of `key` (a hex digest) for this process, host-wide. The
+    claim is the atomic creation of the key's lease file, so nothing stays locked while
+    the caller generates; it ends with release_lease(), or is treated as abandoned
+    once older than LLM_SINGLE_FLIGHT_LEASE seconds (its holder died).
+
+    Returns:
+        True if the caller now holds the lease (also when leases cannot be used here:
+        a duplicate call is better than a failed one), False if another process
+        holds it.
+    """
+    lease = getattr(settings, 'LLM_SINGLE_FLIGHT_LEASE', 60)
+    try:
+        path = _lease_path(key)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(path).st_mtime < lease:
+                        return False
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return False
+    except OSError:
+        return True
+
+
+def release_lease(key):
+    """Give up the lease taken with try_lease()."""
+    try:
+        os.remove(_lease_path(key))
+    except OSError:
+        pass
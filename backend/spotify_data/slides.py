@@ -0,0 +1,401 @@
+"""
+LLM text shown on each wrapped slide.
+
+Each *_slide_prompts function turns a stored wrapped (the dict of its values) into the
+list of (system_prompt, user_prompt, label) tuples the slide needs, one per item, so
+that the texts can be generated together (see utils.create_groq_batch) instead of
+one request at a time.
+
+Items that describe a single artist or track alone (every item of a solo artists or
+songs slide, the last one of a duo slide) are read from and written to the shared
+entity description store (see spotify_data/entities) first, so popular artists are
+described once for everyone.
+
+When a wrapped is created, the text of every slide is generated once (in the
+background by default) and stored in its `slide_texts` field; the display views then
+read it instead of calling Groq. While the background job runs, the row's
+`slide_texts_pending_since` is set and a display view that arrives first polls the
+row for the texts (for up to SLIDE_TEXTS_WAIT seconds after the job started, and
+within the request's LLM budget) rather than paying for the slide a second time. A
+view only generates a slide itself if its stored text is still missing after that (a
+completion failed, or the job died).
+
+Functions:
+    - artist_slide_prompts: One roast (or, for duos, comparison) per top artist.
+    - song_slide_prompts: One roast (or, for duos, comparison) per top track.
+    - genre_slide_prompts: One roast of the top genres.
+    - quirky_slide_prompts: One roast of the quirkiest artists.
+    - slide_entities: The artist or track each item of a slide describes alone, if any.
+    - generate_texts / agenerate_texts: Texts for a list of prompts, via the entity store.
+    - generate_slide_texts: Texts of every slide of a wrapped, from one batched completion.
+    - schedule_slide_texts: Generate and store a new wrapped's slide texts.
+    - wait_for_slide_texts / await_slide_texts: Wait for texts still being generated.
+    - get_slide_texts / aget_slide_texts: A slide's stored texts, or freshly generated ones.
+    - slide_items: What a slide shows about each of its items, besides the text.
+    - stream_slide_events: A slide as server-sent events, relaying Groq's tokens as they arrive.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .async_utils import acreate_groq_batch
+from .llm_guard import budgeted, remaining_budget
+from .models import DuoWrapped, SpotifyWrapped
+from .entities import (ARTIST, TRACK, track_label, stored_descriptions, save_descriptions,
+                       entity_prompt)
+from .utils import (ROAST_SYSTEM_PROMPT, COMPARISON_SYSTEM_PROMPT,
+                    quirky_prompt, comparison_prompt, create_groq_batch, is_llm_fallback,
+                    stream_groq_completion)
+
+logger = logging.getLogger(__name__)
+
+SLIDES = ('artists', 'songs', 'genres', 'quirky')
+SLIDE_ITEMS = 5
+
+
+def _description(subject):
+    return entity_prompt(subject)
+
+
+def _comparison(first, second):
+    return (COMPARISON_SYSTEM_PROMPT, comparison_prompt(first, second), "Comparison")
+
+
+def artist_slide_prompts(wrapped_data, is_duo):
+    """
+    Prompts for the artists slide. A duo wrapped compares each artist with the next
+    one; the last artist (and every artist of a solo wrapped) gets a description.
+    """
+    artists = wrapped_data['favorite_artists'][:SLIDE_ITEMS]
+    prompts = []
+    for i, artist in enumerate(artists):
+        if is_duo and i + 1 < len(artists):
+            next_artist = artists[i + 1]
+            prompts.append(_comparison(
+                {'name': artist['name'], 'popularity': artist.get('popularity', 0)},
+                {'name': next_artist['name'], 'popularity': next_artist.get('popularity', 0)}))
+        else:
+            prompts.append(_description(artist['name']))
+    return prompts
+
+
+def song_slide_prompts(wrapped_data, is_duo):
+    """Prompts for the songs slide, paired up for duos like artist_slide_prompts."""
+    labels = [track_label(track) for track in wrapped_data['favorite_tracks'][:SLIDE_ITEMS]]
+    prompts = []
+    for i, label in enumerate(labels):
+        if is_duo and i + 1 < len(labels):
+            prompts.append(_comparison(label, labels[i + 1]))
+        else:
+            prompts.append(_description(label))
+    return prompts
+
+
+def genre_slide_prompts(wrapped_data):
+    """Prompt for the genres slide: one description of the top genres together."""
+    return [_description(', '.join(wrapped_data['favorite_genres'][:SLIDE_ITEMS]))]
+
+
+def quirky_slide_prompts(wrapped_data):
+    """Prompt for the quirky slide: one roast of the quirkiest artists together."""
+    names = [artist['name'] for artist in wrapped_data['quirkiest_artists'][:SLIDE_ITEMS]]
+    return [(ROAST_SYSTEM_PROMPT, quirky_prompt(', '.join(names)), "Description")]
+
+
+def slide_prompts(wrapped_data, is_duo, slide):
+    """Prompts for one of the SLIDES of a wrapped."""
+    if slide == 'artists':
+        return artist_slide_prompts(wrapped_data, is_duo)
+    if slide == 'songs':
+        return song_slide_prompts(wrapped_data, is_duo)
+    if slide == 'genres':
+        return genre_slide_prompts(wrapped_data)
+    return quirky_slide_prompts(wrapped_data)
+
+
+def slide_entities(wrapped_data, is_duo, slide):
+    """
+    The entity each item of a slide describes alone, as (kind, spotify_id, name), in
+    the order of slide_prompts; None for comparisons, genres, quirky artists and
+    items without a Spotify id.
+    """
+    if slide == 'artists':
+        items = [(ARTIST, artist, artist['name'])
+                 for artist in wrapped_data['favorite_artists'][:SLIDE_ITEMS]]
+    elif slide == 'songs':
+        items = [(TRACK, track, track_label(track))
+                 for track in wrapped_data['favorite_tracks'][:SLIDE_ITEMS]]
+    else:
+        return [None]
+    entities = []
+    for i, (kind, item, name) in enumerate(items):
+        compared = is_duo and i + 1 < len(items)
+        entities.append((kind, item['id'], name) if item.get('id') and not compared else None)
+    return entities
+
+
+def generate_texts(groq_api_key, prompts, entities):
+    """
+    create_groq_batch for `prompts`, except that items describing a single entity
+    (see slide_entities) are read from the entity store when they are there and
+    saved to it when they are generated.
+    """
+    texts = stored_descriptions(entities)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if missing:
+        generated = create_groq_batch(groq_api_key, [prompts[i] for i in missing])
+        for i, text in zip(missing, generated):
+            texts[i] = text
+        save_descriptions([(entities[i], texts[i]) for i in missing])
+    return texts
+
+
+async def agenerate_texts(groq_api_key, prompts, entities):
+    """Async generate_texts."""
+    texts = await sync_to_async(stored_descriptions)(entities)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if missing:
+        generated = await acreate_groq_batch(groq_api_key, [prompts[i] for i in missing])
+        for i, text in zip(missing, generated):
+            texts[i] = text
+        await sync_to_async(save_descriptions)([(entities[i], texts[i]) for i in missing])
+    return texts
+
+
+def generate_slide_texts(groq_api_key, wrapped_data, is_duo):
+    """
+    Generate the texts of every slide with one batched completion.
+
+    Returns:
+        Dictionary mapping each slide name to its list of texts. Slides where any
+        completion failed are left out so that they are generated again later.
+    """
+    prompts = {slide: slide_prompts(wrapped_data, is_duo, slide) for slide in SLIDES}
+    texts = generate_texts(groq_api_key,
+                           [prompt for slide in SLIDES for prompt in prompts[slide]],
+                           [entity for slide in SLIDES
+                            for entity in slide_entities(wrapped_data, is_duo, slide)])
+    slide_texts = {}
+    start = 0
+    for slide in SLIDES:
+        end = start + len(prompts[slide])
+        if not any(is_llm_fallback(text) for text in texts[start:end]):
+            slide_texts[slide] = texts[start:end]
+        start = end
+    return slide_texts
+
+
+def store_slide_texts(model, wrapped_id, wrapped_data, is_duo):
+    """Generate a wrapped's slide texts and save them on its row, clearing its pending mark."""
+    try:
+        slide_texts = generate_slide_texts(settings.GROQ_API_KEY, wrapped_data, is_duo)
+        model.objects.filter(id=wrapped_id).update(slide_texts=slide_texts,
+                                                   slide_texts_pending_since=None)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.warning("Could not precompute the slides of wrapped %s: %s", wrapped_id, e)
+        model.objects.filter(id=wrapped_id).update(slide_texts_pending_since=None)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the process-wide pool of SLIDE_TEXTS_WORKERS background threads."""
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SLIDE_TEXTS_WORKERS', 2),
+                    thread_name_prefix='slide-texts')
+    return _executor
+
+
+def _store_in_background(model, wrapped_id, wrapped_data, is_duo):
+    try:
+        store_slide_texts(model, wrapped_id, wrapped_data, is_duo)
+    finally:
+        close_old_connections()
+
+
+def schedule_slide_texts(model, wrapped_data, is_duo):
+    """
+    Generate and store the slide texts of a wrapped that was just created. With
+    SLIDE_TEXTS_IN_BACKGROUND (the default) this happens on a background thread once
+    the creating transaction commits, so wrap creation does not wait for Groq; the
+    row is marked pending until then.
+    """
+    if not getattr(settings, 'SLIDE_TEXTS_IN_BACKGROUND', True):
+        store_slide_texts(model, wrapped_data['id'], wrapped_data, is_duo)
+        return
+    model.objects.filter(id=wrapped_data['id']).update(slide_texts_pending_since=timezone.now())
+    executor = _get_executor()
+    transaction.on_commit(lambda: executor.submit(
+        _store_in_background, model, wrapped_data['id'], wrapped_data, is_duo))
+
+
+def _stored_texts(wrapped_data, prompts, slide):
+    """The stored texts of a slide, if they are there and match its items."""
+    stored = (wrapped_data.get('slide_texts') or {}).get(slide)
+    return stored if stored is not None and len(stored) == len(prompts) else None
+
+
+def _pending_deadline(wrapped_data):
+    """
+    Until when (monotonic) to wait for a background job still generating the slides:
+    SLIDE_TEXTS_WAIT seconds after it started, but never past the request's LLM budget.
+    """
+    pending_since = wrapped_data.get('slide_texts_pending_since')
+    if pending_since is None:
+        return None
+    wait = getattr(settings, 'SLIDE_TEXTS_WAIT', 15)
+    left = (pending_since + timedelta(seconds=wait) - timezone.now()).total_seconds()
+    budget = remaining_budget()
+    if budget is not None:
+        left = min(left, budget)
+    return time.monotonic() + left if left > 0 else None
+
+
+def _poll_stored_texts(wrapped_data, is_duo, prompts, slide):
+    """
+    Read the row again. Returns (texts, finished): the slide's stored texts or None,
+    and whether to stop waiting (the texts are there or the job is over).
+    """
+    model = DuoWrapped if is_duo else SpotifyWrapped
+    row = model.objects.filter(id=wrapped_data['id']).values(  # pylint: disable=no-member
+        'slide_texts', 'slide_texts_pending_since').first()
+    if row is None:
+        return None, True
+    stored = _stored_texts(row, prompts, slide)
+    return stored, stored is not None or row['slide_texts_pending_since'] is None
+
+
+def wait_for_slide_texts(wrapped_data, is_duo, prompts, slide):
+    """The slide's texts once the background job stores them, or None if it does not."""
+    deadline = _pending_deadline(wrapped_data)
+    interval = getattr(settings, 'SLIDE_TEXTS_POLL_INTERVAL', 0.25)
+    while deadline is not None and time.monotonic() < deadline:
+        time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+        stored, finished = _poll_stored_texts(wrapped_data, is_duo, prompts, slide)
+        if finished:
+            return stored
+    return None
+
+
+async def await_slide_texts(wrapped_data, is_duo, prompts, slide):
+    """Async wait_for_slide_texts."""
+    deadline = _pending_deadline(wrapped_data)
+    interval = getattr(settings, 'SLIDE_TEXTS_POLL_INTERVAL', 0.25)
+    while deadline is not None and time.monotonic() < deadline:
+        await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+        stored, finished = await sync_to_async(_poll_stored_texts)(wrapped_data, is_duo,
+                                                                   prompts, slide)
+        if finished:
+            return stored
+    return None
+
+
+def get_slide_texts(groq_api_key, wrapped_data, is_duo, slide):
+    """
+    Texts of one slide: the stored ones if present (waiting for them while the
+    background job is still generating them), otherwise generated now.
+    """
+    prompts = slide_prompts(wrapped_data, is_duo, slide)
+    stored = _stored_texts(wrapped_data, prompts, slide)
+    if stored is None:
+        stored = wait_for_slide_texts(wrapped_data, is_duo, prompts, slide)
+    if stored is not None:
+        return stored
+    return generate_texts(groq_api_key, prompts, slide_entities(wrapped_data, is_duo, slide))
+
+
+async def aget_slide_texts(groq_api_key, wrapped_data, is_duo, slide):
+    """Async get_slide_texts."""
+    prompts = slide_prompts(wrapped_data, is_duo, slide)
+    stored = _stored_texts(wrapped_data, prompts, slide)
+    if stored is None:
+        stored = await await_slide_texts(wrapped_data, is_duo, prompts, slide)
+    if stored is not None:
+        return stored
+    return await agenerate_texts(groq_api_key, prompts,
+                                 slide_entities(wrapped_data, is_duo, slide))
+
+
+def slide_items(wrapped_data, slide):
+    """
+    The fields a slide shows for each of its items, in the order of its texts (the
+    same fields the display_* views return, minus 'desc').
+    """
+    if slide == 'artists':
+        return [{'name': artist['name'], 'image': artist['images'][0]['url']}
+                for artist in wrapped_data['favorite_artists'][:SLIDE_ITEMS]]
+    if slide == 'songs':
+        return [{'name': track['name'], 'artist': track['artists'][0]['name'],
+                 'image': track['album']['images'][0]['url']}
+                for track in wrapped_data['favorite_tracks'][:SLIDE_ITEMS]]
+    if slide == 'genres':
+        return [{'genres': ', '.join(wrapped_data['favorite_genres'][:SLIDE_ITEMS])}]
+    return [{}]
+
+
+def sse_event(event, data):
+    """Format one server-sent event carrying `data` as JSON."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_slide_events(groq_api_key, wrapped_data, is_duo, slide):
+    """
+    Yield a slide as server-sent events, one item after another:
+
+        - item: the item's fields ({'index': i, 'name': ..., ...})
+        - token: a piece of its text as Groq streams it ({'index': i, 'text': ...})
+        - done: its complete text ({'index': i, 'desc': ...})
+
+    followed by a final `end` event. Stored texts (waited for while the background
+    job generates them) are sent whole as `done` events without calling Groq, as are
+    descriptions found in the entity store; generated ones go through the LLM
+    response cache.
+
+    The events are produced while the response is sent, after LLMBudgetMiddleware
+    is done with the request, so the stream's Groq calls get their own
+    LLM_REQUEST_BUDGET (see llm_guard.budgeted).
+    """
+    return budgeted(_slide_events(groq_api_key, wrapped_data, is_duo, slide),
+                    getattr(settings, 'LLM_REQUEST_BUDGET', 20))
+
+
+def _slide_events(groq_api_key, wrapped_data, is_duo, slide):
+    """The events of stream_slide_events, without the LLM budget."""
+    prompts = slide_prompts(wrapped_data, is_duo, slide)
+    entities = slide_entities(wrapped_data, is_duo, slide)
+    stored = _stored_texts(wrapped_data, prompts, slide)
+    if stored is None:
+        stored = wait_for_slide_texts(wrapped_data, is_duo, prompts, slide)
+    if stored is None:
+        stored = stored_descriptions(entities)
+    for index, (item, prompt) in enumerate(zip(slide_items(wrapped_data, slide), prompts)):
+        yield sse_event('item', {'index': index, **item})
+        if stored[index] is not None:
+            desc = stored[index]
+        else:
+            pieces = []
+            for piece in stream_groq_completion(groq_api_key, *prompt):
+                if is_llm_fallback(piece):
+                    # The `done` event's text replaces whatever was streamed so far
+                    pieces = [piece]
+                    break
+                pieces.append(piece)
+                yield sse_event('token', {'index': index, 'text': piece})
+            desc = ''.join(pieces)
+            if desc and not is_llm_fallback(pieces[-1]):
+                save_descriptions([(entities[index], desc)])
+        yield sse_event('done', {'index': index, 'desc': desc})
+    yield sse_event('end', {})
@@ -0,0 +1,309 @@
+"""
+Pooled, keep-alive HTTP client for the Spotify Web API.
+
+Every fetcher in spotify_data/utils goes through a single SpotifyClient per process so
+that repeated calls to api.spotify.com reuse open TCP/TLS connections instead of paying
+a fresh handshake each time. The API's URL is the SPOTIFY_API_BASE_URL setting, so the
+clients can be pointed at the local stand-in (spotify_data/standins/spotify).
+
+Classes:
+    - SpotifyClient: owns a requests.Session with a sized connection pool and timeouts.
+    - AsyncSpotifyClient: the asyncio counterpart, owning an httpx.AsyncClient.
+
+Functions:
+    - get_spotify_client: Return the SpotifyClient for the current process.
+    - reset_spotify_client: Close and discard the current process's SpotifyClient.
+    - get_async_spotify_client: Return the AsyncSpotifyClient for the running event loop.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .ratelimit import get_scheduler
+from .response_cache import get_response_cache
+from .timing import timed
+
+SPOTIFY_API_BASE_URL = 'https://api.spotify.com/v1'
+
+
+def token_digest(access_token):
+    """Stable, non-reversible identifier for an access token (used in cache keys)."""
+    return hashlib.sha256(access_token.encode()).hexdigest()[:32]
+
+
+class SpotifyClient:
+    """
+    Thin wrapper around a requests.Session whose adapter keeps a pool of
+    keep-alive connections to the Spotify Web API.
+
+    Parameters:
+        - base_url: prefix prepended to relative paths such as '/me'
+        - pool_size: maximum number of connections kept open per host
+        - connect_timeout: seconds to wait for a connection to be established
+        - read_timeout: seconds to wait for Spotify to send a response
+    """
+
+    def __init__(self, base_url=SPOTIFY_API_BASE_URL, pool_size=10,
+                 connect_timeout=3.05, read_timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    def url(self, path):
+        """
+        Build an absolute URL from a path relative to the API base URL.
+        Absolute URLs (e.g. a 'next' link from a paged response) are returned unchanged.
+        """
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def get(self, path, access_token, params=None, headers=None):
+        """
+        Issue an authenticated GET request over the pooled session, paced by the shared
+        rate limiter (see spotify_data/ratelimit). A 429 makes every process back off
+        for its Retry-After and the request is retried up to SPOTIFY_RATE_LIMIT_RETRIES times.
+
+        Parameters:
+            - path: endpoint path relative to the base URL, or an absolute URL
+            - access_token: the access token associated with the current session
+            - params: optional query parameters
+            - headers: optional extra request headers
+
+        Returns:
+            The requests.Response (a bare 429 response if no request slot became free
+            within SPOTIFY_RATE_LIMIT_MAX_WAIT). Connection errors are re-raised.
+        """
+        scheduler = get_scheduler()
+        response = requests.Response()
+        response.status_code = 429
+        with timed('spotify'):
+            for attempt in range(scheduler.max_retries + 1):
+                if not scheduler.acquire():
+                    break
+                response = self._send(path, access_token, params, headers)
+                if response.status_code != 429:
+                    break
+                scheduler.throttled(response)
+                if attempt < scheduler.max_retries:
+                    scheduler.count('retried')
+        return response
+
+    def _send(self, path, access_token, params=None, headers=None):
+        """Send one GET request without rate limiting."""
+        request_headers = {'Authorization': f'Bearer {access_token}'}
+        if headers:
+            request_headers.update(headers)
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.get(self.url(path), headers=request_headers,
+                                    params=params, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def get_cached(self, path, access_token, params=None, user_key=None):
+        """
+        GET through the ETag response cache (see spotify_data/response_cache).
+
+        Parameters:
+            - path, access_token, params: as for get()
+            - user_key: stable identifier of the user the response belongs to;
+              defaults to a digest of the access token
+
+        Returns:
+            A CachedResponse or requests.Response with `status_code` and `json()`.
+        """
+        cache = get_response_cache()
+        key = cache.key(user_key or token_digest(access_token), path, params)
+        return cache.fetch(key, lambda headers: self.get(path, access_token, params=params,
+                                                         headers=headers))
+
+    def stats(self):
+        """
+        Return connection reuse statistics for this client.
+
+        'connections_opened' counts the TCP connections urllib3 had to create;
+        every other request was served over an already open keep-alive connection.
+        """
+        opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        with self._lock:
+            total, errors = self._requests, self._errors
+        return {
+            'pool_size': self.pool_size,
+            'requests': total,
+            'errors': errors,
+            'connections_opened': opened,
+            'connections_reused': max(total - errors - opened, 0),
+        }
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_spotify_client():
+    """
+    Return the SpotifyClient for the current process, creating it on first use.
+
+    The client is rebuilt after a fork so that worker processes never share sockets
+    with their parent. Pool size and timeouts come from the SPOTIFY_API_* settings.
+    """
+    global _client, _client_pid  # pylint: disable=global-statement
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = SpotifyClient(
+                    base_url=getattr(settings, 'SPOTIFY_API_BASE_URL', SPOTIFY_API_BASE_URL),
+                    pool_size=getattr(settings, 'SPOTIFY_API_POOL_SIZE', 10),
+                    connect_timeout=getattr(settings, 'SPOTIFY_API_CONNECT_TIMEOUT', 3.05),
+                    read_timeout=getattr(settings, 'SPOTIFY_API_READ_TIMEOUT', 5),
+                )
+                _client_pid = pid
+    return _client
+
+
+def reset_spotify_client():
+    """Close and discard the current process's client (used by tests and after reconfiguration)."""
+    global _client, _client_pid  # pylint: disable=global-statement
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+class AsyncSpotifyClient:
+    """
+    asyncio counterpart of SpotifyClient built on httpx.AsyncClient.
+
+    An httpx.AsyncClient is bound to the event loop it was first used on, so one
+    instance is kept per loop (see get_async_spotify_client).
+
+    Parameters:
+        - base_url: prefix prepended to relative paths such as '/me'
+        - pool_size: maximum number of keep-alive connections
+        - connect_timeout: seconds to wait for a connection to be established
+        - read_timeout: seconds to wait for Spotify to send a response
+    """
+
+    def __init__(self, base_url=SPOTIFY_API_BASE_URL, pool_size=10,
+                 connect_timeout=3.05, read_timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size,
+                                max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+        self._requests = 0
+        self._errors = 0
+
+    def url(self, path):
+        """Build an absolute URL from a path relative to the API base URL."""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def get(self, path, access_token, params=None, headers=None):
+        """
+        Issue an authenticated GET request over the pooled async client, paced by the
+        shared rate limiter and retried after a 429 like SpotifyClient.get.
+
+        Returns:
+            The httpx.Response. Transport errors are re-raised to the caller.
+        """
+        scheduler = get_scheduler()
+        response = httpx.Response(429)
+        with timed('spotify'):
+            for attempt in range(scheduler.max_retries + 1):
+                if not await scheduler.aacquire():
+                    break
+                response = await self._send(path, access_token, params, headers)
+                if response.status_code != 429:
+                    break
+                await scheduler.athrottled(response)
+                if attempt < scheduler.max_retries:
+                    scheduler.count('retried')
+        return response
+
+    async def _send(self, path, access_token, params=None, headers=None):
+        """Send one GET request without rate limiting."""
+        request_headers = {'Authorization': f'Bearer {access_token}'}
+        if headers:
+            request_headers.update(headers)
+        self._requests += 1
+        try:
+            return await self.session.get(self.url(path), headers=request_headers,
+                                          params=params)
+        except httpx.HTTPError:
+            self._errors += 1
+            raise
+
+    async def get_cached(self, path, access_token, params=None, user_key=None):
+        """GET through the ETag response cache; see SpotifyClient.get_cached."""
+        cache = get_response_cache()
+        key = cache.key(user_key or token_digest(access_token), path, params)
+
+        async def send(headers):
+            return await self.get(path, access_token, params=params, headers=headers)
+
+        return await cache.afetch(key, send)
+
+    def stats(self):
+        """Return request counters for this client."""
+        return {
+            'pool_size': self.pool_size,
+            'requests': self._requests,
+            'errors': self._errors,
+        }
+
+    async def aclose(self):
+        """Close every pooled connection."""
+        await self.session.aclose()
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_spotify_client():
+    """
+    Return the AsyncSpotifyClient for the running event loop, creating it on first use.
+    Under ASGI every request shares the server's loop and therefore one connection pool.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncSpotifyClient(
+            base_url=getattr(settings, 'SPOTIFY_API_BASE_URL', SPOTIFY_API_BASE_URL),
+            pool_size=getattr(settings, 'SPOTIFY_API_POOL_SIZE', 10),
+            connect_timeout=getattr(settings, 'SPOTIFY_API_CONNECT_TIMEOUT', 3.05),
+            read_timeout=getattr(settings, 'SPOTIFY_API_READ_TIMEOUT', 5),
+        )
+        _async_clients[loop] = client
+    return client
@@ -0,0 +1,10 @@
+"""
+Local stand-ins for the external APIs the app depends on, for load tests and
+benchmarks that must not spend real quota. Each runs as a small threaded HTTP server
+(see the run_*_standin management commands) that the app is pointed at through
+settings.
+
+Modules:
+    - llm: Groq/OpenAI chat-completions stand-in with tunable latency and failures.
+    - spotify: Spotify Web API and accounts stand-in serving a synthetic catalog.
+"""
@@ -0,0 +1,303 @@
+"""
+Stand-in for Groq's OpenAI-compatible chat-completions API.
+
+Serves POST /openai/v1/chat/completions (and /v1/chat/completions) with plain and
+streamed (server-sent events) responses in the same format as Groq, so the real Groq
+SDK, and therefore every create_groq_* helper, can run against it: set GROQ_BASE_URL
+to the server's URL and GROQ_API_KEY to any value.
+
+Answers are deterministic: the text is picked from a fixed vocabulary by a hash of
+the messages, and a prompt made of numbered requests (utils.batch_prompt) gets a JSON
+array with one answer per request. Timing and failures are tunable:
+
+    - latency_ms / latency_sigma: time to first token, log-normally distributed
+      around latency_ms
+    - prefill_ms_per_1k_tokens: extra time to first token per 1000 prompt tokens
+    - tokens_per_second: output throughput (0 answers at once)
+    - words: length of each answer
+    - error_rate / rate_limit_rate / hang_rate: fraction of requests answered with a
+      500, with a 429 (Retry-After: retry_after), or not answered for hang_seconds
+    - seed: seed of the random latency and failure draws
+
+The configuration can be changed while the server runs with POST /_standin/config
+(a JSON object of the settings above) and request counters are at GET /_standin/stats.
+
+Classes:
+    - LLMStandIn: Configuration, answers and counters shared by the request handlers.
+    - LLMStandInHandler: HTTP request handler.
+
+Functions:
+    - make_llm_server: Build (but do not start) a stand-in server.
+    - start_llm_server: Start a stand-in server on a background thread.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..prompts import estimate_tokens
+
+COMPLETION_PATHS = ('/openai/v1/chat/completions', '/v1/chat/completions')
+
+DEFAULTS = {
+    'latency_ms': 200,
+    'latency_sigma': 0.3,
+    'prefill_ms_per_1k_tokens': 50,
+    'tokens_per_second': 250,
+    'words': 60,
+    'error_rate': 0.0,
+    'rate_limit_rate': 0.0,
+    'hang_rate': 0.0,
+    'hang_seconds': 60,
+    'retry_after': 1,
+    'seed': None,
+}
+
+WORDS = ('you', 'dress', 'like', 'a', 'playlist', 'that', 'never', 'skips', 'the', 'intro',
+         'your', 'taste', 'is', 'loud', 'sad', 'vinyl', 'thrifted', 'cardigan', 'and',
+         'opinions', 'about', 'bass', 'lines', 'nobody', 'asked', 'for', 'every', 'song',
+         'sounds', 'rainy', 'bus', 'window', 'main', 'character', 'energy', 'with', 'tote',
+         'bag', 'headphones', 'in', 'at', 'dinner', 'quietly', 'judging', 'radio')
+
+NUMBERED_REQUEST = re.compile(r'^(\d+)\. ', re.MULTILINE)
+
+
+class LLMStandIn:
+    """
+    Behaviour and counters of a stand-in server, shared by its handler threads.
+
+    Parameters:
+        - config: any of the DEFAULTS settings
+    """
+
+    def __init__(self, **config):
+        self._lock = threading.Lock()
+        self.config = dict(DEFAULTS)
+        self.random = random.Random()
+        self.stats = {'requests': 0, 'streamed': 0, 'errors': 0, 'rate_limited': 0, 'hung': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0}
+        self.configure(**config)
+
+    def configure(self, **changes):
+        """Update the configuration; unknown settings raise ValueError."""
+        unknown = set(changes) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown stand-in settings: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self.config.update(changes)
+            if 'seed' in changes:
+                self.random.seed(changes['seed'])
+            return dict(self.config)
+
+    def count(self, name, amount=1):
+        """Increment one of the counters."""
+        with self._lock:
+            self.stats[name] += amount
+
+    def snapshot(self):
+        """Copies of the configuration and counters."""
+        with self._lock:
+            return dict(self.config), dict(self.stats)
+
+    def draw_outcome(self):
+        """'ok', 'error', 'rate_limited' or 'hang' for the next request."""
+        with self._lock:
+            draw = self.random.random()
+            config = self.config
+        for outcome in ('error', 'rate_limit', 'hang'):
+            if draw < config[f'{outcome}_rate']:
+                return 'rate_limited' if outcome == 'rate_limit' else outcome
+            draw -= config[f'{outcome}_rate']
+        return 'ok'
+
+    def first_token_delay(self, prompt_tokens):
+        """Seconds before the first token of an answer to a prompt of `prompt_tokens`."""
+        with self._lock:
+            config = self.config
+            latency = (self.random.lognormvariate(math.log(config['latency_ms']),
+                                                  config['latency_sigma'])
+                       if config['latency_ms'] > 0 else 0)
+        return (latency + config['prefill_ms_per_1k_tokens'] * prompt_tokens / 1000) / 1000
+
+    def token_delay(self):
+        """Seconds between two output tokens."""
+        tokens_per_second = self.config['tokens_per_second']
+        return 1 / tokens_per_second if tokens_per_second > 0 else 0
+
+    def _text(self, key):
+        """Deterministic answer of `words` words for a key."""
+        seed = int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], 'big')
+        words = random.Random(seed).choices(WORDS, k=self.config['words'])
+        return ' '.join(words).capitalize() + '.'
+
+    def answer(self, messages):
+        """The answer to a list of chat messages."""
+        user = next((message.get('content', '') for message in reversed(messages)
+                     if message.get('role') == 'user'), '')
+        numbers = NUMBERED_REQUEST.findall(user)
+        if len(numbers) > 1 and numbers == [str(i) for i in range(1, len(numbers) + 1)]:
+            requests = NUMBERED_REQUEST.split(user)[2::2]
+            return json.dumps([self._text(request.strip()) for request in requests])
+        return self._text(json.dumps(messages, sort_keys=True))
+
+
+def _error_body(message, error_type, code):
+    return {'error': {'message': message, 'type': error_type, 'code': code}}
+
+
+class LLMStandInHandler(BaseHTTPRequestHandler):
+    """Chat-completions requests plus the /_standin/config and /_standin/stats endpoints."""
+    protocol_version = 'HTTP/1.1'
+    server_version = 'LLMStandIn/1.0'
+
+    @property
+    def standin(self):
+        """The LLMStandIn of the server."""
+        return self.server.standin
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if getattr(self.server, 'verbose', False):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Stand-in configuration and counters."""
+        config, stats = self.standin.snapshot()
+        if self.path == '/_standin/stats':
+            self._send_json(200, stats)
+        elif self.path == '/_standin/config':
+            self._send_json(200, config)
+        else:
+            self._send_json(404, _error_body('Unknown path', 'invalid_request_error', 'not_found'))
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Chat completions, or configuration changes."""
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json(400, _error_body('Invalid JSON', 'invalid_request_error', 'bad_json'))
+            return
+        if self.path == '/_standin/config':
+            try:
+                self._send_json(200, self.standin.configure(**body))
+            except ValueError as e:
+                self._send_json(400, _error_body(str(e), 'invalid_request_error',
+                                                 'bad_config'))
+        elif self.path in COMPLETION_PATHS:
+            self._complete(body)
+        else:
+            self._send_json(404, _error_body('Unknown path', 'invalid_request_error', 'not_found'))
+
+    def _complete(self, body):
+        standin = self.standin
+        standin.count('requests')
+        outcome = standin.draw_outcome()
+        if outcome == 'error':
+            standin.count('errors')
+            self._send_json(500, _error_body('Injected failure', 'internal_server_error',
+                                             'internal_error'))
+            return
+        if outcome == 'rate_limited':
+            standin.count('rate_limited')
+            retry_after = standin.config['retry_after']
+            self._send_json(429, _error_body('Rate limit reached', 'rate_limit_error',
+                                             'rate_limit_exceeded'),
+                            {'Retry-After': str(retry_after)})
+            return
+        if outcome == 'hang':
+            standin.count('hung')
+            time.sleep(standin.config['hang_seconds'])
+            self._send_json(504, _error_body('Timed out', 'internal_server_error', 'timeout'))
+            return
+
+        messages = body.get('messages', [])
+        prompt_tokens = sum(estimate_tokens(message.get('content') or '') for message in messages)
+        text = standin.answer(messages)
+        pieces = re.findall(r'\S+\s*', text)
+        standin.count('prompt_tokens', prompt_tokens)
+        standin.count('completion_tokens', len(pieces))
+        time.sleep(standin.first_token_delay(prompt_tokens))
+
+        completion = {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'created': int(time.time()),
+            'model': body.get('model', 'standin'),
+            'system_fingerprint': 'standin',
+        }
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(pieces),
+                 'total_tokens': prompt_tokens + len(pieces)}
+        if body.get('stream'):
+            standin.count('streamed')
+            self._stream(completion, pieces, usage)
+            return
+        time.sleep(standin.token_delay() * len(pieces))
+        self._send_json(200, {
+            **completion,
+            'object': 'chat.completion',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                         'finish_reason': 'stop', 'logprobs': None}],
+            'usage': usage,
+        })
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def _stream(self, completion, pieces, usage):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(delta, finish_reason=None, **extra):
+            chunk = {**completion, 'object': 'chat.completion.chunk',
+                     'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason,
+                                  'logprobs': None}], **extra}
+            self._write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode())
+
+        delay = self.standin.token_delay()
+        event({'role': 'assistant', 'content': ''})
+        for piece in pieces:
+            event({'content': piece})
+            time.sleep(delay)
+        event({}, 'stop', x_groq={'usage': usage})
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+
+def make_llm_server(host='127.0.0.1', port=0, verbose=False, **config):
+    """
+    Build a stand-in server (port 0 picks a free port); serve it with serve_forever().
+    Its LLMStandIn is `server.standin` and its base URL `server.base_url`.
+    """
+    server = ThreadingHTTPServer((host, port), LLMStandInHandler)
+    server.daemon_threads = True
+    server.standin = LLMStandIn(**config)
+    server.verbose = verbose
+    server.base_url = f'http://{server.server_address[0]}:{server.server_address[1]}'
+    return server
+
+
+def start_llm_server(**config):
+    """Start a stand-in server on a daemon thread and return it; stop it with shutdown()."""
+    server = make_llm_server(**config)
+    threading.Thread(target=server.serve_forever, daemon=True, name='llm-standin').start()
+    return server
@@ -0,0 +1,635 @@
+"""
+Stand-in for the Spotify Web API and accounts service.
+
+Serves, from a synthetic catalog, the endpoints the app calls:
+
+    - GET /v1/me
+    - GET /v1/me/top/tracks and /v1/me/top/artists (time_range, limit, offset paging)
+    - GET /v1/recommendations (seed_artists, seed_tracks, seed_genres, limit)
+    - GET /v1/artists?ids=... (at most 50 ids)
+    - GET /authorize: approves at once and redirects to redirect_uri with a code
+    - POST /api/token: authorization_code and refresh_token grants
+
+Point the app at it with SPOTIFY_API_BASE_URL=<url>/v1 and
+SPOTIFY_ACCOUNTS_BASE_URL=<url>. Payloads have the shape (and roughly the size) of
+Spotify's, including the available_markets arrays, and carry an ETag honoured by
+If-None-Match.
+
+The catalog is generated from catalog_seed: `artists` artists and `tracks` tracks
+ordered by popularity. Every access token belongs to a user (tokens the stand-in did
+not issue get a user derived from the token), whose top items are drawn from the
+catalog with a bias towards popular entries (`skew`), so different users overlap the
+way real listeners do. Timing and failures are tunable:
+
+    - latency_ms / latency_sigma: response time, log-normally distributed around
+      latency_ms
+    - requests_per_second: quota over all API requests (0 for none); requests over
+      it get a 429 with Retry-After
+    - rate_limit_rate / expired_rate / error_rate: fraction of API requests answered
+      with a 429 (Retry-After: retry_after), an expired-token 401, or a 500
+    - token_ttl: lifetime in seconds of the access tokens issued by /api/token; once
+      it is over they are refused with a 401
+    - top_items_total: how many top tracks and artists each user has per term
+    - seed: seed of the random latency and failure draws
+
+The configuration can be changed while the server runs with POST /_standin/config
+(a JSON object of the settings above) and request counters are at GET /_standin/stats.
+
+Classes:
+    - SpotifyCatalog: Deterministic artists and tracks in Spotify's JSON format.
+    - SpotifyStandIn: Catalog, tokens, configuration and counters shared by the handlers.
+    - SpotifyStandInHandler: HTTP request handler.
+
+Functions:
+    - make_spotify_server: Build (but do not start) a stand-in server.
+    - start_spotify_server: Start a stand-in server on a background thread.
+"""
+import hashlib
+import itertools
+import json
+import math
+import random
+import secrets
+import string
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+DEFAULTS = {
+    'latency_ms': 50,
+    'latency_sigma': 0.3,
+    'requests_per_second': 0,
+    'rate_limit_rate': 0.0,
+    'expired_rate': 0.0,
+    'error_rate': 0.0,
+    'retry_after': 1,
+    'token_ttl': 3600,
+    'top_items_total': 100,
+    'skew': 2.0,
+    'artists': 1000,
+    'tracks': 10000,
+    'markets': 180,
+    'catalog_seed': 0,
+    'seed': None,
+}
+
+# Settings the catalog is generated from; changing one regenerates it
+CATALOG_SETTINGS = ('artists', 'tracks', 'markets', 'catalog_seed')
+
+TERMS = ('short_term', 'medium_term', 'long_term')
+MAX_IDS = 50
+MAX_LIMIT = 50
+MAX_RECOMMENDATIONS = 100
+MAX_SEEDS = 5
+
+GENRES = ('pop', 'dance pop', 'indie pop', 'bedroom pop', 'art pop', 'k-pop', 'rock',
+          'indie rock', 'alternative rock', 'garage rock', 'shoegaze', 'dream pop',
+          'post-punk', 'emo', 'pop punk', 'metal', 'hip hop', 'rap', 'trap', 'drill',
+          'conscious hip hop', 'r&b', 'neo soul', 'soul', 'funk', 'disco', 'house',
+          'deep house', 'techno', 'drum and bass', 'dubstep', 'hyperpop', 'edm',
+          'electropop', 'synthwave', 'lo-fi beats', 'ambient', 'jazz', 'jazz fusion',
+          'bossa nova', 'classical', 'modern classical', 'folk', 'indie folk',
+          'singer-songwriter', 'country', 'americana', 'bluegrass', 'reggae',
+          'reggaeton', 'latin pop', 'afrobeats', 'amapiano', 'j-pop', 'city pop',
+          'city pop revival', 'sea shanty', 'vaporwave', 'polka', 'gregorian chant')
+
+FIRST_WORDS = ('Velvet', 'Neon', 'Paper', 'Silver', 'Midnight', 'Glass', 'Honey',
+               'Static', 'Golden', 'Electric', 'Quiet', 'Wild', 'Lunar', 'Crystal',
+               'Broken', 'Sunday', 'Cosmic', 'Little', 'Rose', 'Marble', 'Hollow',
+               'Cherry', 'Northern', 'Pale')
+SECOND_WORDS = ('Harbor', 'Tigers', 'Echoes', 'Satellites', 'Orchard', 'Parade',
+                'Machines', 'Choir', 'Foxes', 'Lanterns', 'Rivers', 'Ghosts', 'Hearts',
+                'Avenue', 'Season', 'Motel', 'Garden', 'Signal', 'Theory', 'Atlas')
+TITLE_WORDS = ('Love', 'Night', 'Summer', 'Fire', 'Dream', 'Lights', 'Run', 'Stay',
+               'Blue', 'Home', 'Falling', 'Forever', 'Alone', 'Heaven', 'Slow',
+               'Ocean', 'Static', 'Gravity', 'Youth', 'Paradise', 'Tonight', 'Gold')
+
+BASE62 = string.digits + string.ascii_letters
+
+
+def spotify_id(*parts):
+    """Deterministic 22-character base62 id for the given parts."""
+    number = int.from_bytes(hashlib.sha256(':'.join(map(str, parts)).encode()).digest(),
+                            'big')
+    chars = []
+    for _ in range(22):
+        number, digit = divmod(number, 62)
+        chars.append(BASE62[digit])
+    return ''.join(chars)
+
+
+def _images(kind, item_id):
+    return [{'url': f'https://i.scdn.co/image/{spotify_id(kind, item_id, size)}',
+             'height': size, 'width': size} for size in (640, 300, 64)]
+
+
+def _links(kind, item_id):
+    return {
+        'external_urls': {'spotify': f'https://open.spotify.com/{kind}/{item_id}'},
+        'href': f'https://api.spotify.com/v1/{kind}s/{item_id}',
+        'id': item_id,
+        'type': kind,
+        'uri': f'spotify:{kind}:{item_id}',
+    }
+
+
+def _pick(rng, count, skew):
+    """An index below `count`, biased towards 0 (the most popular entries)."""
+    return min(int(count * rng.random() ** skew), count - 1)
+
+
+class SpotifyCatalog:
+    """
+    Artists and tracks generated from a seed, most popular first.
+
+    Parameters:
+        - artists: number of artists
+        - tracks: number of tracks
+        - markets: length of the available_markets arrays
+        - catalog_seed: seed the catalog is generated from
+    """
+
+    def __init__(self, artists=1000, tracks=10000, markets=180, catalog_seed=0):
+        rng = random.Random(catalog_seed)
+        self.markets = [a + b for a, b in
+                        itertools.product(string.ascii_uppercase, repeat=2)][:markets]
+        self.artists = [self._artist(rng, catalog_seed, rank, artists)
+                        for rank in range(artists)]
+        self.tracks = [self._track(rng, catalog_seed, rank, tracks)
+                       for rank in range(tracks)]
+        self.artists_by_id = {artist['id']: artist for artist in self.artists}
+        self.tracks_by_id = {track['id']: track for track in self.tracks}
+        self.tracks_by_artist = {}
+        self.tracks_by_genre = {}
+        for track in self.tracks:
+            artist = self.artists_by_id[track['artists'][0]['id']]
+            self.tracks_by_artist.setdefault(artist['id'], []).append(track)
+            for genre in artist['genres']:
+                self.tracks_by_genre.setdefault(genre, []).append(track)
+
+    @staticmethod
+    def _popularity(rank, count):
+        return max(int(100 * (1 - rank / count) ** 0.5), 1)
+
+    def _artist(self, rng, seed, rank, count):
+        artist_id = spotify_id('artist', seed, rank)
+        name = f'{rng.choice(FIRST_WORDS)} {rng.choice(SECOND_WORDS)}'
+        if rng.random() < 0.3:
+            name = f'The {name}'
+        popularity = self._popularity(rank, count)
+        return {
+            **_links('artist', artist_id),
+            'followers': {'href': None, 'total': int(popularity ** 3.5 * rng.uniform(0.5, 1.5))},
+            'genres': rng.sample(GENRES, rng.randint(0, 4)),
+            'images': _images('artist', artist_id),
+            'name': name,
+            'popularity': popularity,
+        }
+
+    def _simplified_artist(self, artist):
+        return {key: artist[key] for key in
+                ('external_urls', 'href', 'id', 'name', 'type', 'uri')}
+
+    def _track(self, rng, seed, rank, count):
+        track_id = spotify_id('track', seed, rank)
+        album_id = spotify_id('album', seed, rank)
+        artists = [self.artists[_pick(rng, len(self.artists), 1.5)]]
+        if rng.random() < 0.15:
+            featured = self.artists[_pick(rng, len(self.artists), 1.5)]
+            if featured is not artists[0]:
+                artists.append(featured)
+        artists = [self._simplified_artist(artist) for artist in artists]
+        title = ' '.join(rng.sample(TITLE_WORDS, rng.randint(1, 3)))
+        year = rng.randint(1965, 2024)
+        return {
+            **_links('track', track_id),
+            'album': {
+                **_links('album', album_id),
+                'album_type': rng.choice(('album', 'single', 'compilation')),
+                'artists': artists[:1],
+                'available_markets': self.markets,
+                'images': _images('album', album_id),
+                'name': f'{title} ({year})' if rng.random() < 0.2 else title,
+                'release_date': f'{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                'release_date_precision': 'day',
+                'total_tracks': rng.randint(1, 18),
+            },
+            'artists': artists,
+            'available_markets': self.markets,
+            'disc_number': 1,
+            'duration_ms': rng.randint(90000, 420000),
+            'explicit': rng.random() < 0.3,
+            'external_ids': {'isrc': f'QZ{spotify_id("isrc", seed, rank)[:10].upper()}'},
+            'is_local': False,
+            'name': title,
+            'popularity': self._popularity(rank, count),
+            'preview_url': f'https://p.scdn.co/mp3-preview/{spotify_id("preview", track_id)}',
+            'track_number': rng.randint(1, 12),
+        }
+
+
+class SpotifyStandIn:
+    """
+    Catalog, issued tokens, behaviour and counters of a stand-in server, shared by its
+    handler threads.
+
+    Parameters:
+        - config: any of the DEFAULTS settings
+    """
+
+    def __init__(self, **config):
+        self._lock = threading.Lock()
+        self.config = dict(DEFAULTS)
+        self.random = random.Random()
+        self.catalog = None
+        self.stats = {'requests': 0, 'ok': 0, 'not_modified': 0, 'rate_limited': 0,
+                      'unauthorized': 0, 'errors': 0, 'tokens_issued': 0}
+        self._codes = {}
+        self._tokens = {}
+        self._refresh_tokens = {}
+        self._users = itertools.count(1)
+        self._top_items = {}
+        self._window = (0, 0)
+        self.configure(**config)
+
+    def configure(self, **changes):
+        """Update the configuration; unknown settings raise ValueError."""
+        unknown = set(changes) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown stand-in settings: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self.config.update(changes)
+            if 'seed' in changes:
+                self.random.seed(changes['seed'])
+            config = dict(self.config)
+        if self.catalog is None or set(changes) & set(CATALOG_SETTINGS):
+            catalog = SpotifyCatalog(**{name: config[name] for name in CATALOG_SETTINGS})
+            with self._lock:
+                self.catalog = catalog
+                self._top_items.clear()
+        return config
+
+    def count(self, name, amount=1):
+        """Increment one of the counters."""
+        with self._lock:
+            self.stats[name] += amount
+
+    def snapshot(self):
+        """Copies of the configuration and counters."""
+        with self._lock:
+            return dict(self.config), dict(self.stats)
+
+    def delay(self):
+        """Seconds to wait before answering an API request."""
+        with self._lock:
+            config = self.config
+            if config['latency_ms'] <= 0:
+                return 0
+            return self.random.lognormvariate(math.log(config['latency_ms']),
+                                              config['latency_sigma']) / 1000
+
+    def over_quota(self):
+        """Whether this request exceeds requests_per_second (counted per wall-clock second)."""
+        limit = self.config['requests_per_second']
+        if limit <= 0:
+            return False
+        second = int(time.time())
+        with self._lock:
+            start, used = self._window
+            used = used + 1 if start == second else 1
+            self._window = (second, used)
+        return used > limit
+
+    def draw_outcome(self):
+        """'ok', 'rate_limited', 'expired' or 'error' for the next API request."""
+        with self._lock:
+            draw = self.random.random()
+            config = self.config
+        for outcome in ('rate_limit', 'expired', 'error'):
+            if draw < config[f'{outcome}_rate']:
+                return 'rate_limited' if outcome == 'rate_limit' else outcome
+            draw -= config[f'{outcome}_rate']
+        return 'ok'
+
+    # Tokens
+
+    def authorize(self):
+        """A new authorization code for a new user."""
+        code = secrets.token_urlsafe(16)
+        with self._lock:
+            self._codes[code] = f'standin-user-{next(self._users)}'
+        return code
+
+    def _issue(self, user):
+        access_token = secrets.token_urlsafe(32)
+        refresh_token = secrets.token_urlsafe(32)
+        ttl = self.config['token_ttl']
+        with self._lock:
+            self._tokens[access_token] = (user, time.time() + ttl)
+            self._refresh_tokens[refresh_token] = user
+            self.stats['tokens_issued'] += 1
+        return {'access_token': access_token, 'token_type': 'Bearer', 'expires_in': ttl,
+                'refresh_token': refresh_token,
+                'scope': 'user-read-private user-read-email user-top-read'}
+
+    def exchange(self, form):
+        """
+        Answer a token request.
+
+        Returns:
+            (status, body) with the new tokens, or an OAuth error.
+        """
+        grant_type = form.get('grant_type')
+        with self._lock:
+            if grant_type == 'authorization_code':
+                user = self._codes.pop(form.get('code'), None)
+            elif grant_type == 'refresh_token':
+                user = self._refresh_tokens.get(form.get('refresh_token'))
+            else:
+                return 400, {'error': 'unsupported_grant_type',
+                             'error_description': f'grant_type must be authorization_code '
+                                                  f'or refresh_token, got {grant_type}'}
+        if user is None:
+            return 400, {'error': 'invalid_grant', 'error_description': 'Invalid code'
+                         if grant_type == 'authorization_code' else 'Invalid refresh token'}
+        return 200, self._issue(user)
+
+    def user_for(self, access_token):
+        """
+        The user an access token belongs to, or None if the stand-in issued it and it
+        has expired. Tokens it did not issue belong to a user derived from the token.
+        """
+        with self._lock:
+            issued = self._tokens.get(access_token)
+        if issued is None:
+            return 'standin-' + hashlib.sha256(access_token.encode()).hexdigest()[:12]
+        user, expires_at = issued
+        return user if time.time() < expires_at else None
+
+    # Data
+
+    def profile(self, user):
+        """The /me object of a user."""
+        number = int(hashlib.sha256(user.encode()).hexdigest()[:8], 16)
+        markets = self.catalog.markets or ['US']
+        return {
+            'country': markets[number % len(markets)],
+            'display_name': user.replace('-', ' ').title(),
+            'email': f'{user}@example.com',
+            'explicit_content': {'filter_enabled': False, 'filter_locked': False},
+            'external_urls': {'spotify': f'https://open.spotify.com/user/{user}'},
+            'followers': {'href': None, 'total': number % 500},
+            'href': f'https://api.spotify.com/v1/users/{user}',
+            'id': user,
+            'images': _images('user', user)[:2],
+            'product': 'premium' if number % 3 else 'free',
+            'type': 'user',
+            'uri': f'spotify:user:{user}',
+        }
+
+    def top_items(self, user, item_type, term):
+        """The user's top artists or tracks over a term, most listened first."""
+        key = (user, item_type, term)
+        with self._lock:
+            items = self._top_items.get(key)
+            catalog, config = self.catalog, self.config
+        if items is not None:
+            return items
+        pool = catalog.artists if item_type == 'artists' else catalog.tracks
+        rng = random.Random(f'{user}:{item_type}:{term}')
+        total = min(config['top_items_total'], len(pool))
+        indexes = {}
+        while len(indexes) < total:
+            indexes.setdefault(_pick(rng, len(pool), config['skew']), None)
+        items = [pool[index] for index in indexes]
+        with self._lock:
+            self._top_items[key] = items
+        return items
+
+    def recommendations(self, seed_artists, seed_tracks, seed_genres, limit):
+        """Tracks recommended for the seeds: tracks of the seed artists and genres first."""
+        catalog = self.catalog
+        rng = random.Random(json.dumps([seed_artists, seed_tracks, seed_genres]))
+        candidates = []
+        for artist_id in seed_artists:
+            candidates.extend(catalog.tracks_by_artist.get(artist_id, []))
+        for track_id in seed_tracks:
+            track = catalog.tracks_by_id.get(track_id)
+            if track is not None:
+                candidates.extend(catalog.tracks_by_artist.get(track['artists'][0]['id'], []))
+        for genre in seed_genres:
+            candidates.extend(catalog.tracks_by_genre.get(genre, []))
+        tracks = {}
+        rng.shuffle(candidates)
+        for track in candidates:
+            if len(tracks) >= limit:
+                break
+            if track['id'] not in seed_tracks:
+                tracks.setdefault(track['id'], track)
+        while len(tracks) < min(limit, len(catalog.tracks)):
+            track = catalog.tracks[_pick(rng, len(catalog.tracks), 2)]
+            tracks.setdefault(track['id'], track)
+        return list(tracks.values())
+
+
+def _api_error(status, message):
+    return {'error': {'status': status, 'message': message}}
+
+
+class SpotifyStandInHandler(BaseHTTPRequestHandler):
+    """Spotify Web API and accounts requests plus the /_standin/config and /_standin/stats endpoints."""
+    protocol_version = 'HTTP/1.1'
+    server_version = 'SpotifyStandIn/1.0'
+
+    @property
+    def standin(self):
+        """The SpotifyStandIn of the server."""
+        return self.server.standin
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if getattr(self.server, 'verbose', False):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        etag = f'"{hashlib.md5(data).hexdigest()}"' if status == 200 else None
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.standin.count('not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'private, max-age=0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Web API requests, the authorize redirect, and stand-in configuration and counters."""
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == '/_standin/stats':
+            self._send_json(200, self.standin.snapshot()[1])
+        elif url.path == '/_standin/config':
+            self._send_json(200, self.standin.snapshot()[0])
+        elif url.path == '/authorize':
+            self._authorize(query)
+        elif url.path.startswith('/v1/'):
+            self._api(url.path[len('/v1'):], query)
+        else:
+            self._send_json(404, _api_error(404, 'Service not found'))
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Token requests, or configuration changes."""
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length)
+        if self.path == '/api/token':
+            form = {name: values[-1] for name, values in parse_qs(data.decode()).items()}
+            self._send_json(*self.standin.exchange(form))
+        elif self.path == '/_standin/config':
+            try:
+                self._send_json(200, self.standin.configure(**json.loads(data or b'{}')))
+            except ValueError as e:
+                self._send_json(400, _api_error(400, str(e)))
+        else:
+            self._send_json(404, _api_error(404, 'Service not found'))
+
+    def _authorize(self, query):
+        redirect_uri = query.get('redirect_uri')
+        if not redirect_uri:
+            self._send_json(400, {'error': 'invalid_request',
+                                  'error_description': 'Missing redirect_uri'})
+            return
+        params = {'code': self.standin.authorize()}
+        if 'state' in query:
+            params['state'] = query['state']
+        separator = '&' if '?' in redirect_uri else '?'
+        self.send_response(302)
+        self.send_header('Location', f'{redirect_uri}{separator}{urlencode(params)}')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _api(self, path, query):
+        standin = self.standin
+        standin.count('requests')
+        time.sleep(standin.delay())
+
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer ') or not authorization[len('Bearer '):]:
+            standin.count('unauthorized')
+            self._send_json(401, _api_error(401, 'No token provided'))
+            return
+        if standin.over_quota():
+            standin.count('rate_limited')
+            self._send_json(429, _api_error(429, 'API rate limit exceeded'),
+                            {'Retry-After': '1'})
+            return
+        outcome = standin.draw_outcome()
+        user = standin.user_for(authorization[len('Bearer '):])
+        if outcome == 'rate_limited':
+            standin.count('rate_limited')
+            self._send_json(429, _api_error(429, 'API rate limit exceeded'),
+                            {'Retry-After': str(standin.config['retry_after'])})
+        elif outcome == 'expired' or user is None:
+            standin.count('unauthorized')
+            self._send_json(401, _api_error(401, 'The access token expired'))
+        elif outcome == 'error':
+            standin.count('errors')
+            self._send_json(500, _api_error(500, 'Server error'))
+        else:
+            status, body = self._route(path, query, user)
+            if status == 200:
+                standin.count('ok')
+            self._send_json(status, body)
+
+    def _route(self, path, query, user):
+        standin = self.standin
+        if path == '/me':
+            return 200, standin.profile(user)
+        if path in ('/me/top/tracks', '/me/top/artists'):
+            return self._top_items(path, path.rsplit('/', 1)[1], query, user)
+        if path == '/artists':
+            ids = [artist_id for artist_id in query.get('ids', '').split(',') if artist_id]
+            if not ids:
+                return 400, _api_error(400, 'Missing required field: ids')
+            if len(ids) > MAX_IDS:
+                return 400, _api_error(400, 'Too many ids requested')
+            return 200, {'artists': [standin.catalog.artists_by_id.get(artist_id)
+                                     for artist_id in ids]}
+        if path == '/recommendations':
+            seeds = {name: [seed for seed in query.get(f'seed_{name}', '').split(',') if seed]
+                     for name in ('artists', 'tracks', 'genres')}
+            count = sum(len(values) for values in seeds.values())
+            if not 0 < count <= MAX_SEEDS:
+                return 400, _api_error(400, f'Between 1 and {MAX_SEEDS} seeds are required')
+            try:
+                limit = int(query.get('limit', 20))
+            except ValueError:
+                return 400, _api_error(400, 'Invalid limit')
+            if not 1 <= limit <= MAX_RECOMMENDATIONS:
+                return 400, _api_error(400, 'Invalid limit')
+            tracks = standin.recommendations(seeds['artists'], seeds['tracks'],
+                                             seeds['genres'], limit)
+            return 200, {'seeds': [{'id': seed, 'type': name[:-1].upper(),
+                                    'initialPoolSize': len(tracks),
+                                    'afterFilteringSize': len(tracks),
+                                    'afterRelinkingSize': len(tracks), 'href': None}
+                                   for name, values in seeds.items() for seed in values],
+                         'tracks': tracks}
+        return 404, _api_error(404, 'Service not found')
+
+    def _top_items(self, path, item_type, query, user):
+        term = query.get('time_range', 'medium_term')
+        if term not in TERMS:
+            return 400, _api_error(400, 'Invalid time range')
+        try:
+            limit = int(query.get('limit', 20))
+            offset = int(query.get('offset', 0))
+        except ValueError:
+            return 400, _api_error(400, 'Invalid limit or offset')
+        if not 1 <= limit <= MAX_LIMIT or offset < 0:
+            return 400, _api_error(400, 'Invalid limit or offset')
+        items = self.standin.top_items(user, item_type, term)
+        href = f'http://{self.headers.get("Host", "localhost")}/v1{path}'
+
+        def page_url(page_offset):
+            return f'{href}?{urlencode({"time_range": term, "limit": limit, "offset": page_offset})}'
+
+        return 200, {
+            'href': page_url(offset),
+            'items': items[offset:offset + limit],
+            'limit': limit,
+            'offset': offset,
+            'total': len(items),
+            'next': page_url(offset + limit) if offset + limit < len(items) else None,
+            'previous': page_url(max(offset - limit, 0)) if offset else None,
+        }
+
+
+def make_spotify_server(host='127.0.0.1', port=0, verbose=False, **config):
+    """
+    Build a stand-in server (port 0 picks a free port); serve it with serve_forever().
+    Its SpotifyStandIn is `server.standin` and its base URL `server.base_url`
+    (the Web API is under `server.base_url + '/v1'`).
+    """
+    server = ThreadingHTTPServer((host, port), SpotifyStandInHandler)
+    server.daemon_threads = True
+    server.standin = SpotifyStandIn(**config)
+    server.verbose = verbose
+    server.base_url = f'http://{server.server_address[0]}:{server.server_address[1]}'
+    return server
+
+
+def start_spotify_server(**config):
+    """Start a stand-in server on a daemon thread and return it; stop it with shutdown()."""
+    server = make_spotify_server(**config)
+    threading.Thread(target=server.serve_forever, daemon=True, name='spotify-standin').start()
+    return server
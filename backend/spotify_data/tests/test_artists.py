@@ -0,0 +1,96 @@
+"""Tests the batched artist metadata store (spotify_data/artists)."""
+
+from unittest.mock import patch, Mock
+import pytest
+from django.utils import timezone
+from spotify_data.artists import get_artist_metadata, get_term_track_artists, smallest_image_url
+from spotify_data.models import ArtistMetadata
+from spotify_data.utils import get_several_artists, get_top_genres
+
+
+def spotify_artist(artist_id, genres=('pop',)):
+    """A full Spotify artist object."""
+    return {'id': artist_id, 'name': f'Artist {artist_id}', 'genres': list(genres),
+            'popularity': 42,
+            'images': [{'url': 'big', 'width': 640, 'height': 640},
+                       {'url': 'small', 'width': 64, 'height': 64}]}
+
+
+def artists_response(ids):
+    """A several-artists response for a comma-separated id list."""
+    return Mock(status_code=200,
+                json=Mock(return_value={'artists': [spotify_artist(i) for i in ids.split(',')]}))
+
+
+def test_get_several_artists_batches_50():
+    """120 ids take three requests of at most 50 ids each."""
+    with patch('spotify_data.spotify_client.SpotifyClient.get',
+               side_effect=lambda path, token, params: artists_response(params['ids'])) as get:
+        artists = get_several_artists('token', [str(i) for i in range(120)])
+    assert len(artists) == 120
+    assert [len(call.kwargs['params']['ids'].split(',')) for call in get.call_args_list] \
+        == [50, 50, 20]
+
+
+def test_smallest_image_url():
+    """The smallest image is picked; no images gives None."""
+    assert smallest_image_url(spotify_artist('a')['images']) == 'small'
+    assert smallest_image_url([]) is None
+
+
+@pytest.mark.django_db
+def test_get_artist_metadata_fetches_misses_only():
+    """Stored artists are served from the table; only unknown ids reach Spotify."""
+    ArtistMetadata.objects.create(spotify_id='known', name='Known', genres=['rock'],
+                                  popularity=5)
+    with patch('spotify_data.artists.get_several_artists',
+               return_value=[spotify_artist('new')]) as fetch:
+        metadata = get_artist_metadata('token', ['known', 'new', 'known'])
+    fetch.assert_called_once_with('token', ['new'])
+    assert metadata['known']['genres'] == ['rock']
+    assert metadata['new']['images'] == [{'url': 'small'}]
+    assert ArtistMetadata.objects.get(spotify_id='new').popularity == 42
+
+    with patch('spotify_data.artists.get_several_artists') as fetch:
+        get_artist_metadata('token', ['known', 'new'])
+    fetch.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_get_artist_metadata_refreshes_stale_rows():
+    """Rows older than the TTL are refetched and updated in place."""
+    ArtistMetadata.objects.create(spotify_id='old', name='Old', genres=[], popularity=1)
+    ArtistMetadata.objects.filter(spotify_id='old').update(
+        updated_at=timezone.now() - timezone.timedelta(days=30))
+    with patch('spotify_data.artists.get_several_artists',
+               return_value=[spotify_artist('old', ['jazz'])]):
+        metadata = get_artist_metadata('token', ['old'])
+    assert metadata['old']['genres'] == ['jazz']
+    assert ArtistMetadata.objects.get(spotify_id='old').genres == ['jazz']
+
+
+@pytest.mark.django_db
+def test_track_artists_are_deduplicated_and_feed_genres():
+    """A term's track artists appear once each and work with get_top_genres."""
+    tracks = [{'name': 't1', 'artists': [{'id': 'a', 'name': 'A'}, {'id': 'b', 'name': 'B'}]},
+              {'name': 't2', 'artists': [{'id': 'a', 'name': 'A'}]}]
+    with patch('spotify_data.artists.get_several_artists',
+               return_value=[spotify_artist('a', ['pop']), spotify_artist('b', ['pop', 'emo'])]
+               ) as fetch:
+        artists = get_term_track_artists('token', {'tracks_short': tracks}, ['short'])['short']
+    assert fetch.call_count == 1
+    assert [artist['id'] for artist in artists] == ['a', 'b']
+    assert get_top_genres(artists)[0] == 'pop'
+
+
+@pytest.mark.django_db
+def test_get_term_track_artists_looks_up_every_term_at_once():
+    """All terms' track artists share one lookup; each term gets its own artists."""
+    term_items = {'tracks_short': [{'artists': [{'id': 'a'}]}],
+                  'tracks_long': [{'artists': [{'id': 'b'}, {'id': 'a'}]}]}
+    with patch('spotify_data.artists.get_several_artists',
+               return_value=[spotify_artist('a'), spotify_artist('b')]) as fetch:
+        track_artists = get_term_track_artists('token', term_items, ['short', 'long'])
+    fetch.assert_called_once_with('token', ['a', 'b'])
+    assert [artist['id'] for artist in track_artists['short']] == ['a']
+    assert [artist['id'] for artist in track_artists['long']] == ['b', 'a']
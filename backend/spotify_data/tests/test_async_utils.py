@@ -0,0 +1,138 @@
+"""Tests the asyncio Spotify/Groq helpers in spotify_data/async_utils and the async views."""
+
+import asyncio
+import json
+import logging
+from unittest.mock import patch, AsyncMock, MagicMock, Mock
+import pytest
+from asgiref.sync import async_to_sync
+from groq import GroqError
+from spotify_data.async_utils import (aget_spotify_user_data, aget_user_favorite_tracks,
+                           aget_user_favorite_artists, arun_concurrently,
+                           acreate_groq_description, acreate_groq_comparison,
+                           acreate_groq_batch)
+from spotify_data.llm_cache import LLMResponseCache
+from spotify_data.async_views import adisplay_artists, adisplay_quirky
+from spotify_data.models import SpotifyWrapped
+from spotify_data.spotify_client import get_async_spotify_client
+
+
+def mock_response(status_code, payload):
+    """Fake httpx response."""
+    response = Mock(status_code=status_code)
+    response.json.return_value = payload
+    return response
+
+
+@pytest.mark.parametrize("status_code, expected_result", [
+    (200, {'id': '123', 'display_name': 'Test User'}),
+    (401, None),
+])
+def test_aget_spotify_user_data(status_code, expected_result):
+    """The profile is returned on 200 and None otherwise."""
+    with patch('spotify_data.spotify_client.AsyncSpotifyClient.get', new_callable=AsyncMock,
+               return_value=mock_response(status_code, {'id': '123',
+                                                        'display_name': 'Test User'})):
+        assert asyncio.run(aget_spotify_user_data('token')) == expected_result
+
+
+def test_aget_top_items():
+    """Top tracks and artists unwrap the 'items' list of the paging object."""
+    items = {'items': [{'name': 'Item 1'}]}
+    with patch('spotify_data.spotify_client.AsyncSpotifyClient.get', new_callable=AsyncMock,
+               return_value=mock_response(200, items)) as mock_get:
+        assert asyncio.run(aget_user_favorite_tracks('token', 'short_term')) == items['items']
+        assert asyncio.run(aget_user_favorite_artists('token', 'long_term')) == items['items']
+    assert mock_get.call_args_list[0].args[0] == '/me/top/tracks'
+    assert mock_get.call_args_list[1].kwargs['params'] == {'time_range': 'long_term', 'limit': 20}
+
+
+def test_async_client_is_shared_within_a_loop():
+    """Calls on the same event loop share one connection pool."""
+    async def two_clients():
+        return get_async_spotify_client(), get_async_spotify_client()
+
+    first, second = asyncio.run(two_clients())
+    assert first is second
+
+
+def test_arun_concurrently_deadline():
+    """Coroutines that raise or outlive the deadline map to None."""
+    async def value(result, delay=0):
+        await asyncio.sleep(delay)
+        return result
+
+    async def boom():
+        raise ValueError("boom")
+
+    results = asyncio.run(arun_concurrently({
+        'fast': value('ok'),
+        'slow': value('late', delay=5),
+        'error': boom(),
+    }, deadline=0.1))
+    assert results == {'fast': 'ok', 'slow': None, 'error': None}
+
+
+def test_acreate_groq_description_returns_response():
+    """The generated text of the completion is returned."""
+    response = MagicMock()
+    response.choices[0].message.content = "Sample description."
+    with patch("spotify_data.async_utils.get_async_groq_client") as MockGroq:
+        MockGroq.return_value.chat.completions.create = AsyncMock(return_value=response)
+        assert asyncio.run(acreate_groq_description("key", ["Artist1"])) == "Sample description."
+
+
+def test_acreate_groq_comparison_api_error():
+    """API failures come back as a readable fallback message."""
+    with patch("spotify_data.async_utils.get_async_groq_client") as MockGroq:
+        MockGroq.return_value.chat.completions.create = AsyncMock(side_effect=Exception("down"))
+        result = asyncio.run(acreate_groq_comparison("key", "Artist1", "Artist2"))
+    assert result == "Comparison unavailable due to API error: down"
+
+
+def test_acreate_groq_batch_logs_failure_and_falls_back(caplog):
+    """A failed batched completion is logged, then the items are generated one by one."""
+    with patch('spotify_data.async_utils.get_llm_cache', return_value=LLMResponseCache(None)), \
+            patch('spotify_data.async_utils.arequest_groq_completion', new_callable=AsyncMock,
+                  side_effect=Exception('down')), \
+            patch('spotify_data.async_utils.acreate_groq_completion', new_callable=AsyncMock,
+                  side_effect=['one', 'two']), \
+            caplog.at_level(logging.WARNING, logger='spotify_data.async_utils'):
+        texts = asyncio.run(acreate_groq_batch('key', [('s', 'u1', 'A'), ('s', 'u2', 'B')]))
+    assert texts == ['one', 'two']
+    assert 'Batched completion failed: down' in caplog.text
+
+
+def test_acreate_groq_description_no_api_key():
+    """A missing API key raises GroqError just like the sync helper."""
+    with pytest.raises(GroqError, match="GROQ_API_KEY environment variable is not set."):
+        asyncio.run(acreate_groq_description("", ["Artist1"]))
+
+
+@pytest.mark.django_db
+def test_adisplay_artists_describes_each_artist():
+    """Every top artist gets a description, in order."""
+    wrapped = SpotifyWrapped.objects.create(user='testuser', favorite_artists=[
+        {'name': f'Artist {i}', 'images': [{'url': f'http://example.com/{i}.jpg'}]}
+        for i in range(6)
+    ])
+    request = Mock()
+    request.GET = {'id': str(wrapped.id), 'isDuo': 'false'}
+    with patch('spotify_data.slides.acreate_groq_batch', new_callable=AsyncMock,
+               side_effect=lambda key, prompts: [f'desc {i}' for i in range(len(prompts))]):
+        response = async_to_sync(adisplay_artists)(request)
+
+    assert response.status_code == 200
+    body = json.loads(response.content)
+    assert [item['desc'] for item in body] == [f'desc {i}' for i in range(5)]
+    assert [item['name'] for item in body] == [f'Artist {i}' for i in range(5)]
+
+
+@pytest.mark.django_db
+def test_adisplay_quirky_missing_wrapped():
+    """An unknown wrapped id is reported instead of raising."""
+    request = Mock()
+    request.GET = {'id': '999', 'isDuo': 'false'}
+    response = async_to_sync(adisplay_quirky)(request)
+    assert response.status_code == 500
+    assert response.content == b"Wrapped grab failed: no data"
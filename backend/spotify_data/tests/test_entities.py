@@ -0,0 +1,89 @@
+"""Tests the shared artist and track description store (spotify_data/entities)."""
+
+from datetime import timedelta
+from unittest.mock import patch
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from spotify_data.entities import (ARTIST, TRACK, popular_entities, save_descriptions,
+                                   stored_descriptions)
+from spotify_data.models import EntityDescription, SpotifyUser
+from spotify_data.slides import get_slide_texts, slide_entities
+from spotify_data.utils import llm_error_text
+
+ARTISTS = [{'id': f'a{i}', 'name': f'Artist {i}'} for i in range(5)]
+TRACKS = [{'id': f't{i}', 'name': f'Track {i}', 'artists': [{'name': f'Artist {i}'}]}
+          for i in range(5)]
+WRAPPED = {'favorite_artists': ARTISTS, 'favorite_tracks': TRACKS}
+
+
+def fake_batch(key, prompts):
+    """Answer every prompt by quoting it."""
+    return [f'about: {user}' for _, user, _ in prompts]
+
+
+def test_slide_entities():
+    """Solo items are entities; duo comparisons, genres and items without ids are not."""
+    assert slide_entities(WRAPPED, False, 'artists')[0] == (ARTIST, 'a0', 'Artist 0')
+    assert slide_entities(WRAPPED, False, 'songs')[1] == (TRACK, 't1', 'Track 1 by Artist 1')
+    assert slide_entities(WRAPPED, True, 'artists') == [None] * 4 + [(ARTIST, 'a4', 'Artist 4')]
+    assert slide_entities(WRAPPED, False, 'genres') == [None]
+    assert slide_entities({'favorite_artists': [{'name': 'No id'}]}, False, 'artists') == [None]
+
+
+@pytest.mark.django_db
+def test_descriptions_are_shared_between_wraps(settings):
+    """Once an artist is described for one wrap, other wraps showing it skip Groq for it."""
+    settings.GROQ_API_KEY = 'key'
+    with patch('spotify_data.slides.create_groq_batch', side_effect=fake_batch) as batch:
+        first = get_slide_texts('key', WRAPPED, False, 'artists')
+        other = {'favorite_artists': ARTISTS[:2] + [{'id': 'new', 'name': 'New'}]}
+        second = get_slide_texts('key', other, False, 'artists')
+    assert second[:2] == first[:2]
+    assert len(batch.call_args_list[1].args[1]) == 1
+    assert EntityDescription.objects.count() == 6
+
+
+@pytest.mark.django_db
+def test_stale_and_old_version_descriptions_are_regenerated(settings):
+    """Descriptions past ENTITY_DESCRIPTION_TTL or from an older version count as missing."""
+    settings.ENTITY_DESCRIPTION_TTL = 60
+    entities = [(ARTIST, 'a0', 'Artist 0'), (ARTIST, 'a1', 'Artist 1'), None]
+    save_descriptions([(entities[0], 'zero'), (entities[1], 'one')])
+    assert stored_descriptions(entities) == ['zero', 'one', None]
+
+    EntityDescription.objects.filter(spotify_id='a0').update(
+        updated_at=timezone.now() - timedelta(minutes=5))
+    EntityDescription.objects.filter(spotify_id='a1').update(version=0)
+    assert stored_descriptions(entities) == [None, None, None]
+
+    save_descriptions([(entities[0], 'zero again')])
+    assert stored_descriptions(entities)[0] == 'zero again'
+    assert EntityDescription.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_failed_descriptions_are_not_saved():
+    """Fallback texts are left out so the entity is described again next time."""
+    save_descriptions([((ARTIST, 'a0', 'Artist 0'),
+                        llm_error_text('Description', 'down'))])
+    assert not EntityDescription.objects.exists()
+
+
+@pytest.mark.django_db
+def test_warm_command_describes_most_common_entities(settings):
+    """The warm command describes the artists in most snapshots and skips fresh ones."""
+    settings.GROQ_API_KEY = 'key'
+    for i in range(3):
+        user = User.objects.create_user(username=f'user{i}', password='password')
+        SpotifyUser.objects.create(user=user, spotify_id=f'user{i}', display_name=f'user{i}',
+                                   favorite_artists_short=ARTISTS[:i + 1],
+                                   favorite_artists_long=ARTISTS[:1])
+    assert [entity[1] for entity in popular_entities(ARTIST, 2)] == ['a0', 'a1']
+
+    with patch('spotify_data.entities.create_groq_batch', side_effect=fake_batch) as batch:
+        call_command('warm_entity_descriptions', '--top', '2', '--kind', 'artist')
+        call_command('warm_entity_descriptions', '--top', '3', '--kind', 'artist')
+    assert [len(call.args[1]) for call in batch.call_args_list] == [2, 1]
+    assert 'Artist 2' in stored_descriptions([(ARTIST, 'a2', 'Artist 2')])[0]
@@ -0,0 +1,75 @@
+"""Tests the process-wide Groq clients in spotify_data/groq_client."""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from spotify_data.groq_client import (get_groq_client, get_async_groq_client,
+                                      groq_client_stats, reset_groq_clients)
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    """Make sure every test starts without cached process-wide clients."""
+    reset_groq_clients()
+    yield
+    reset_groq_clients()
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small body over a persistent HTTP/1.1 connection."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Send a tiny JSON body."""
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keep test output quiet."""
+
+
+def test_groq_client_is_reused(settings):
+    """The same client is returned for a key; every key shares one connection pool."""
+    settings.GROQ_API_KEY = 'configured'
+    client = get_groq_client()
+    assert client is get_groq_client('configured')
+    assert client.api_key == 'configured'
+    other = get_groq_client('other')
+    assert other is not client
+    assert other._client is client._client  # pylint: disable=protected-access
+
+
+def test_groq_client_stats_show_reuse():
+    """Repeated requests go over one kept-alive connection."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        http_client = get_groq_client('key')._client  # pylint: disable=protected-access
+        for _ in range(3):
+            http_client.get(f'http://127.0.0.1:{server.server_port}/')
+        stats = groq_client_stats()
+    finally:
+        server.shutdown()
+    assert stats['requests'] == 3
+    assert stats['connections_opened'] == 1
+
+
+def test_async_groq_client_per_loop():
+    """Within one event loop the async client is reused."""
+    async def clients():
+        return get_async_groq_client('key'), get_async_groq_client('key')
+
+    first, second = asyncio.run(clients())
+    assert first is second
+
+
+def test_async_groq_client_is_closed_with_its_loop():
+    """The pool of a loop's async client is closed when the loop shuts down."""
+    async def client():
+        return get_async_groq_client('key')
+
+    http_client = asyncio.run(client())._client  # pylint: disable=protected-access
+    assert http_client.is_closed
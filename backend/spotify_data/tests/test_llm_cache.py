@@ -0,0 +1,102 @@
+"""Tests the content-addressed Groq completion cache (spotify_data/llm_cache)."""
+
+import os
+import time
+from unittest.mock import patch, MagicMock
+import pytest
+from django.utils import timezone
+from spotify_data.llm_cache import (DatabaseLLMCacheBackend, FileLLMCacheBackend,
+                                    LLMResponseCache)
+from spotify_data.models import LLMResponse
+from spotify_data.utils import create_groq_description
+
+
+def test_key_depends_on_model_and_prompts():
+    """Any change to the model or either prompt gives another key."""
+    key = LLMResponseCache.key('model', 'system', 'user')
+    assert key == LLMResponseCache.key('model', 'system', 'user')
+    assert len({key, LLMResponseCache.key('other', 'system', 'user'),
+                LLMResponseCache.key('model', 'other', 'user'),
+                LLMResponseCache.key('model', 'system', 'other')}) == 4
+
+
+def test_file_backend_hits_ttl_and_lru(tmp_path):
+    """The file backend serves stored texts, expires them and evicts the least recently used."""
+    cache = LLMResponseCache(FileLLMCacheBackend(str(tmp_path), ttl=60, max_entries=2))
+    assert cache.get('m', 's', 'a') is None
+    cache.set('m', 's', 'a', 'text a')
+    cache.set('m', 's', 'b', 'text b')
+    past = time.time() - 10
+    os.utime(tmp_path / f"{cache.key('m', 's', 'b')}.json", (past, past))
+    assert cache.get('m', 's', 'a') == 'text a'
+    cache.set('m', 's', 'c', 'text c')
+    assert cache.get('m', 's', 'b') is None
+    assert cache.get('m', 's', 'c') == 'text c'
+
+    cache.backend.ttl = -1
+    assert cache.get('m', 's', 'c') is None
+    assert cache.stats() == {'hits': 2, 'misses': 3, 'stored': 3, 'expired': 1, 'evicted': 1,
+                             'errors': 0, 'early_refreshes': 0, 'coalesced': 0}
+
+
+@pytest.mark.django_db
+def test_database_backend_hits_ttl_and_lru():
+    """The database backend keeps at most max_entries rows, dropping the least recently used."""
+    cache = LLMResponseCache(DatabaseLLMCacheBackend(ttl=60, max_entries=2))
+    cache.set('m', 's', 'a', 'text a')
+    cache.set('m', 's', 'b', 'text b')
+    LLMResponse.objects.filter(key=cache.key('m', 's', 'b')).update(
+        last_used=timezone.now() - timezone.timedelta(minutes=1))
+    cache.set('m', 's', 'c', 'text c')
+    assert LLMResponse.objects.count() == 2
+    assert cache.get('m', 's', 'b') is None
+    assert cache.get('m', 's', 'a') == 'text a'
+
+    LLMResponse.objects.update(created_at=timezone.now() - timezone.timedelta(minutes=5))
+    assert cache.get('m', 's', 'a') is None
+    assert cache.stats()['expired'] == 1
+
+
+@pytest.mark.django_db
+def test_database_backend_touches_and_evicts_in_batches():
+    """Recent hits do not write, and rows are only counted and evicted every few stores."""
+    backend = DatabaseLLMCacheBackend(ttl=60, max_entries=1, touch_interval=60, evict_every=3)
+    cache = LLMResponseCache(backend)
+    cache.set('m', 's', 'a', 'text a')
+    cache.set('m', 's', 'b', 'text b')
+    assert LLMResponse.objects.count() == 2
+
+    stored = LLMResponse.objects.get(key=cache.key('m', 's', 'a')).last_used
+    assert cache.get('m', 's', 'a') == 'text a'
+    assert LLMResponse.objects.get(key=cache.key('m', 's', 'a')).last_used == stored
+
+    cache.set('m', 's', 'c', 'text c')
+    assert LLMResponse.objects.count() == 1
+    assert cache.stats()['evicted'] == 2
+
+
+def test_backend_errors_are_misses():
+    """A failing backend never stops a completion from being generated."""
+    backend = MagicMock()
+    backend.get.side_effect = RuntimeError('no database')
+    backend.set.side_effect = RuntimeError('no database')
+    cache = LLMResponseCache(backend)
+    assert cache.get('m', 's', 'u') is None
+    cache.set('m', 's', 'u', 'text')
+    assert cache.stats()['errors'] == 2
+
+
+def test_create_groq_description_uses_cache(tmp_path):
+    """A repeated prompt is answered from the cache; API errors are not cached."""
+    cache = LLMResponseCache(FileLLMCacheBackend(str(tmp_path), ttl=60, max_entries=10))
+    with patch('spotify_data.utils.get_llm_cache', return_value=cache), \
+            patch('spotify_data.utils.get_groq_client') as mock_groq:
+        create = mock_groq.return_value.chat.completions.create
+        create.side_effect = Exception('down')
+        assert 'unavailable' in create_groq_description('key', 'Artist')
+        create.side_effect = None
+        create.return_value.choices = [MagicMock(message=MagicMock(content='Roast'))]
+        assert create_groq_description('key', 'Artist') == 'Roast'
+        assert create_groq_description('key', 'Artist') == 'Roast'
+    assert create.call_count == 2
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,151 @@
+"""Tests the Groq circuit breaker and the per-request LLM time budget (spotify_data/llm_guard)."""
+
+import time
+from unittest.mock import patch, MagicMock
+import pytest
+from spotify_data.llm_cache import FileLLMCacheBackend, LLMResponseCache
+from spotify_data.llm_guard import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError,
+                                    LLMBudgetExceeded, LLMBudgetMiddleware, budgeted,
+                                    call_timeout, get_breaker, guarded_call, llm_budget, remaining_budget)
+from spotify_data.utils import (create_groq_completion, create_groq_completions, is_llm_fallback,
+                                llm_timeout_text)
+
+
+@pytest.fixture
+def no_cache():
+    """Run without the LLM response cache."""
+    with patch('spotify_data.utils.get_llm_cache', return_value=LLMResponseCache(None)):
+        yield
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    """Repeated failures open the breaker; after open_seconds one trial call decides."""
+    breaker = CircuitBreaker(min_calls=3, failure_rate=0.5, open_seconds=0.1)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record(False, 0.01)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.1)
+    assert breaker.state == HALF_OPEN
+    trial = breaker.allow()
+    assert trial
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record(False, 0.01, trial)
+    assert not breaker.allow()
+
+    time.sleep(0.1)
+    trial = breaker.allow()
+    breaker.record(True, 0.01, trial)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['opened'] == 1
+    assert breaker.stats()['rejected'] == 3
+
+
+def test_only_the_trial_call_decides():
+    """A call that started before the breaker opened does not resolve the trial."""
+    breaker = CircuitBreaker(min_calls=2, failure_rate=0.5, open_seconds=0.1)
+    earlier = breaker.allow()
+    for _ in range(2):
+        breaker.record(False, 0.01, breaker.allow())
+    time.sleep(0.1)
+    trial = breaker.allow()
+    breaker.record(True, 0.01, earlier)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(True, 0.01, trial)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    """Calls slower than slow_call open the breaker even though they succeeded."""
+    breaker = CircuitBreaker(min_calls=2, slow_call=1)
+    breaker.record(True, 5)
+    breaker.record(True, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.stats()['error_rate'] == 0.5
+
+
+def test_budget_cuts_timeouts_and_runs_out():
+    """Calls get what is left of the budget, nested budgets keep the tighter deadline."""
+    assert remaining_budget() is None
+    assert call_timeout(15) == 15
+    with llm_budget(5):
+        assert call_timeout(15) <= 5
+        with llm_budget(60):
+            assert remaining_budget() <= 5
+    with llm_budget(0):
+        with pytest.raises(LLMBudgetExceeded):
+            call_timeout(15)
+
+
+@pytest.mark.usefixtures('no_cache')
+def test_open_breaker_skips_groq():
+    """Once Groq keeps failing, completions return their fallback without calling it."""
+    with patch('spotify_data.utils.get_groq_client') as mock_groq:
+        create = mock_groq.return_value.chat.completions.create
+        create.side_effect = Exception('timed out')
+        texts = [create_groq_completion('key', 'system', f'user {i}') for i in range(8)]
+    assert create.call_count == 5
+    assert all('unavailable due to API error' in text for text in texts)
+    assert all(is_llm_fallback(text) for text in texts)
+    assert 'not calling it' in texts[-1]
+    with pytest.raises(CircuitOpenError):
+        with guarded_call():
+            pass
+
+
+@pytest.mark.usefixtures('no_cache')
+def test_request_budget_bounds_parallel_completions():
+    """A slide gives up on items once the request's budget is spent, not at GROQ_SLIDE_DEADLINE."""
+    def slow_create(**kwargs):
+        assert kwargs['timeout'] <= 0.2
+        time.sleep(0.5)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content='late'))])
+
+    with patch('spotify_data.utils.get_groq_client') as mock_groq:
+        mock_groq.return_value.chat.completions.create.side_effect = slow_create
+        start = time.monotonic()
+        with llm_budget(0.2):
+            texts = create_groq_completions('key', [('s', 'u', 'Description')],
+                                            deadline=10)
+    assert time.monotonic() - start < 0.4
+    assert texts == [llm_timeout_text('Description')]
+
+
+def test_failed_early_refresh_serves_cached_text(tmp_path, settings):
+    """When the refresh of a cached completion fails, the cached text is still served."""
+    settings.LLM_SINGLE_FLIGHT_LOCK_DIR = str(tmp_path / 'locks')
+    cache = LLMResponseCache(FileLLMCacheBackend(str(tmp_path / 'cache'), 60, 10))
+    cache.set('m', 's', 'u', 'cached', compute_time=1)
+
+    def failing():
+        raise CircuitOpenError('open')
+
+    with patch.object(cache, 'should_refresh_early', return_value=True):
+        assert cache.get_or_generate('m', 's', 'u', failing) == 'cached'
+
+
+def test_middleware_gives_each_request_a_budget(settings):
+    """Views run under LLM_REQUEST_BUDGET; it is gone once the response is returned."""
+    settings.LLM_REQUEST_BUDGET = 7
+    seen = []
+    middleware = LLMBudgetMiddleware(lambda request: seen.append(remaining_budget()))
+    middleware(MagicMock())
+    assert 6 < seen[0] <= 7
+    assert remaining_budget() is None
+    assert get_breaker().state == CLOSED
+
+
+def test_budgeted_applies_to_a_generator_consumed_later():
+    """Each step of a budgeted generator sees the budget, which is not left set in between."""
+    def steps():
+        yield remaining_budget()
+        yield remaining_budget()
+
+    seen = []
+    for budget in budgeted(steps(), 7):
+        seen.append(budget)
+        assert remaining_budget() is None
+    assert all(6 < budget <= 7 for budget in seen)
@@ -0,0 +1,74 @@
+"""Tests the local Groq stand-in server against the real Groq client and helpers."""
+
+import json
+import httpx
+import pytest
+from spotify_data.groq_client import reset_groq_clients
+from spotify_data.llm_cache import LLMResponseCache
+from spotify_data.standins.llm import LLMStandIn, start_llm_server
+from spotify_data.utils import (create_groq_batch, create_groq_completion,
+                                stream_groq_completion)
+
+
+@pytest.fixture
+def standin(settings, monkeypatch):
+    """A running stand-in with no latency, which the app's Groq clients point at."""
+    server = start_llm_server(latency_ms=0, prefill_ms_per_1k_tokens=0, tokens_per_second=0,
+                              words=8, seed=1)
+    settings.GROQ_BASE_URL = server.base_url
+    monkeypatch.setattr('spotify_data.utils.get_llm_cache', lambda: LLMResponseCache(None))
+    reset_groq_clients()
+    yield server
+    server.shutdown()
+    server.server_close()
+    reset_groq_clients()
+
+
+def test_answers_are_deterministic():
+    """The same messages always get the same answer; numbered requests get a JSON array."""
+    standin = LLMStandIn(words=5)
+    messages = [{'role': 'user', 'content': 'Describe Artist 1'}]
+    assert standin.answer(messages) == standin.answer(messages)
+    assert len(standin.answer(messages).split()) == 5
+    answers = json.loads(standin.answer([{'role': 'user', 'content': '1. first\n2. second'}]))
+    assert len(answers) == 2 and answers[0] != answers[1]
+
+
+def test_completion_through_groq_client(standin):  # pylint: disable=redefined-outer-name
+    """create_groq_completion gets a deterministic answer from the stand-in."""
+    first = create_groq_completion('standin', 'system', 'Describe Artist 1')
+    assert first == create_groq_completion('standin', 'system', 'Describe Artist 1')
+    assert len(first.split()) == 8
+    stats = httpx.get(f'{standin.base_url}/_standin/stats').json()
+    assert stats['requests'] == 2 and stats['prompt_tokens'] > 0
+
+
+def test_streaming_through_groq_client(standin):  # pylint: disable=redefined-outer-name
+    """Streamed completions arrive token by token and add up to the plain answer."""
+    pieces = list(stream_groq_completion('standin', 'system', 'Describe Artist 2'))
+    assert len(pieces) == 8
+    assert ''.join(pieces) == create_groq_completion('standin', 'system', 'Describe Artist 2')
+
+
+def test_batch_prompt_is_answered_per_item(standin):  # pylint: disable=redefined-outer-name
+    """A batched slide is answered by one request holding one text per item."""
+    prompts = [('system', f'Describe Artist {i}', 'Description') for i in range(3)]
+    texts = create_groq_batch('standin', prompts)
+    assert len(set(texts)) == 3
+    assert httpx.get(f'{standin.base_url}/_standin/stats').json()['requests'] == 1
+
+
+def test_injected_failures(standin):  # pylint: disable=redefined-outer-name
+    """Configured error and rate-limit rates turn into Groq API errors."""
+    response = httpx.post(f'{standin.base_url}/_standin/config', json={'error_rate': 1.0})
+    assert response.json()['error_rate'] == 1.0
+    text = create_groq_completion('standin', 'system', 'Describe Artist 3')
+    assert 'unavailable due to API error' in text
+
+    httpx.post(f'{standin.base_url}/_standin/config',
+               json={'error_rate': 0.0, 'rate_limit_rate': 1.0, 'retry_after': 0})
+    response = httpx.post(f'{standin.base_url}/openai/v1/chat/completions',
+                          json={'messages': []})
+    assert response.status_code == 429 and response.headers['retry-after'] == '0'
+    assert httpx.post(f'{standin.base_url}/_standin/config',
+                      json={'unknown': 1}).status_code == 400
@@ -0,0 +1,71 @@
+"""Tests the end-to-end load test in spotify_data/loadtest."""
+
+import pytest
+from spotify_data.groq_client import reset_groq_clients
+from spotify_data.loadtest import Recorder, percentile, run_load_test, summarize
+from spotify_data.spotify_client import reset_spotify_client
+from spotify_data.standins.llm import start_llm_server
+from spotify_data.standins.spotify import start_spotify_server
+
+
+def test_percentile_interpolates_between_ranks():
+    """Percentiles of sorted samples interpolate linearly, like numpy's default."""
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(values, 50) == 5.5
+    assert percentile(values, 95) == pytest.approx(9.55)
+    assert percentile(values, 100) == 10
+    assert percentile([7], 99) == 7
+
+
+def test_summarize_reports_latency_and_errors_per_endpoint():
+    """Every endpoint gets its count, error rate, statuses and latency percentiles."""
+    recorder = Recorder()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        recorder.record('updateuser', seconds, 200, True)
+    recorder.record('updateuser', 1.0, 500, False)
+    recorder.record('addwrapped', 0.5, None, False)
+    recorder.count('completed')
+    recorder.count('wraps', 2)
+    recorder.finished = recorder.started + 2
+
+    summary = summarize(recorder)
+    assert summary['requests'] == {'total': 6, 'errors': 2, 'error_rate': 0.3333}
+    assert summary['throughput']['wraps_per_second'] == 1.0
+    updateuser = summary['endpoints']['updateuser']
+    assert updateuser['statuses'] == {'200': 4, '500': 1}
+    assert updateuser['error_rate'] == 0.2
+    assert updateuser['latency_ms']['p50'] == 300.0
+    assert updateuser['latency_ms']['max'] == 1000.0
+    assert summary['endpoints']['addwrapped']['statuses'] == {'connection_error': 1}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_runs_the_whole_flow(live_server, settings, monkeypatch):
+    """Simulated users sign up, link Spotify, create wraps and view every slide."""
+    spotify = start_spotify_server(latency_ms=0, artists=100, tracks=500, markets=5)
+    llm = start_llm_server(latency_ms=0, prefill_ms_per_1k_tokens=0, tokens_per_second=0,
+                           words=8)
+    settings.SPOTIFY_API_BASE_URL = spotify.base_url + '/v1'
+    settings.SPOTIFY_ACCOUNTS_BASE_URL = spotify.base_url
+    settings.GROQ_BASE_URL = llm.base_url
+    settings.GROQ_API_KEY = 'standin'
+    settings.SLIDE_TEXTS_IN_BACKGROUND = False
+    for name in ('CLIENT_ID', 'CLIENT_SECRET', 'SCOPE', 'REDIRECT_URI'):
+        monkeypatch.setenv(name, 'load-test')
+    reset_spotify_client()
+    reset_groq_clients()
+    try:
+        recorder = run_load_test(live_server.url, users=1, iterations=2, prefix='loadtest')
+    finally:
+        for server in (spotify, llm):
+            server.shutdown()
+            server.server_close()
+        reset_spotify_client()
+        reset_groq_clients()
+
+    summary = summarize(recorder)
+    assert summary['sessions'] == {'completed': 2, 'failed': 0}
+    assert summary['requests']['errors'] == 0
+    assert summary['accounts_not_deleted'] == 0
+    assert summary['endpoints']['displayartists duo']['count'] == 2
+    assert spotify.standin.snapshot()[1]['tokens_issued'] == 2
@@ -0,0 +1,97 @@
+"""Tests the background pre-warm of SpotifyUser snapshots (spotify_data/prewarm)."""
+
+from io import StringIO
+from unittest.mock import patch
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from accounts.models import SpotifyToken
+from spotify_data import prewarm
+from spotify_data.models import SpotifyUser
+from spotify_data.prewarm import active_spotify_users, prewarm_users
+from spotify_data.ratelimit import LOW, current_priority
+
+
+def make_user(name, last_login, synced_terms=None):
+    """A logged-in user with a token and a SpotifyUser row."""
+    user = User.objects.create_user(username=name, password='password')
+    user.last_login = last_login
+    user.save()
+    SpotifyToken.objects.create(user=name, username=name, access_token=f'{name}-token',
+                                refresh_token='refresh', token_type='Bearer',
+                                expires_in=timezone.now() + timezone.timedelta(hours=1))
+    return SpotifyUser.objects.create(user=user, spotify_id=f'{name}-id', display_name=name,
+                                      synced_terms=synced_terms or {})
+
+
+def fake_spotify(priorities):
+    """Patch the fetchers, recording the rate-limit priority each call ran at."""
+    def items(access_token, timelimit, *args, **kwargs):
+        priorities.append(current_priority())
+        return [{'id': 'a', 'name': access_token, 'genres': ['pop'], 'popularity': 1}]
+
+    def user_data(access_token):
+        return {'id': access_token.replace('-token', '-id'), 'email': 'a@b.com'}
+
+    return (patch('spotify_data.prewarm.get_spotify_user_data', side_effect=user_data),
+            patch('spotify_data.prewarm.get_user_favorite_tracks', side_effect=items),
+            patch('spotify_data.prewarm.get_user_favorite_artists', side_effect=items))
+
+
+@pytest.mark.django_db
+def test_active_users_only():
+    """Users who have not logged in recently are not pre-warmed."""
+    now = timezone.now()
+    make_user('active', now)
+    make_user('idle', now - timezone.timedelta(days=30))
+    names = [u.display_name for u in active_spotify_users(timezone.timedelta(days=7))]
+    assert names == ['active']
+
+
+@pytest.mark.django_db
+def test_prewarm_users_in_batches():
+    """Stale users are synced at LOW priority; fresh ones are skipped."""
+    now = timezone.now()
+    for i in range(3):
+        make_user(f'user{i}', now)
+    fresh = {term: now.isoformat() for term in ('short', 'medium', 'long')}
+    make_user('fresh', now, synced_terms=fresh)
+
+    priorities = []
+    user_patch, tracks_patch, artists_patch = fake_spotify(priorities)
+    with user_patch, tracks_patch, artists_patch, \
+            patch('spotify_data.prewarm.prewarm_batch', wraps=prewarm.prewarm_batch) as batch:
+        counts = prewarm_users(SpotifyUser.objects.order_by('id'), batch_size=2)
+
+    assert counts == {'synced': 3, 'skipped': 1, 'failed': 0}
+    assert batch.call_count == 2
+    assert priorities and set(priorities) == {LOW}
+    spotify_user = SpotifyUser.objects.get(display_name='user1')
+    assert spotify_user.favorite_artists_long[0]['name'] == 'user1-token'
+    assert spotify_user.favorite_genres_short == ['pop']
+    assert spotify_user.last_synced is not None
+    assert SpotifyUser.objects.get(display_name='fresh').last_synced is None
+
+
+@pytest.mark.django_db
+def test_prewarm_failed_fetch_leaves_row():
+    """A user whose Spotify calls fail is counted and left untouched."""
+    make_user('user', timezone.now())
+    with patch('spotify_data.prewarm.get_spotify_user_data', return_value=None), \
+            patch('spotify_data.prewarm.get_user_favorite_tracks', return_value=[]), \
+            patch('spotify_data.prewarm.get_user_favorite_artists', return_value=[]):
+        counts = prewarm_users(SpotifyUser.objects.all())
+    assert counts == {'synced': 0, 'skipped': 0, 'failed': 1}
+    assert SpotifyUser.objects.get(display_name='user').last_synced is None
+
+
+@pytest.mark.django_db
+def test_prewarm_command():
+    """The management command runs one pass and reports the counts."""
+    make_user('user', timezone.now())
+    out = StringIO()
+    user_patch, tracks_patch, artists_patch = fake_spotify([])
+    with user_patch, tracks_patch, artists_patch:
+        call_command('prewarm_spotify_users', stdout=out)
+    assert '1 synced, 0 already fresh, 0 failed' in out.getvalue()
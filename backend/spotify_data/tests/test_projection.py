@@ -0,0 +1,86 @@
+"""Tests the projection of Spotify payloads before they are stored."""
+
+import importlib
+import json
+import pytest
+from django.apps import apps
+from django.contrib.auth.models import User
+from spotify_data.models import SpotifyUser, SpotifyWrapped
+from spotify_data.utils import build_spotify_user_snapshot, project_artist, project_track
+
+MARKETS = ['AD', 'AE', 'AG', 'AL', 'AM'] * 36
+IMAGES = [{'url': 'https://i.scdn.co/image/640', 'height': 640, 'width': 640},
+          {'url': 'https://i.scdn.co/image/64', 'height': 64, 'width': 64}]
+
+
+def raw_track(track_id='t1'):
+    """A full track object as returned by /me/top/tracks."""
+    return {
+        'id': track_id, 'name': 'Track', 'duration_ms': 200000, 'popularity': 70,
+        'explicit': False, 'available_markets': MARKETS, 'preview_url': None,
+        'external_ids': {'isrc': 'X'}, 'href': 'https://api.spotify.com/v1/tracks/t1',
+        'artists': [{'id': 'a1', 'name': 'Artist', 'type': 'artist', 'uri': 'spotify:artist:a1',
+                     'external_urls': {'spotify': 'https://open.spotify.com/artist/a1'}}],
+        'album': {'id': 'al1', 'name': 'Album', 'release_date': '2020-01-01',
+                  'available_markets': MARKETS, 'images': IMAGES, 'album_type': 'album',
+                  'artists': [{'id': 'a1', 'name': 'Artist'}], 'total_tracks': 12},
+    }
+
+
+def raw_artist(artist_id='a1'):
+    """A full artist object as returned by /me/top/artists."""
+    return {'id': artist_id, 'name': 'Artist', 'genres': ['pop'], 'popularity': 10,
+            'images': IMAGES, 'followers': {'href': None, 'total': 1000}, 'type': 'artist',
+            'uri': f'spotify:artist:{artist_id}', 'href': 'https://api.spotify.com/v1/artists/a1'}
+
+
+def test_project_track_keeps_used_fields():
+    """Tracks keep what the serializers and display views read, and nothing else."""
+    track = project_track(raw_track())
+    assert track == {
+        'id': 't1', 'name': 'Track', 'duration_ms': 200000, 'popularity': 70,
+        'artists': [{'id': 'a1', 'name': 'Artist'}],
+        'album': {'id': 'al1', 'name': 'Album', 'release_date': '2020-01-01', 'images': IMAGES},
+    }
+    assert len(json.dumps(track)) * 5 < len(json.dumps(raw_track()))
+
+
+def test_project_artist_keeps_used_fields():
+    """Artists keep id, name, genres, popularity and images."""
+    assert project_artist(raw_artist()) == {'id': 'a1', 'name': 'Artist', 'genres': ['pop'],
+                                            'popularity': 10, 'images': IMAGES}
+
+
+def test_snapshot_is_projected():
+    """The stored snapshot holds projected items."""
+    snapshot = build_spotify_user_snapshot(
+        {'id': 'me'}, {'tracks_short': [raw_track()], 'artists_short': [raw_artist()]},
+        terms=('short',))
+    assert 'available_markets' not in snapshot['favorite_tracks_short'][0]
+    assert 'followers' not in snapshot['favorite_artists_short'][0]
+    assert snapshot['quirkiest_artists_short'] == [project_artist(raw_artist())]
+
+
+@pytest.mark.django_db
+def test_slim_migration_rewrites_existing_rows():
+    """The one-off migration trims rows stored before projection existed."""
+    user = User.objects.create_user(username='user', password='password')
+    wrap = {'id': 1, 'favorite_tracks': [raw_track()], 'favorite_artists': [raw_artist()],
+            'llama_description': 'roast'}
+    SpotifyUser.objects.create(user=user, spotify_id='me', display_name='user',
+                               favorite_tracks_short=[raw_track()],
+                               quirkiest_artists_long=[raw_artist()], past_roasts=[wrap])
+    SpotifyWrapped.objects.create(user='user', favorite_tracks=[raw_track()],
+                                  favorite_artists=[raw_artist()], quirkiest_artists=[])
+
+    migration = importlib.import_module(
+        'spotify_data.migrations.0009_slim_stored_spotify_payloads')
+    migration.slim_payloads(apps, None)
+
+    spotify_user = SpotifyUser.objects.get(spotify_id='me')
+    assert spotify_user.favorite_tracks_short == [project_track(raw_track())]
+    assert spotify_user.quirkiest_artists_long == [project_artist(raw_artist())]
+    assert spotify_user.past_roasts[0]['favorite_tracks'] == [project_track(raw_track())]
+    assert spotify_user.past_roasts[0]['llama_description'] == 'roast'
+    wrapped = SpotifyWrapped.objects.get()
+    assert wrapped.favorite_artists == [project_artist(raw_artist())]
@@ -0,0 +1,66 @@
+"""Tests compact prompt rendering and prompt size accounting (spotify_data/prompts)."""
+
+from unittest.mock import patch, MagicMock
+from spotify_data.llm_cache import LLMResponseCache
+from spotify_data.prompts import (estimate_tokens, prompt_stats, render_artist,
+                                  render_subject)
+from spotify_data.utils import comparison_prompt, create_groq_description, description_prompt
+
+RAW_ARTIST = {
+    'external_urls': {'spotify': 'https://open.spotify.com/artist/abc'},
+    'followers': {'href': None, 'total': 123456},
+    'genres': ['indie pop', 'sad girl', 'folk'],
+    'href': 'https://api.spotify.com/v1/artists/abc',
+    'id': 'abc',
+    'images': [{'url': 'https://i.scdn.co/image/abc', 'height': 640, 'width': 640}],
+    'name': 'Phoebe Bridgers',
+    'popularity': 74,
+    'type': 'artist',
+    'uri': 'spotify:artist:abc',
+}
+
+
+def test_render_artist_keeps_salient_fields():
+    """Only the name, two genres and popularity remain; partial artists render what they have."""
+    assert render_artist(RAW_ARTIST) == 'Phoebe Bridgers (indie pop, sad girl; popularity 74)'
+    assert render_artist({'name': 'Solo'}) == 'Solo'
+    assert render_artist({'name': 'Pop', 'popularity': 0}) == 'Pop (popularity 0)'
+
+
+def test_render_subject_caps_items_and_characters():
+    """Lists keep whole entries within the caps; strings pass through unless too long."""
+    artists = [dict(RAW_ARTIST, name=f'Artist {i}') for i in range(20)]
+    assert render_subject(artists, max_items=3).count('Artist') == 3
+    capped = render_subject(artists, max_chars=120)
+    assert len(capped) <= 120
+    assert capped.endswith('popularity 74)')
+    assert render_subject('Track by Artist') == 'Track by Artist'
+    assert render_subject('x' * 50, max_chars=10) == 'x' * 10
+    assert prompt_stats()['truncated'] >= 2
+
+
+def test_description_prompt_is_compact():
+    """Raw artist objects no longer leak URLs and ids into the prompt."""
+    prompt = description_prompt([RAW_ARTIST] * 5)
+    assert 'https://' not in prompt and 'spotify:artist' not in prompt
+    assert estimate_tokens(prompt) * 5 < estimate_tokens(str([RAW_ARTIST] * 5))
+    assert "like Phoebe Bridgers (indie pop, sad girl; popularity 74); Phoebe" in prompt
+
+
+def test_comparison_prompt_renders_artist_dicts():
+    """Duo comparisons pass {'name', 'popularity'} dicts, which render as text."""
+    prompt = comparison_prompt({'name': 'A', 'popularity': 10}, 'B by C')
+    assert prompt.startswith('Compare A (popularity 10) and B by C in a funny')
+
+
+def test_prompt_sizes_are_recorded():
+    """Every prompt sent to Groq is counted with its size."""
+    before = prompt_stats()
+    with patch('spotify_data.utils.get_llm_cache', return_value=LLMResponseCache(None)), \
+            patch('spotify_data.utils.get_groq_client') as mock_groq:
+        mock_groq.return_value.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content='Roast'))])
+        create_groq_description('key', [RAW_ARTIST])
+    after = prompt_stats()
+    assert after['prompts'] == before['prompts'] + 1
+    assert 0 < after['tokens'] - before['tokens'] < 100
@@ -0,0 +1,130 @@
+"""Tests the shared Spotify rate limiter in spotify_data/ratelimit."""
+
+import threading
+import time
+from unittest.mock import patch, Mock
+import pytest
+from spotify_data.ratelimit import (FileTokenBucket, SpotifyRequestScheduler, HIGH, LOW,
+                                    request_priority, current_priority, retry_after_seconds)
+from spotify_data.spotify_client import SpotifyClient
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    """A small bucket: 2 requests of burst, refilled at 10 per second."""
+    return FileTokenBucket(str(tmp_path / 'bucket.json'), rate=10, capacity=2)
+
+
+def test_bucket_allows_burst_then_paces(bucket):
+    """The burst is served immediately, after which callers are told how long to wait."""
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    wait = bucket.reserve()
+    assert 0 < wait <= 0.1
+
+
+def test_bucket_state_is_shared_through_the_file(bucket):
+    """A second bucket on the same file (another process) sees the tokens already taken."""
+    other = FileTokenBucket(bucket.path, rate=10, capacity=2)
+    bucket.reserve()
+    bucket.reserve()
+    assert other.reserve() > 0
+
+
+def test_block_for_pauses_every_bucket(bucket):
+    """A Retry-After back-off applies to every user of the state file."""
+    other = FileTokenBucket(bucket.path, rate=10, capacity=2)
+    bucket.block_for(5)
+    assert other.reserve() > 4
+
+
+def test_low_priority_leaves_headroom_to_other_processes(tmp_path):
+    """LOW callers stop short of the headroom, which other processes can still take."""
+    path = str(tmp_path / 'bucket.json')
+    background = FileTokenBucket(path, rate=10, capacity=3, low_priority_headroom=2)
+    web = FileTokenBucket(path, rate=10, capacity=3, low_priority_headroom=2)
+    assert background.reserve(LOW) == 0
+    assert background.reserve(LOW) > 0
+    assert web.reserve() == 0
+    assert web.reserve(HIGH) == 0
+
+
+def test_retry_after_seconds():
+    """Retry-After is parsed as seconds, with a default for missing or bad values."""
+    assert retry_after_seconds(Mock(headers={'Retry-After': '3'})) == 3
+    assert retry_after_seconds(Mock(headers={})) == 1
+    assert retry_after_seconds(Mock(headers={'Retry-After': 'soon'}), default=2) == 2
+
+
+def test_request_priority_context():
+    """request_priority sets the priority for calls made inside it."""
+    with request_priority(LOW):
+        assert current_priority() == LOW
+    assert current_priority() != LOW
+
+
+def test_scheduler_serves_higher_priority_first():
+    """Queued high-priority callers get the next token before low-priority ones."""
+    tokens = threading.Semaphore(0)
+    fake_bucket = Mock()
+    fake_bucket.reserve.side_effect = lambda priority: 0 if tokens.acquire(blocking=False) else 0.01
+    scheduler = SpotifyRequestScheduler(fake_bucket, max_wait=5)
+    order = []
+
+    def worker(priority, name):
+        scheduler.acquire(priority)
+        order.append(name)
+
+    low = threading.Thread(target=worker, args=(LOW, 'low'))
+    low.start()
+    time.sleep(0.05)
+    high = threading.Thread(target=worker, args=(HIGH, 'high'))
+    high.start()
+    time.sleep(0.05)
+    tokens.release()
+    tokens.release()
+    low.join(2)
+    high.join(2)
+
+    assert order == ['high', 'low']
+    assert scheduler.stats()['queued'] == 2
+
+
+def test_scheduler_gives_up_after_max_wait():
+    """A caller that would wait past max_wait is turned away."""
+    fake_bucket = Mock()
+    fake_bucket.reserve.return_value = 60
+    scheduler = SpotifyRequestScheduler(fake_bucket, max_wait=1)
+    assert scheduler.acquire() is False
+    assert scheduler.stats()['gave_up'] == 1
+
+
+def test_scheduler_does_not_hold_the_queue_while_reserving():
+    """A slow bucket file lock does not block other threads from using the scheduler."""
+    fake_bucket = Mock()
+    fake_bucket.reserve.side_effect = lambda priority: time.sleep(0.3) or 0
+    scheduler = SpotifyRequestScheduler(fake_bucket, max_wait=5)
+    caller = threading.Thread(target=scheduler.acquire)
+    caller.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    assert scheduler.stats()['waiting'] == 1
+    assert time.monotonic() - start < 0.1
+    caller.join(2)
+    assert scheduler.stats()['requests'] == 1
+
+
+def test_client_retries_after_429(bucket):
+    """A 429 is counted, backs off for Retry-After, and the request is retried."""
+    scheduler = SpotifyRequestScheduler(bucket, max_wait=5, max_retries=2)
+    client = SpotifyClient()
+    throttled = Mock(status_code=429, headers={'Retry-After': '0.05'})
+    ok = Mock(status_code=200)
+    with patch('spotify_data.spotify_client.get_scheduler', return_value=scheduler), \
+            patch.object(client.session, 'get', side_effect=[throttled, ok]):
+        assert client.get('/me', 'token') is ok
+
+    stats = scheduler.stats()
+    assert stats['throttled'] == 1
+    assert stats['retried'] == 1
+    assert stats['requests'] == 2
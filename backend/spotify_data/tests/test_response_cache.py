@@ -0,0 +1,107 @@
+"""Tests the ETag / If-None-Match response cache in spotify_data/response_cache."""
+
+import asyncio
+import time
+from unittest.mock import Mock, AsyncMock
+import pytest
+from django.core.cache import cache as default_cache
+from spotify_data.response_cache import SpotifyResponseCache, CachedResponse
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty Django cache."""
+    default_cache.clear()
+    yield
+    default_cache.clear()
+
+
+def response(status_code, body=None, etag=None):
+    """Fake Spotify response."""
+    mock = Mock(status_code=status_code, headers={'ETag': etag} if etag else {})
+    mock.json.return_value = body
+    return mock
+
+
+def test_key_depends_on_user_endpoint_and_params():
+    """Keys differ per user, endpoint and params, but not per param order."""
+    key = SpotifyResponseCache.key
+    assert key('u1', '/me/top/tracks', {'a': 1, 'b': 2}) == key('u1', '/me/top/tracks',
+                                                                  {'b': 2, 'a': 1})
+    assert key('u1', '/me/top/tracks', {}) != key('u2', '/me/top/tracks', {})
+    assert key('u1', '/me/top/tracks', {}) != key('u1', '/me/top/artists', {})
+    assert key('u1', '/me/top/tracks', {'limit': 20}) != key('u1', '/me/top/tracks', {})
+
+
+def test_not_modified_serves_cached_body():
+    """The second request is conditional and a 304 serves the body stored by the first."""
+    cache = SpotifyResponseCache()
+    send = Mock(side_effect=[response(200, {'items': [1]}, etag='"v1"'), response(304)])
+
+    first = cache.fetch('k', send)
+    second = cache.fetch('k', send)
+
+    assert first.json() == second.json() == {'items': [1]}
+    assert isinstance(second, CachedResponse)
+    assert send.call_args_list[0].args[0] == {}
+    assert send.call_args_list[1].args[0] == {'If-None-Match': '"v1"'}
+    assert cache.stats()['not_modified'] == 1
+
+
+def test_changed_payload_replaces_entry():
+    """A 200 to a conditional request replaces the cached body and ETag."""
+    cache = SpotifyResponseCache()
+    send = Mock(side_effect=[response(200, {'items': [1]}, etag='"v1"'),
+                             response(200, {'items': [2]}, etag='"v2"'),
+                             response(304)])
+    cache.fetch('k', send)
+    assert cache.fetch('k', send).json() == {'items': [2]}
+    assert cache.fetch('k', send).json() == {'items': [2]}
+    assert send.call_args_list[2].args[0] == {'If-None-Match': '"v2"'}
+
+
+def test_fresh_entry_skips_request():
+    """Inside the freshness window Spotify is not contacted at all."""
+    cache = SpotifyResponseCache(fresh_for=60)
+    send = Mock(return_value=response(200, {'items': [1]}, etag='"v1"'))
+    cache.fetch('k', send)
+    assert cache.fetch('k', send).json() == {'items': [1]}
+    assert send.call_count == 1
+    assert cache.stats()['fresh_hits'] == 1
+
+
+def test_stale_entry_is_served_and_revalidated_in_background():
+    """Stale entries are returned immediately while a conditional request refreshes them."""
+    cache = SpotifyResponseCache(fresh_for=0, stale_for=60)
+    send = Mock(side_effect=[response(200, {'items': [1]}, etag='"v1"'),
+                             response(200, {'items': [2]}, etag='"v2"')])
+    cache.fetch('k', send)
+    assert cache.fetch('k', send).json() == {'items': [1]}
+
+    for _ in range(50):
+        if send.call_count == 2 and not cache._revalidating:  # pylint: disable=protected-access
+            break
+        time.sleep(0.02)
+    assert default_cache.get('k')['body'] == {'items': [2]}
+
+
+def test_errors_and_missing_etags_are_not_cached():
+    """Only 200 responses with an ETag are stored; errors pass straight through."""
+    cache = SpotifyResponseCache()
+    error = response(429)
+    assert cache.fetch('k', Mock(return_value=error)) is error
+    cache.fetch('k', Mock(return_value=response(200, {'items': []})))
+    assert default_cache.get('k') is None
+
+
+def test_afetch_not_modified():
+    """The async path sends the same conditional request and serves 304s from the cache."""
+    cache = SpotifyResponseCache()
+    send = AsyncMock(side_effect=[response(200, {'items': [1]}, etag='"v1"'), response(304)])
+
+    async def fetch_twice():
+        await cache.afetch('k', send)
+        return await cache.afetch('k', send)
+
+    assert asyncio.run(fetch_twice()).json() == {'items': [1]}
+    assert send.call_args_list[1].args[0] == {'If-None-Match': '"v1"'}
@@ -0,0 +1,197 @@
+"""Tests coalescing identical in-flight completions and early refresh of hot cache entries."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import pytest
+from spotify_data.llm_cache import FileLLMCacheBackend, LLMResponseCache
+from spotify_data.llm_guard import llm_budget
+from spotify_data.singleflight import (AsyncSingleFlight, SingleFlight, release_lease,
+                                       try_lease)
+
+
+@pytest.fixture
+def cache(tmp_path, settings):
+    """A file-backed LLM response cache with its lease files under tmp_path."""
+    settings.LLM_SINGLE_FLIGHT_LOCK_DIR = str(tmp_path / 'locks')
+    return LLMResponseCache(FileLLMCacheBackend(str(tmp_path / 'cache'), 60, 100))
+
+
+def test_single_flight_shares_one_call():
+    """Concurrent callers with one key run the function once and all get its result."""
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'text'
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(flights.do, 'k', slow)
+        started.wait()
+        followers = [executor.submit(flights.do, 'k', slow) for _ in range(4)]
+        results = [leader.result()] + [future.result() for future in followers]
+    assert results == ['text'] * 5
+    assert len(calls) == 1
+    assert flights.shared == 4
+    assert flights.do('k', lambda: 'again') == 'again'
+
+
+def test_single_flight_shares_errors():
+    """A follower gets the leader's exception rather than retrying."""
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError('down')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, 'k', failing)
+        started.wait()
+        follower = executor.submit(flights.do, 'k', lambda: 'not called')
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_async_single_flight_shares_one_call():
+    """Coroutines awaiting one key on a loop share a single run."""
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'text'
+
+    async def main():
+        return await asyncio.gather(*(flights.do('k', slow) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['text'] * 5
+    assert len(calls) == 1
+
+
+def test_lease_is_exclusive_per_key(tmp_path, settings):
+    """One holder per key until released; keys sharing a prefix do not collide."""
+    settings.LLM_SINGLE_FLIGHT_LOCK_DIR = str(tmp_path)
+    assert try_lease('abc123')
+    assert not try_lease('abc123')
+    assert try_lease('abc999')
+    release_lease('abc123')
+    assert try_lease('abc123')
+
+
+def test_abandoned_lease_is_reclaimed(tmp_path, settings):
+    """A lease older than LLM_SINGLE_FLIGHT_LEASE (its holder died) can be taken over."""
+    settings.LLM_SINGLE_FLIGHT_LOCK_DIR = str(tmp_path)
+    settings.LLM_SINGLE_FLIGHT_LEASE = 0
+    assert try_lease('abc123')
+    assert try_lease('abc123')
+
+
+def test_get_or_generate_coalesces_concurrent_misses(cache):
+    """Ten concurrent misses for one prompt generate it once; later calls are hits."""
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'roast'
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(
+            lambda _: cache.get_or_generate('m', 's', 'u', generate), range(10)))
+    assert results == ['roast'] * 10
+    assert len(calls) == 1
+    assert cache.get('m', 's', 'u') == 'roast'
+    assert cache.stats()['coalesced'] >= 1
+
+
+def test_get_or_generate_rechecks_after_lease(cache):
+    """A miss that another process filled just before the lease was taken is not generated again."""
+    def lookup_then_other_process(*args):
+        result = LLMResponseCache.lookup(cache, *args)
+        cache.set('m', 's', 'u', 'from the other process')
+        return result
+
+    with patch.object(cache, 'lookup', side_effect=lookup_then_other_process):
+        text = cache.get_or_generate('m', 's', 'u', lambda: pytest.fail('generated twice'))
+    assert text == 'from the other process'
+
+
+def test_get_or_generate_waits_for_another_process(cache):
+    """While another process holds the lease, a miss polls the cache for its answer."""
+    key = cache.key('m', 's', 'u')
+    assert try_lease(key)
+    timer = threading.Timer(0.2, cache.set, ('m', 's', 'u', 'from the other process'))
+    timer.start()
+    try:
+        text = cache.get_or_generate('m', 's', 'u', lambda: pytest.fail('generated twice'))
+    finally:
+        timer.join()
+    assert text == 'from the other process'
+    assert cache.stats()['coalesced'] == 1
+
+
+def test_wait_for_another_process_is_capped_by_the_budget(cache):
+    """A miss stops waiting for another process once the request's LLM budget is spent."""
+    assert try_lease(cache.key('m', 's', 'u'))
+    start = time.monotonic()
+    with llm_budget(0.2):
+        assert cache.get_or_generate('m', 's', 'u', lambda: 'generated') == 'generated'
+    assert time.monotonic() - start < 1
+
+
+def test_get_or_generate_errors_are_not_cached(cache):
+    """An exception from generate reaches the caller and leaves no entry behind."""
+    def failing():
+        raise RuntimeError('down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_generate('m', 's', 'u', failing)
+    assert cache.get('m', 's', 'u') is None
+
+
+def test_aget_or_generate_coalesces(cache):
+    """The async path shares one generation among concurrent awaiters and caches it."""
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'roast'
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_generate('m', 's', 'u', generate)
+                                      for _ in range(5)))
+
+    assert asyncio.run(main()) == ['roast'] * 5
+    assert len(calls) == 1
+    assert cache.get('m', 's', 'u') == 'roast'
+
+
+def test_xfetch_refreshes_near_expiry_only():
+    """Early refresh is certain at expiry, never long before it, and off without a compute time."""
+    cache = LLMResponseCache(None)
+    assert cache.should_refresh_early(ttl_left=0, compute_time=2)
+    assert not cache.should_refresh_early(ttl_left=10000, compute_time=0.01)
+    assert not cache.should_refresh_early(ttl_left=0, compute_time=0)
+    cache.beta = 0
+    assert not cache.should_refresh_early(ttl_left=0, compute_time=2)
+
+
+def test_early_refresh_regenerates_while_others_hit(cache):
+    """The caller picked for an early refresh regenerates the entry and replaces the old one."""
+    cache.set('m', 's', 'u', 'old', compute_time=1)
+    with patch.object(cache, 'should_refresh_early', return_value=True):
+        assert cache.get('m', 's', 'u') is None
+        assert cache.get_or_generate('m', 's', 'u', lambda: 'new') == 'new'
+    assert cache.get('m', 's', 'u') == 'new'
+    assert cache.stats()['early_refreshes'] == 2
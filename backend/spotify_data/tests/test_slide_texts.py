@@ -0,0 +1,151 @@
+"""Tests precomputing slide texts at wrap creation and serving them from the display views."""
+
+import json
+import threading
+import time
+from unittest.mock import patch, Mock
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from spotify_data.llm_guard import llm_budget
+from spotify_data.models import SpotifyUser, SpotifyWrapped
+from spotify_data.slides import generate_slide_texts
+from spotify_data.utils import llm_error_text
+from spotify_data.views import (add_spotify_wrapped, display_artists, display_genres,
+                                display_quirky, display_songs)
+
+ARTISTS = [{'id': str(i), 'name': f'Artist {i}', 'popularity': i, 'genres': ['pop'],
+            'images': [{'url': f'http://example.com/{i}.jpg'}]} for i in range(5)]
+TRACKS = [{'id': f't{i}', 'name': f'Track {i}', 'artists': [{'name': f'Artist {i}'}],
+           'album': {'images': [{'url': f'http://example.com/t{i}.jpg'}]}} for i in range(5)]
+
+
+def fake_batch(key, prompts):
+    """Answer every prompt with a numbered text."""
+    return [f'text {i}' for i in range(len(prompts))]
+
+
+@pytest.fixture
+def spotify_user(db):  # pylint: disable=unused-argument
+    """A SpotifyUser with short-term favorites."""
+    user = User.objects.create_user(username='testuser', password='password')
+    return SpotifyUser.objects.create(user=user, spotify_id='me', display_name='testuser',
+                                      favorite_artists_short=ARTISTS,
+                                      favorite_tracks_short=TRACKS,
+                                      favorite_genres_short=['pop', 'rock'],
+                                      quirkiest_artists_short=ARTISTS[:2])
+
+
+@pytest.mark.django_db
+def test_generate_slide_texts_splits_one_batch():
+    """One batch covers all four slides; its answers are split back per slide."""
+    wrapped = {'favorite_artists': ARTISTS, 'favorite_tracks': TRACKS,
+               'favorite_genres': ['pop'], 'quirkiest_artists': ARTISTS[:2]}
+    with patch('spotify_data.slides.create_groq_batch', side_effect=fake_batch) as batch:
+        texts = generate_slide_texts('key', wrapped, False)
+    assert batch.call_count == 1
+    assert texts == {'artists': [f'text {i}' for i in range(5)],
+                     'songs': [f'text {i}' for i in range(5, 10)],
+                     'genres': ['text 10'], 'quirky': ['text 11']}
+
+
+@pytest.mark.django_db
+def test_generate_slide_texts_skips_failed_slides():
+    """A slide with a failed completion is not stored, so it is generated again later."""
+    wrapped = {'favorite_artists': ARTISTS[:1], 'favorite_tracks': TRACKS[:1],
+               'favorite_genres': ['pop'], 'quirkiest_artists': []}
+    answers = ['ok', llm_error_text('Description', 'down'), 'ok', 'ok']
+    with patch('spotify_data.slides.create_groq_batch', return_value=answers):
+        texts = generate_slide_texts('key', wrapped, False)
+    assert set(texts) == {'artists', 'genres', 'quirky'}
+
+
+@pytest.mark.django_db
+def test_generate_slide_texts_keeps_output_that_reads_like_a_fallback():
+    """Only texts flagged as fallbacks are dropped, not LLM output with similar wording."""
+    wrapped = {'favorite_artists': ARTISTS[:1], 'favorite_tracks': TRACKS[:1],
+               'favorite_genres': ['pop'], 'quirkiest_artists': []}
+    answers = ['ok', 'Taste unavailable due to API error: too mainstream', 'ok', 'ok']
+    with patch('spotify_data.slides.create_groq_batch', return_value=answers):
+        texts = generate_slide_texts('key', wrapped, False)
+    assert set(texts) == {'artists', 'songs', 'genres', 'quirky'}
+
+
+def test_wrap_creation_stores_slides_and_display_reads_them(spotify_user, settings):
+    """Creating a wrap stores every slide; the display views then never call Groq."""
+    settings.SLIDE_TEXTS_IN_BACKGROUND = False
+    settings.GROQ_API_KEY = 'key'
+    with patch('spotify_data.views.create_groq_description', return_value='summary'), \
+            patch('spotify_data.slides.create_groq_batch', side_effect=fake_batch):
+        response = add_spotify_wrapped(Mock(user=spotify_user.user, GET={'termselection': '0'}))
+    wrapped_id = json.loads(response.content)['spotify_wrapped']['id']
+    assert set(SpotifyWrapped.objects.get(id=wrapped_id).slide_texts) == \
+        {'artists', 'songs', 'genres', 'quirky'}
+
+    request = Mock(GET={'id': str(wrapped_id), 'isDuo': 'false'})
+    with patch('spotify_data.slides.create_groq_batch') as batch:
+        artists = json.loads(display_artists(request).content)
+        songs = json.loads(display_songs(request).content)
+        genres = json.loads(display_genres(request).content)
+        quirky = json.loads(display_quirky(request).content)
+    batch.assert_not_called()
+    assert [artist['desc'] for artist in artists] == [f'text {i}' for i in range(5)]
+    assert songs[0]['desc'] == 'text 5'
+    assert genres == {'genres': 'pop, rock', 'desc': 'text 10'}
+    assert quirky == 'text 11'
+
+
+@pytest.mark.django_db
+def test_display_generates_missing_slides(settings):
+    """A wrap without stored texts (e.g. created before this change) is generated on demand."""
+    settings.GROQ_API_KEY = 'key'
+    wrapped = SpotifyWrapped.objects.create(user='testuser', favorite_artists=ARTISTS)
+    with patch('spotify_data.slides.create_groq_batch', side_effect=fake_batch) as batch:
+        response = display_artists(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+    assert batch.call_count == 1
+    assert json.loads(response.content)[4]['desc'] == 'text 4'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_display_waits_for_the_background_job(settings):
+    """A display view arriving while the slides are being generated waits for them."""
+    settings.GROQ_API_KEY = 'key'
+    settings.SLIDE_TEXTS_POLL_INTERVAL = 0.01
+    wrapped = SpotifyWrapped.objects.create(user='testuser', favorite_artists=ARTISTS,
+                                            slide_texts_pending_since=timezone.now())
+    stored = {'artists': [f'stored {i}' for i in range(5)]}
+    timer = threading.Timer(0.1, lambda: SpotifyWrapped.objects.filter(id=wrapped.id).update(
+        slide_texts=stored, slide_texts_pending_since=None))
+    timer.start()
+    with patch('spotify_data.slides.create_groq_batch', side_effect=fake_batch) as batch:
+        response = display_artists(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+    timer.join()
+    batch.assert_not_called()
+    assert json.loads(response.content)[0]['desc'] == 'stored 0'
+
+
+@pytest.mark.django_db
+def test_display_does_not_wait_for_a_stale_job(settings):
+    """A pending mark older than SLIDE_TEXTS_WAIT (the job died) is ignored."""
+    settings.GROQ_API_KEY = 'key'
+    settings.SLIDE_TEXTS_WAIT = 1
+    wrapped = SpotifyWrapped.objects.create(
+        user='testuser', favorite_artists=ARTISTS,
+        slide_texts_pending_since=timezone.now() - timezone.timedelta(minutes=5))
+    with patch('spotify_data.slides.create_groq_batch', side_effect=fake_batch) as batch:
+        display_artists(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+    assert batch.call_count == 1
+
+
+@pytest.mark.django_db
+def test_display_wait_is_capped_by_the_llm_budget(settings):
+    """A view does not wait for the background job past the request's LLM budget."""
+    settings.GROQ_API_KEY = 'key'
+    settings.SLIDE_TEXTS_POLL_INTERVAL = 0.01
+    wrapped = SpotifyWrapped.objects.create(user='testuser', favorite_artists=ARTISTS,
+                                            slide_texts_pending_since=timezone.now())
+    start = time.monotonic()
+    with llm_budget(0.1), patch('spotify_data.slides.create_groq_batch',
+                                side_effect=fake_batch):
+        display_artists(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+    assert time.monotonic() - start < 1
@@ -0,0 +1,158 @@
+"""Tests the per-slide prompts and batched slide generation."""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch, MagicMock
+import pytest
+from spotify_data.llm_cache import FileLLMCacheBackend, LLMResponseCache
+from spotify_data.async_utils import acreate_groq_completions
+from spotify_data.slides import artist_slide_prompts, song_slide_prompts
+from spotify_data.utils import (COMPARISON_SYSTEM_PROMPT, ROAST_SYSTEM_PROMPT,
+                                create_groq_batch, create_groq_completions,
+                                llm_timeout_text, parse_batch_response)
+
+WRAPPED = {
+    'favorite_artists': [{'name': f'Artist {i}', 'popularity': i} for i in range(6)],
+    'favorite_tracks': [{'name': f'Track {i}', 'artists': [{'name': f'Artist {i}'}]}
+                        for i in range(6)],
+}
+
+
+def completion(text):
+    """A chat completion response holding `text`."""
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=text))])
+
+
+@pytest.fixture
+def no_cache():
+    """Run without the LLM response cache."""
+    with patch('spotify_data.utils.get_llm_cache', return_value=LLMResponseCache(None)):
+        yield
+
+
+def test_artist_slide_prompts():
+    """Solo slides describe five artists; duo slides compare neighbours and describe the last."""
+    solo = artist_slide_prompts(WRAPPED, False)
+    assert len(solo) == 5
+    assert {system for system, _, _ in solo} == {ROAST_SYSTEM_PROMPT}
+    duo = artist_slide_prompts(WRAPPED, True)
+    assert [system for system, _, _ in duo] == [COMPARISON_SYSTEM_PROMPT] * 4 + \
+        [ROAST_SYSTEM_PROMPT]
+    assert 'Artist 0' in duo[0][1] and 'Artist 1' in duo[0][1]
+
+
+def test_song_slide_prompts():
+    """Song prompts name each track with its first artist."""
+    prompts = song_slide_prompts(WRAPPED, False)
+    assert 'Track 2 by Artist 2' in prompts[2][1]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('["a", "b"]', ['a', 'b']),
+    ('Sure! Here you go:\n["a", "b"]\nEnjoy.', ['a', 'b']),
+    ('["a"]', None),
+    ('["a", 3]', None),
+    ('not json', None),
+    ('[broken, "json"]', None),
+])
+def test_parse_batch_response(text, expected):
+    """Only a JSON array with one non-empty string per item is accepted."""
+    assert parse_batch_response(text, 2) == expected
+
+
+@pytest.mark.usefixtures('no_cache')
+def test_create_groq_batch_one_call():
+    """Five items cost a single completion."""
+    prompts = artist_slide_prompts(WRAPPED, False)
+    answers = [f'roast {i}' for i in range(5)]
+    with patch('spotify_data.utils.get_groq_client') as mock_client:
+        create = mock_client.return_value.chat.completions.create
+        create.return_value = completion(json.dumps(answers))
+        assert create_groq_batch('key', prompts) == answers
+    assert create.call_count == 1
+    assert '5. ' in create.call_args.kwargs['messages'][1]['content']
+
+
+@pytest.mark.usefixtures('no_cache')
+def test_create_groq_batch_falls_back_per_item():
+    """An unparsable batch answer falls back to one completion per item."""
+    prompts = artist_slide_prompts(WRAPPED, False)[:3]
+    def answer(messages, **kwargs):  # pylint: disable=unused-argument
+        user = messages[1]['content']
+        if user.startswith('1. '):
+            return completion('I refuse to answer in JSON')
+        # Per-item completions run in parallel, so answer by content rather than call order
+        return completion('single ' + user.split('Artist ')[1][0])
+
+    with patch('spotify_data.utils.get_groq_client') as mock_client:
+        create = mock_client.return_value.chat.completions.create
+        create.side_effect = answer
+        assert create_groq_batch('key', prompts) == ['single 0', 'single 1', 'single 2']
+    assert create.call_count == 4
+
+
+def test_create_groq_batch_uses_item_cache(tmp_path):
+    """Batched answers are cached per item, so a later single completion is a hit."""
+    cache = LLMResponseCache(FileLLMCacheBackend(str(tmp_path), ttl=60, max_entries=100))
+    prompts = artist_slide_prompts(WRAPPED, False)[:2]
+    with patch('spotify_data.utils.get_llm_cache', return_value=cache), \
+            patch('spotify_data.utils.get_groq_client') as mock_client:
+        create = mock_client.return_value.chat.completions.create
+        create.return_value = completion('["one", "two"]')
+        create_groq_batch('key', prompts)
+        assert create_groq_batch('key', prompts) == ['one', 'two']
+    assert create.call_count == 1
+
+
+def slow_completion(delays):
+    """A fake create_groq_completion that sleeps per item and echoes the item number."""
+    def complete(key, system, user, label, timeout):
+        number = int(user.split()[-1])
+        time.sleep(delays[number])
+        return f'text {number}'
+    return complete
+
+
+def test_create_groq_completions_parallel_in_order():
+    """Per-item completions overlap and come back in item order."""
+    prompts = [(ROAST_SYSTEM_PROMPT, f'item {i}', 'Description') for i in range(4)]
+    with patch('spotify_data.utils.create_groq_completion',
+               side_effect=slow_completion([0.3, 0.1, 0.2, 0.0])):
+        start = time.monotonic()
+        texts = create_groq_completions('key', prompts)
+        elapsed = time.monotonic() - start
+    assert texts == ['text 0', 'text 1', 'text 2', 'text 3']
+    assert elapsed < 0.55
+
+
+def test_create_groq_completions_deadline():
+    """Items still running at the slide deadline get a placeholder instead of holding the slide."""
+    prompts = [(ROAST_SYSTEM_PROMPT, f'item {i}', 'Comparison') for i in range(2)]
+    with patch('spotify_data.utils.create_groq_completion',
+               side_effect=slow_completion([0.0, 1.0])):
+        start = time.monotonic()
+        texts = create_groq_completions('key', prompts, deadline=0.2)
+        elapsed = time.monotonic() - start
+    assert texts == ['text 0', llm_timeout_text('Comparison')]
+    assert elapsed < 0.8
+
+
+def test_acreate_groq_completions_cap_and_deadline(settings):
+    """Async fan-out respects the concurrency cap and the deadline."""
+    settings.GROQ_MAX_CONCURRENCY = 2
+    running = []
+    peak = []
+
+    async def complete(key, system, user, label, timeout):
+        running.append(user)
+        peak.append(len(running))
+        await asyncio.sleep(1.0 if user == 'item 4' else 0.05)
+        running.remove(user)
+        return user.upper()
+
+    prompts = [(ROAST_SYSTEM_PROMPT, f'item {i}', 'Description') for i in range(5)]
+    with patch('spotify_data.async_utils.acreate_groq_completion', side_effect=complete):
+        texts = asyncio.run(acreate_groq_completions('key', prompts, deadline=0.4))
+    assert texts == ['ITEM 0', 'ITEM 1', 'ITEM 2', 'ITEM 3', llm_timeout_text('Description')]
+    assert max(peak) == 2
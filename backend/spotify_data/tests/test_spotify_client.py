@@ -0,0 +1,61 @@
+"""Tests the pooled Spotify API client in spotify_data/spotify_client."""
+
+from unittest.mock import patch, Mock
+import pytest
+import requests
+from ..spotify_client import SpotifyClient, get_spotify_client, reset_spotify_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    """Make sure every test starts without a cached process-wide client."""
+    reset_spotify_client()
+    yield
+    reset_spotify_client()
+
+
+def test_get_spotify_client_is_reused():
+    """The same client (and connection pool) is returned for every call in a process."""
+    assert get_spotify_client() is get_spotify_client()
+
+
+def test_get_spotify_client_uses_settings(settings):
+    """Pool size and timeouts are read from the SPOTIFY_API_* settings."""
+    settings.SPOTIFY_API_POOL_SIZE = 7
+    settings.SPOTIFY_API_CONNECT_TIMEOUT = 1
+    settings.SPOTIFY_API_READ_TIMEOUT = 2
+    client = get_spotify_client()
+    assert client.pool_size == 7
+    assert client.timeout == (1, 2)
+    assert client.session.get_adapter('https://api.spotify.com') is client.adapter
+
+
+def test_url_building():
+    """Relative paths are joined to the base URL, absolute URLs pass through."""
+    client = SpotifyClient(base_url='https://api.spotify.com/v1/')
+    assert client.url('/me') == 'https://api.spotify.com/v1/me'
+    assert client.url('me/top/tracks') == 'https://api.spotify.com/v1/me/top/tracks'
+    assert client.url('https://example.com/next') == 'https://example.com/next'
+
+
+def test_get_sends_bearer_token_and_timeout():
+    """Requests go through the pooled session with auth header and configured timeout."""
+    client = SpotifyClient(connect_timeout=1, read_timeout=4)
+    with patch.object(client.session, 'get', return_value=Mock(status_code=200)) as mock_get:
+        client.get('/me/top/tracks', 'token123', params={'limit': 20})
+    mock_get.assert_called_once_with('https://api.spotify.com/v1/me/top/tracks',
+                                     headers={'Authorization': 'Bearer token123'},
+                                     params={'limit': 20}, timeout=(1, 4))
+    assert client.stats()['requests'] == 1
+
+
+def test_stats_counts_errors():
+    """Failed requests are counted and the exception is re-raised."""
+    client = SpotifyClient()
+    with patch.object(client.session, 'get', side_effect=requests.exceptions.ConnectionError):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get('/me', 'token')
+    stats = client.stats()
+    assert stats['requests'] == 1
+    assert stats['errors'] == 1
+    assert stats['connections_reused'] == 0
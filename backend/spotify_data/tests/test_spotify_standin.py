@@ -0,0 +1,96 @@
+"""Tests the local Spotify Web API stand-in against the app's real Spotify client and helpers."""
+
+from unittest.mock import patch
+import pytest
+import requests
+from accounts.utils import spotify_accounts_url
+from spotify_data.ratelimit import FileTokenBucket, SpotifyRequestScheduler
+from spotify_data.spotify_client import get_spotify_client, reset_spotify_client
+from spotify_data.standins.spotify import SpotifyStandIn, start_spotify_server
+from spotify_data.utils import (get_several_artists, get_spotify_recommendations,
+                                get_spotify_user_data, get_user_favorite_tracks)
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    """A rate limiter of its own, so the tests neither wait for nor drain the shared one."""
+    bucket = FileTokenBucket(str(tmp_path / 'bucket.json'), rate=1000, capacity=1000)
+    scheduler = SpotifyRequestScheduler(bucket, max_wait=5, max_retries=2)
+    with patch('spotify_data.spotify_client.get_scheduler', return_value=scheduler):
+        yield scheduler
+
+
+@pytest.fixture
+def standin(settings, scheduler):  # pylint: disable=redefined-outer-name,unused-argument
+    """A running stand-in with a small catalog and no latency, which the app points at."""
+    server = start_spotify_server(latency_ms=0, artists=200, tracks=1000, markets=10, seed=1)
+    settings.SPOTIFY_API_BASE_URL = server.base_url + '/v1'
+    settings.SPOTIFY_ACCOUNTS_BASE_URL = server.base_url
+    reset_spotify_client()
+    yield server
+    server.shutdown()
+    server.server_close()
+    reset_spotify_client()
+
+
+def test_catalog_and_top_items_are_deterministic():
+    """The same seed gives the same catalog, and a user always has the same top items."""
+    first = SpotifyStandIn(artists=50, tracks=100, top_items_total=30)
+    second = SpotifyStandIn(artists=50, tracks=100, top_items_total=30)
+    assert first.catalog.tracks == second.catalog.tracks
+    top = first.top_items('user', 'tracks', 'short_term')
+    assert top == second.top_items('user', 'tracks', 'short_term')
+    assert len({track['id'] for track in top}) == 30
+    assert top != first.top_items('user', 'tracks', 'long_term')
+
+
+def test_top_items_are_paged(standin):  # pylint: disable=redefined-outer-name
+    """Deep top-items lists are read 50 at a time, with the same items for the same token."""
+    tracks = get_user_favorite_tracks('token-a', 'short_term', limit=80)
+    assert len(tracks) == 80
+    assert len({track['id'] for track in tracks}) == 80
+    assert [track['id'] for track in get_user_favorite_tracks('token-a', 'short_term')] == \
+        [track['id'] for track in tracks[:20]]
+    assert standin.standin.snapshot()[1]['requests'] == 3
+
+
+def test_several_artists_and_recommendations(standin):  # pylint: disable=redefined-outer-name
+    """Artists are looked up 50 ids per request; recommendations favour the seed artist."""
+    catalog = standin.standin.catalog
+    ids = [artist['id'] for artist in catalog.artists[:60]]
+    assert [artist['id'] for artist in get_several_artists('token', ids + ['unknown'])] == ids
+
+    seed = catalog.tracks[0]['artists'][0]['id']
+    songs = get_spotify_recommendations('token', seed_artists=[seed])
+    assert len(songs) == 5
+    assert catalog.artists_by_id[seed]['name'] in songs[0]['artist']
+
+
+def test_rate_limited_requests_are_retried(standin, scheduler):  # pylint: disable=redefined-outer-name
+    """Injected 429s carry Retry-After and the client retries them before giving up."""
+    standin.standin.configure(rate_limit_rate=1.0, retry_after=0)
+    response = get_spotify_client().get('/me', 'token')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '0'
+    assert scheduler.stats()['throttled'] == 3
+    assert standin.standin.snapshot()[1]['rate_limited'] == 3
+
+
+def test_oauth_flow_and_expired_tokens(standin):  # pylint: disable=redefined-outer-name
+    """Codes from /authorize become tokens; issued tokens expire and can be refreshed."""
+    standin.standin.configure(token_ttl=0)
+    redirect = requests.get(spotify_accounts_url('/authorize'), timeout=5, allow_redirects=False,
+                            params={'redirect_uri': 'http://app/callback', 'state': 'abc'})
+    assert redirect.headers['Location'].startswith('http://app/callback?code=')
+    code = redirect.headers['Location'].split('code=')[1].split('&')[0]
+
+    tokens = requests.post(spotify_accounts_url('/api/token'), timeout=5, data={
+        'grant_type': 'authorization_code', 'code': code}).json()
+    assert get_spotify_user_data(tokens['access_token']) is None
+    assert requests.post(spotify_accounts_url('/api/token'), timeout=5, data={
+        'grant_type': 'authorization_code', 'code': code}).status_code == 400
+
+    standin.standin.configure(token_ttl=3600)
+    refreshed = requests.post(spotify_accounts_url('/api/token'), timeout=5, data={
+        'grant_type': 'refresh_token', 'refresh_token': tokens['refresh_token']}).json()
+    assert get_spotify_user_data(refreshed['access_token'])['id'] == 'standin-user-1'
@@ -0,0 +1,142 @@
+"""Tests streaming slide texts from Groq to the browser as server-sent events."""
+
+from unittest.mock import patch, MagicMock, Mock
+import pytest
+from spotify_data.llm_cache import FileLLMCacheBackend, LLMResponseCache
+from spotify_data.llm_guard import get_breaker
+from spotify_data.models import EntityDescription, SpotifyWrapped
+from spotify_data.utils import (ROAST_SYSTEM_PROMPT, GROQ_MODEL, is_llm_fallback,
+                                stream_groq_completion)
+from spotify_data.views import stream_artists, stream_quirky
+
+ARTISTS = [{'name': f'Artist {i}', 'images': [{'url': f'http://example.com/{i}.jpg'}]}
+           for i in range(2)]
+
+
+def chunks(*pieces):
+    """A streamed chat completion yielding `pieces` (and a final empty chunk)."""
+    return [MagicMock(choices=[MagicMock(delta=MagicMock(content=piece))])
+            for piece in pieces + (None,)]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A file-backed LLM response cache."""
+    cache = LLMResponseCache(FileLLMCacheBackend(str(tmp_path), 60, 100))
+    with patch('spotify_data.utils.get_llm_cache', return_value=cache):
+        yield cache
+
+
+def test_stream_groq_completion_caches_full_text(cache):
+    """Pieces are yielded as they arrive, the joined text is cached and served whole next time."""
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter(chunks('Hello', ', ', 'world'))
+    with patch('spotify_data.utils.get_groq_client', return_value=client):
+        assert list(stream_groq_completion('key', ROAST_SYSTEM_PROMPT, 'q')) == \
+            ['Hello', ', ', 'world']
+        assert list(stream_groq_completion('key', ROAST_SYSTEM_PROMPT, 'q')) == ['Hello, world']
+    assert client.chat.completions.create.call_args.kwargs['stream'] is True
+    assert client.chat.completions.create.call_count == 1
+    assert cache.get(GROQ_MODEL, ROAST_SYSTEM_PROMPT, 'q') == 'Hello, world'
+
+
+def test_stream_groq_completion_error_is_not_cached(cache):
+    """A failing stream ends with the fallback text and leaves the cache empty."""
+    def broken_stream():
+        yield from chunks('Hel')[:1]
+        raise RuntimeError('connection reset')
+
+    client = MagicMock()
+    client.chat.completions.create.return_value = broken_stream()
+    with patch('spotify_data.utils.get_groq_client', return_value=client):
+        pieces = list(stream_groq_completion('key', ROAST_SYSTEM_PROMPT, 'q'))
+    assert pieces == ['Hel', 'Description unavailable due to API error: connection reset']
+    assert is_llm_fallback(pieces[-1])
+    assert cache.get(GROQ_MODEL, ROAST_SYSTEM_PROMPT, 'q') is None
+    stats = get_breaker().stats()
+    assert stats['calls'] == 1 and stats['error_rate'] == 1
+
+
+def test_stream_groq_completion_empty_answer_is_not_cached(cache):
+    """A stream that ends without any text leaves nothing in the cache."""
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter(chunks())
+    with patch('spotify_data.utils.get_groq_client', return_value=client):
+        assert not list(stream_groq_completion('key', ROAST_SYSTEM_PROMPT, 'q'))
+    assert cache.get(GROQ_MODEL, ROAST_SYSTEM_PROMPT, 'q') is None
+
+
+@pytest.mark.django_db
+def test_stream_artists_relays_tokens(cache, settings):  # pylint: disable=unused-argument
+    """The artists slide streams each artist, its tokens and its complete text."""
+    settings.GROQ_API_KEY = 'key'
+    wrapped = SpotifyWrapped.objects.create(user='testuser', favorite_artists=ARTISTS)
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [iter(chunks('Loud', '!')),
+                                                  iter(chunks('Quiet.'))]
+    with patch('spotify_data.utils.get_groq_client', return_value=client):
+        response = stream_artists(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+        body = b''.join(response.streaming_content).decode()
+
+    assert response['Content-Type'] == 'text/event-stream'
+    events = [event.split('\n')[0] for event in body.strip().split('\n\n')]
+    assert events == ['event: item', 'event: token', 'event: token', 'event: done',
+                      'event: item', 'event: token', 'event: done', 'event: end']
+    assert 'data: {"index": 0, "name": "Artist 0", "image": "http://example.com/0.jpg"}' in body
+    assert 'data: {"index": 0, "desc": "Loud!"}' in body
+
+
+@pytest.mark.django_db
+def test_stream_failure_replaces_the_partial_text(cache, settings):  # pylint: disable=unused-argument
+    """When Groq fails mid-answer, the item is done with the fallback text alone."""
+    settings.GROQ_API_KEY = 'key'
+    wrapped = SpotifyWrapped.objects.create(user='testuser', favorite_artists=ARTISTS[:1])
+
+    def broken_stream():
+        yield from chunks('Hel')[:1]
+        raise RuntimeError('connection reset')
+
+    client = MagicMock()
+    client.chat.completions.create.return_value = broken_stream()
+    with patch('spotify_data.utils.get_groq_client', return_value=client):
+        response = stream_artists(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+        body = b''.join(response.streaming_content).decode()
+    assert 'data: {"index": 0, "text": "Hel"}' in body
+    assert 'data: {"index": 0, "desc": "Description unavailable due to API error: ' \
+           'connection reset"}' in body
+    assert not EntityDescription.objects.exists()
+
+
+@pytest.mark.django_db
+def test_stream_has_its_own_llm_budget(cache, settings):  # pylint: disable=unused-argument
+    """Groq calls made while the response streams are bounded by LLM_REQUEST_BUDGET."""
+    settings.GROQ_API_KEY = 'key'
+    settings.LLM_REQUEST_BUDGET = 7
+    wrapped = SpotifyWrapped.objects.create(user='testuser', favorite_artists=ARTISTS[:1])
+    client = MagicMock()
+    client.chat.completions.create.return_value = iter(chunks('Loud!'))
+    with patch('spotify_data.utils.get_groq_client', return_value=client):
+        response = stream_artists(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+        b''.join(response.streaming_content)
+    assert client.chat.completions.create.call_args.kwargs['timeout'] <= 7
+
+
+@pytest.mark.django_db
+def test_stream_serves_stored_texts_without_groq(settings):
+    """Texts stored at wrap creation are sent whole, without calling Groq."""
+    settings.GROQ_API_KEY = 'key'
+    wrapped = SpotifyWrapped.objects.create(user='testuser', quirkiest_artists=ARTISTS,
+                                            slide_texts={'quirky': ['So niche.']})
+    with patch('spotify_data.utils.get_groq_client') as get_client:
+        response = stream_quirky(Mock(GET={'id': str(wrapped.id), 'isDuo': 'false'}))
+        body = b''.join(response.streaming_content).decode()
+    get_client.assert_not_called()
+    assert 'event: token' not in body
+    assert 'data: {"index": 0, "desc": "So niche."}' in body
+
+
+@pytest.mark.django_db
+def test_stream_missing_wrapped():
+    """An unknown wrapped id is reported like the non-streaming views do."""
+    response = stream_artists(Mock(GET={'id': '999', 'isDuo': 'true'}))
+    assert response.status_code == 500
@@ -0,0 +1,87 @@
+"""Tests the per-request timing breakdown and its middleware (spotify_data/timing)."""
+
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from spotify_data.timing import ServerTimingMiddleware, current_timings, timed, timing_scope
+
+
+def test_timed_does_nothing_outside_a_scope():
+    """Outside a timed request there is nothing to add to."""
+    with timed('spotify'):
+        pass
+    assert current_timings() is None
+
+
+def test_calls_in_executor_threads_add_up():
+    """Threads started with a copy of the context add to the request's timings."""
+    def call():
+        with timed('groq'):
+            pass
+
+    with timing_scope() as timings:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for future in [executor.submit(contextvars.copy_context().run, call)
+                           for _ in range(3)]:
+                future.result()
+        with timed('serialize'):
+            pass
+    summary = timings.summary()
+    assert summary['groq'][1] == 3
+    assert summary['serialize'][1] == 1
+    assert 'groq;dur=' in timings.header() and 'desc="3 calls"' in timings.header()
+    assert current_timings() is None
+
+
+@pytest.mark.django_db
+def test_middleware_reports_the_breakdown(caplog, settings):
+    """The response gets a Server-Timing header and the breakdown is logged as JSON."""
+    settings.SERVER_TIMING_SAMPLE_RATE = 1.0
+    settings.SERVER_TIMING_HEADER = True
+
+    def view(request):  # pylint: disable=unused-argument
+        User.objects.filter(username='nobody').exists()  # pylint: disable=no-member
+        with timed('spotify'):
+            pass
+        return HttpResponse('ok')
+
+    with caplog.at_level(logging.INFO, logger='spotify_data.timing'):
+        response = ServerTimingMiddleware(view)(RequestFactory().get('/spotify_data/updateuser'))
+
+    metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+    assert metrics == ['db', 'spotify', 'total']
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line['path'] == '/spotify_data/updateuser'
+    assert line['status'] == 200
+    assert line['db_count'] == 1 and line['spotify_count'] == 1
+    assert line['total_ms'] >= line['spotify_ms']
+
+
+def test_unsampled_requests_are_not_timed(settings):
+    """With a sample rate of 0 the middleware passes requests through untouched."""
+    settings.SERVER_TIMING_SAMPLE_RATE = 0
+
+    def view(request):  # pylint: disable=unused-argument
+        assert current_timings() is None
+        return HttpResponse('ok')
+
+    response = ServerTimingMiddleware(view)(RequestFactory().get('/'))
+    assert not response.has_header('Server-Timing')
+
+
+def test_header_is_opt_in(caplog, settings):
+    """Outside DEBUG a timed request is logged but clients get no Server-Timing header."""
+    settings.SERVER_TIMING_SAMPLE_RATE = 1.0
+    settings.DEBUG = False
+    del settings.SERVER_TIMING_HEADER
+
+    with caplog.at_level(logging.INFO, logger='spotify_data.timing'):
+        response = ServerTimingMiddleware(lambda request: HttpResponse('ok'))(
+            RequestFactory().get('/'))
+    assert not response.has_header('Server-Timing')
+    assert json.loads(caplog.records[-1].getMessage())['status'] == 200
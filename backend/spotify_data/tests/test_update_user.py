@@ -0,0 +1,159 @@
+"""Tests the updateuser flow in spotify_data/views (fetching and storing a user's snapshot)."""
+
+import json
+import time
+from unittest.mock import patch, Mock
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from accounts.models import SpotifyToken
+from spotify_data.models import SpotifyUser
+from spotify_data.views import update_or_add_spotify_user
+
+
+@pytest.fixture
+def token_user(db):
+    """A Django user with a stored Spotify access token."""
+    user = User.objects.create_user(username='testuser', password='password')
+    SpotifyToken.objects.create(user='testuser', username='testuser', access_token='token',
+                                refresh_token='refresh', token_type='Bearer',
+                                expires_in=timezone.now() + timezone.timedelta(hours=1))
+    return user
+
+
+def slow_items(delay, items):
+    """Return a fake fetcher that blocks for `delay` seconds before answering."""
+    def fetch(*args, **kwargs):
+        time.sleep(delay)
+        return items
+    return fetch
+
+
+@pytest.mark.django_db
+def test_update_user_fetches_concurrently(token_user):
+    """The seven Spotify round trips overlap instead of running back to back."""
+    artists = [{'id': '1', 'name': 'Artist', 'genres': ['pop'], 'popularity': 10}]
+    tracks = [{'id': 't1', 'name': 'Track'}]
+    request = Mock(user=token_user)
+    with patch('spotify_data.views.get_spotify_user_data',
+               side_effect=slow_items(0.2, {'id': 'spotify_id', 'email': 'a@b.com'})), \
+            patch('spotify_data.views.get_user_favorite_tracks',
+                  side_effect=slow_items(0.2, tracks)), \
+            patch('spotify_data.views.get_user_favorite_artists',
+                  side_effect=slow_items(0.2, artists)):
+        start = time.monotonic()
+        response = update_or_add_spotify_user(request)
+        elapsed = time.monotonic() - start
+
+    assert response.status_code == 200
+    assert elapsed < 0.2 * 7 / 2
+    spotify_user = SpotifyUser.objects.get(spotify_id='spotify_id')
+    assert spotify_user.favorite_tracks_long == tracks
+    assert spotify_user.favorite_genres_short == ['pop']
+
+
+@pytest.mark.django_db
+def test_update_user_missing_top_items(token_user):
+    """A failed top-items fetch is reported instead of storing a partial snapshot."""
+    request = Mock(user=token_user)
+    with patch('spotify_data.views.get_spotify_user_data', return_value={'id': 'spotify_id'}), \
+            patch('spotify_data.views.get_user_favorite_tracks', return_value=None), \
+            patch('spotify_data.views.get_user_favorite_artists', return_value=[]):
+        response = update_or_add_spotify_user(request)
+
+    assert response.status_code == 500
+    assert json.loads(response.content) == {'error': 'Could not fetch user data from Spotify'}
+    assert not SpotifyUser.objects.exists()
+
+
+def fetch_counting(calls):
+    """Patch the three Spotify fetchers, recording the term of each top-items call."""
+    def record(kind, items):
+        def fetch(access_token, timelimit, *args, **kwargs):
+            calls.append((kind, timelimit))
+            return items
+        return fetch
+    artists = [{'id': '1', 'name': 'Artist', 'genres': ['pop'], 'popularity': 10}]
+    return (patch('spotify_data.views.get_spotify_user_data', return_value={'id': 'spotify_id'}),
+            patch('spotify_data.views.get_user_favorite_tracks',
+                  side_effect=record('tracks', [{'id': 't1'}])),
+            patch('spotify_data.views.get_user_favorite_artists',
+                  side_effect=record('artists', artists)))
+
+
+def update_user(request, calls):
+    """Run updateuser with counting fetchers."""
+    user_patch, tracks_patch, artists_patch = fetch_counting(calls)
+    with user_patch, tracks_patch, artists_patch:
+        return update_or_add_spotify_user(request)
+
+
+@pytest.mark.django_db
+def test_update_user_serves_fresh_snapshot(token_user):
+    """A second updateuser inside the TTL answers from the database without calling Spotify."""
+    calls = []
+    request = Mock(user=token_user, GET={})
+    assert update_user(request, calls).status_code == 200
+    assert len(calls) == 6
+    spotify_user = SpotifyUser.objects.get(spotify_id='spotify_id')
+    assert spotify_user.last_synced is not None
+    assert set(spotify_user.synced_terms) == {'short', 'medium', 'long'}
+
+    calls.clear()
+    response = update_user(request, calls)
+    assert response.status_code == 200
+    assert calls == []
+    assert json.loads(response.content)['spotify_user']['spotify_id'] == 'spotify_id'
+
+
+@pytest.mark.django_db
+def test_update_user_force_refetches(token_user):
+    """?force=true refetches every term even when the snapshot is fresh."""
+    calls = []
+    update_user(Mock(user=token_user, GET={}), calls)
+    calls.clear()
+    assert update_user(Mock(user=token_user, GET={'force': 'true'}), calls).status_code == 200
+    assert len(calls) == 6
+
+
+@pytest.mark.django_db
+def test_update_user_refetches_only_stale_terms(token_user):
+    """Only the terms older than the TTL are fetched again; the others keep their sync time."""
+    calls = []
+    request = Mock(user=token_user, GET={})
+    update_user(request, calls)
+    spotify_user = SpotifyUser.objects.get(spotify_id='spotify_id')
+    kept = spotify_user.synced_terms['short']
+    old = (timezone.now() - timezone.timedelta(days=1)).isoformat()
+    spotify_user.synced_terms = {**spotify_user.synced_terms, 'long': old}
+    spotify_user.save()
+
+    calls.clear()
+    assert update_user(request, calls).status_code == 200
+    assert sorted(calls) == [('artists', 'long_term'), ('tracks', 'long_term')]
+    spotify_user.refresh_from_db()
+    assert spotify_user.synced_terms['short'] == kept
+    assert spotify_user.synced_terms['long'] > old
+
+
+@pytest.mark.django_db
+def test_update_user_counts_track_artists(token_user):
+    """The artists of the top tracks are enriched in one batch and count towards genres."""
+    artists = [{'id': 'top', 'name': 'Top', 'genres': ['pop'], 'popularity': 80}]
+    tracks = [{'id': 't1', 'artists': [{'id': 'x', 'name': 'X'}]},
+              {'id': 't2', 'artists': [{'id': 'x', 'name': 'X'}, {'id': 'top', 'name': 'Top'}]}]
+    full_x = {'id': 'x', 'name': 'X', 'genres': ['emo'], 'popularity': 3, 'images': []}
+    full_top = {**artists[0], 'images': []}
+    with patch('spotify_data.views.get_spotify_user_data', return_value={'id': 'spotify_id'}), \
+            patch('spotify_data.views.get_user_favorite_tracks', return_value=tracks), \
+            patch('spotify_data.views.get_user_favorite_artists', return_value=artists), \
+            patch('spotify_data.artists.get_several_artists',
+                  return_value=[full_x, full_top]) as fetch:
+        response = update_or_add_spotify_user(Mock(user=token_user, GET={}))
+
+    assert response.status_code == 200
+    fetch.assert_called_once_with('token', ['x', 'top'])
+    spotify_user = SpotifyUser.objects.get(spotify_id='spotify_id')
+    assert sorted(spotify_user.favorite_genres_short) == ['emo', 'pop']
+    assert spotify_user.quirkiest_artists_long[0]['id'] == 'x'
+    assert [artist['id'] for artist in spotify_user.favorite_artists_medium] == ['top']
@@ -1,12 +1,15 @@
 """Tests methods from spotify_data/utils."""
 
+import threading
+import time
 import unittest
 from unittest.mock import patch, Mock, MagicMock
 import pytest
 from groq import GroqError
 from ..utils import (get_spotify_user_data, get_user_favorite_artists, get_user_favorite_tracks,
                      get_top_genres, get_quirkiest_artists,
-                     get_spotify_recommendations, create_groq_description)
+                     get_spotify_recommendations, create_groq_description,
+                     run_concurrently, iter_user_favorite_artists)
 
 
 
@@ -19,7 +22,7 @@ from ..utils import (get_spotify_user_data, get_user_favorite_artists, get_user_
 def test_get_spotify_user_data(status_code, expected_result):
     """Tests that a user's profile can be retrieved."""
     access_token = 'valid_token'
-    with patch('requests.get') as mock_get:
+    with patch('requests.Session.get') as mock_get:
         mock_response = mock_get.return_value
         mock_response.status_code = status_code
         mock_response.json.return_value = {'id': '123',
@@ -37,7 +40,7 @@ def test_get_user_favorite_artists(status_code, expected_result):
     """Tests that a user's 20 favorites artists can be retrieved"""
     access_token = 'valid_token'
     timelimit = 'short_term'
-    with patch('requests.get') as mock_get:
+    with patch('requests.Session.get') as mock_get:
         mock_response = mock_get.return_value
         mock_response.status_code = status_code
         mock_response.json.return_value ={'items':
@@ -54,7 +57,7 @@ def test_get_user_favorite_tracks(status_code, expected_result):
     """Tests that a user's 20 favorite tracks can be retrieved."""
     access_token = 'valid_token'
     timelimit = 'short_term'
-    with patch('requests.get') as mock_get:
+    with patch('requests.Session.get') as mock_get:
         mock_response = mock_get.return_value
         mock_response.status_code = status_code
         mock_response.json.return_value = {
@@ -119,7 +122,7 @@ class NonAPIFunctions(unittest.TestCase):
         self.assertEqual(result, expected_output)
 
 
-@patch('spotify_data.utils.requests.get')
+@patch('spotify_data.spotify_client.requests.Session.get')
 def test_get_spotify_recommendations(mock_get):
     """Test fetching song recommendations using Spotify API."""
     mock_user_token = "mock_access_token"
@@ -163,8 +166,8 @@ def test_create_groq_description_returns_response():
     mock_response.choices = [MagicMock()]
     mock_response.choices[0].message.content = "Sample description."
 
-    # Ensure the patch path matches exactly where Groq is imported in your code
-    with patch("spotify_data.utils.Groq") as MockGroq:
+    # Ensure the patch path matches exactly where the Groq client is looked up in your code
+    with patch("spotify_data.utils.get_groq_client") as MockGroq:
         mock_client = MockGroq.return_value
         mock_client.chat.completions.create.return_value = mock_response
 
@@ -190,7 +193,7 @@ def test_create_groq_description_key_error_handling():
     mock_groq_api_key = "mock_api_key"
     favorite_artists = ["Artist1", "Artist2"]
 
-    with patch("spotify_data.utils.Groq") as MockGroq:
+    with patch("spotify_data.utils.get_groq_client") as MockGroq:
         mock_client = MockGroq.return_value
         mock_client.chat.completions.create.side_effect = KeyError("choices")
 
@@ -204,7 +207,7 @@ def test_create_groq_description_general_exception_handling():
     mock_groq_api_key = "mock_api_key"
     favorite_artists = ["Artist1", "Artist2"]
 
-    with patch("spotify_data.utils.Groq") as MockGroq:
+    with patch("spotify_data.utils.get_groq_client") as MockGroq:
         mock_client = MockGroq.return_value
         mock_client.chat.completions.create.side_effect = Exception("API error")
 
@@ -223,10 +226,96 @@ def test_create_groq_description_varied_artist_list(favorite_artists):
     mock_response = MagicMock()
     mock_response.choices[0].message.content = "Sample description."
 
-    with patch("spotify_data.utils.Groq") as MockGroq:
+    with patch("spotify_data.utils.get_groq_client") as MockGroq:
         mock_client = MockGroq.return_value
         mock_client.chat.completions.create.return_value = mock_response
 
         llama_description = create_groq_description(mock_groq_api_key, favorite_artists)
 
         assert llama_description is not None, "Expected a response but got None."
+
+
+def test_run_concurrently_returns_results_by_name():
+    """Every call runs and its result is keyed by the name it was submitted under."""
+    results = run_concurrently({
+        'double': (lambda x: x * 2, (2,)),
+        'concat': (lambda a, b: a + b, ('a', 'b')),
+    }, deadline=5)
+    assert results == {'double': 4, 'concat': 'ab'}
+
+
+def test_run_concurrently_failures_and_deadline():
+    """Calls that raise or outlive the shared deadline come back as None."""
+    release = threading.Event()
+
+    def boom():
+        raise ValueError("boom")
+
+    results = run_concurrently({
+        'ok': (lambda: 'fine', ()),
+        'error': (boom, ()),
+        'slow': (release.wait, (5,)),
+    }, deadline=0.2)
+    release.set()
+    assert results == {'ok': 'fine', 'error': None, 'slow': None}
+
+
+def test_run_concurrently_overlaps_calls():
+    """Blocking calls overlap, so the fan-out takes about as long as the slowest call."""
+    start = time.monotonic()
+    results = run_concurrently({f'call{i}': (time.sleep, (0.2,)) for i in range(6)}, deadline=5)
+    assert time.monotonic() - start < 0.2 * 6 / 2
+    assert len(results) == 6
+
+
+def page_response(items, has_next=True):
+    """Fake top-items page."""
+    response = Mock(status_code=200)
+    response.json.return_value = {'items': items, 'next': 'url' if has_next else None}
+    return response
+
+
+def test_get_user_favorite_tracks_pages_up_to_limit():
+    """Deeper limits are read 50 items per page with offsets."""
+    first = [{'name': f'Track {i}'} for i in range(50)]
+    second = [{'name': f'Track {i}'} for i in range(50, 75)]
+    with patch('requests.Session.get',
+               side_effect=[page_response(first), page_response(second)]) as mock_get:
+        result = get_user_favorite_tracks('token', 'short_term', limit=75)
+
+    assert result == first + second
+    assert mock_get.call_args_list[0].kwargs['params'] == {'time_range': 'short_term',
+                                                           'limit': 50}
+    assert mock_get.call_args_list[1].kwargs['params'] == {'time_range': 'short_term',
+                                                           'limit': 25, 'offset': 50}
+
+
+def test_get_user_favorite_artists_partial_pages():
+    """A failed later page keeps the items already read; a failed first page is None."""
+    failed = Mock(status_code=500)
+    items = [{'name': f'Artist {i}'} for i in range(50)]
+    with patch('requests.Session.get', side_effect=[page_response(items), failed]):
+        assert get_user_favorite_artists('token', 'long_term', limit=100) == items
+    with patch('requests.Session.get', return_value=failed):
+        assert get_user_favorite_artists('token', 'long_term', limit=100) is None
+
+
+def test_iter_user_favorite_artists_streams_pages():
+    """Items from the first page are yielded before the second page is requested."""
+    first = [{'name': f'Artist {i}', 'genres': ['pop']} for i in range(50)]
+    second = [{'name': 'Last', 'genres': ['jazz']}]
+    with patch('requests.Session.get',
+               side_effect=[page_response(first), page_response(second, False)]) as mock_get:
+        artists = iter_user_favorite_artists('token', 'medium_term', limit=100)
+        assert next(artists)['name'] == 'Artist 0'
+        assert mock_get.call_count == 1
+        assert get_top_genres(artists) == ['pop', 'jazz']
+        assert mock_get.call_count == 2
+
+
+def test_top_items_stop_when_spotify_runs_out():
+    """No further pages are requested once Spotify says there is no next page."""
+    with patch('requests.Session.get',
+               return_value=page_response([{'name': 'Only'}] * 50, False)) as mock_get:
+        assert len(get_user_favorite_tracks('token', 'short_term', limit=150)) == 50
+    assert mock_get.call_count == 1
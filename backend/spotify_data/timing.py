@@ -0,0 +1,176 @@
+"""
+Per-request breakdown of where the time went: SQLite, Spotify, Groq or serialization.
+
+ServerTimingMiddleware gives each sampled request (SERVER_TIMING_SAMPLE_RATE) a
+RequestTimings accumulator in a context variable. Code that waits on something wraps
+the wait in timed(category), which adds its duration to the current request's
+accumulator and does nothing outside a sampled request:
+
+    - db: every SQL query (a wrapper installed on each database connection)
+    - spotify: SpotifyClient.get / AsyncSpotifyClient.get, including rate-limit waits
+      and retries
+    - groq: every Groq call made through llm_guard.guarded_call
+    - serialize: the model serializers in the views
+
+Executor threads started with a copy of the context (utils.run_concurrently, the
+per-item Groq calls) add to the same accumulator, so calls made in parallel add up to
+more than the request's wall time. When the response is ready the totals are logged
+as one JSON line on the spotify_data.timing logger and, with DEBUG or
+SERVER_TIMING_HEADER on, sent as a Server-Timing header (shown by browser devtools).
+The header reveals how long the database and the APIs took, so it is not sent to
+every client by default.
+
+Classes:
+    - RequestTimings: Thread-safe totals and counts per category.
+    - ServerTimingMiddleware: Times sampled requests and reports the breakdown.
+
+Functions:
+    - timed: Context manager adding the block's duration to a category.
+    - timing_scope: Context manager collecting the timings of the code run inside it.
+    - current_timings: The RequestTimings being collected, or None.
+"""
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Seconds spent and number of operations per category, added to from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.totals = {}
+
+    def add(self, category, seconds):
+        """Add one operation of `seconds` to a category."""
+        with self._lock:
+            total = self.totals.setdefault(category, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def summary(self):
+        """{category: (milliseconds, count)}, plus the time elapsed as 'total'."""
+        with self._lock:
+            summary = {category: (seconds * 1000, count)
+                       for category, (seconds, count) in self.totals.items()}
+        summary['total'] = ((time.perf_counter() - self.started) * 1000, 1)
+        return summary
+
+    def header(self):
+        """The Server-Timing header value, e.g. 'db;dur=3.1;desc="4 queries", total;dur=40.2'."""
+        metrics = []
+        for category, (milliseconds, count) in self.summary().items():
+            metric = f'{category};dur={milliseconds:.1f}'
+            if category != 'total':
+                metric += f';desc="{count} call{"s" if count != 1 else ""}"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+
+def current_timings():
+    """The RequestTimings of the current request, or None if it is not being timed."""
+    return _current.get()
+
+
+@contextmanager
+def timed(category):
+    """Add the duration of the block to `category` of the current request, if it is timed."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(category, time.perf_counter() - start)
+
+
+@contextmanager
+def timing_scope():
+    """Collect the timings of the code run inside the block; yields the RequestTimings."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def _install_query_timer(sender, connection, **kwargs):  # pylint: disable=unused-argument
+    """Time the queries of every new database connection (cheap when nothing is timed)."""
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_install_query_timer, dispatch_uid='spotify_data.timing')
+
+
+class ServerTimingMiddleware:
+    """
+    Time a SERVER_TIMING_SAMPLE_RATE fraction of requests and report where their time
+    went in a log line (and a Server-Timing header, if enabled); works for sync and
+    async views.
+    Put it first in MIDDLEWARE so that 'total' covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def sampled():
+        """Whether to time this request."""
+        rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 0.01)
+        return rate >= 1 or random.random() < rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        with timing_scope() as timings:
+            response = self.get_response(request)
+        self.report(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        with timing_scope() as timings:
+            response = await self.get_response(request)
+        self.report(request, response, timings)
+        return response
+
+    @staticmethod
+    def report(request, response, timings):
+        """Log the breakdown as JSON, and add the Server-Timing header if enabled."""
+        if settings.DEBUG or getattr(settings, 'SERVER_TIMING_HEADER', False):
+            response['Server-Timing'] = timings.header()
+        line = {'method': request.method, 'path': request.path,
+                'status': response.status_code}
+        for category, (milliseconds, count) in timings.summary().items():
+            line[f'{category}_ms'] = round(milliseconds, 1)
+            if category != 'total':
+                line[f'{category}_count'] = count
+        logger.info(json.dumps(line))
@@ -6,6 +6,9 @@ from rest_framework.routers import DefaultRouter
 from .views import SongViewSet, update_or_add_spotify_user, add_spotify_wrapped, add_duo_wrapped
 from .views import display_artists, display_genres, display_songs, display_quirky, display_summary
 from .views import display_history, check_username_exists
+from .views import stream_artists, stream_genres, stream_songs, stream_quirky
+from .async_views import (aupdate_or_add_spotify_user, aadd_spotify_wrapped, aadd_duo_wrapped,
+                          adisplay_artists, adisplay_genres, adisplay_songs, adisplay_quirky)
 
 router = DefaultRouter()
 router.register(r'songs', SongViewSet)
@@ -22,5 +25,18 @@ urlpatterns = [
     path('displayquirky', display_quirky, name='display_quirky'),
     path('displaysummary', display_summary, name='display_summary'),
     path('displayhistory', display_history, name='display_history'),
-    path('checkusername', check_username_exists, name='check_username_exists')
+    path('checkusername', check_username_exists, name='check_username_exists'),
+    # Server-sent-event variants of the slide endpoints, streaming the text as it is generated
+    path('stream/displayartists', stream_artists, name='stream_artists'),
+    path('stream/displaygenres', stream_genres, name='stream_genres'),
+    path('stream/displaytracks', stream_songs, name='stream_songs'),
+    path('stream/displayquirky', stream_quirky, name='stream_quirky'),
+    # Async variants of the endpoints that wait on Spotify or Groq (serve these under ASGI)
+    path('async/updateuser', aupdate_or_add_spotify_user, name='aupdate_or_add_spotify_user'),
+    path('async/addwrapped/', aadd_spotify_wrapped, name='aadd_spotify_wrapped'),
+    path('async/addduo/', aadd_duo_wrapped, name='aadd_duo_wrapped'),
+    path('async/displayartists', adisplay_artists, name='adisplay_artists'),
+    path('async/displaygenres', adisplay_genres, name='adisplay_genres'),
+    path('async/displaytracks', adisplay_songs, name='adisplay_songs'),
+    path('async/displayquirky', adisplay_quirky, name='adisplay_quirky'),
 ]
@@ -2,10 +2,27 @@
 Utils used in spotify_data/views.
 """
 
+import contextvars
+import heapq
+import json
+import logging
+import threading
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from groq import Groq,  GroqError
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from groq import GroqError
 import requests
+from .groq_client import get_groq_client
+from .llm_cache import get_llm_cache
+from .llm_guard import guarded_call, guarded_stream, remaining_budget
+from .prompts import record_prompt, render_subject
+from .spotify_client import get_spotify_client
+from .timing import timed
+
+logger = logging.getLogger(__name__)
 
 def get_spotify_user_data(access_token):
     """
@@ -19,16 +36,96 @@ def get_spotify_user_data(access_token):
     """
 
     # Fetch the user's data from Spotify API
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
+    response = get_spotify_client().get('/me', access_token)
+    return response.json() if response.status_code == 200 else None
+
+SPOTIFY_MAX_PAGE_SIZE = 50
+
+def top_items_pages(limit):
+    """
+    Split a requested number of top items into (offset, page_size) pages of at most
+    SPOTIFY_MAX_PAGE_SIZE items, the largest page the top-items endpoint serves.
+    """
+    return [(offset, min(SPOTIFY_MAX_PAGE_SIZE, limit - offset))
+            for offset in range(0, limit, SPOTIFY_MAX_PAGE_SIZE)]
+
+def top_items_params(timelimit, offset, page_size):
+    """Query parameters for one page of a top-items request."""
+    params = {
+        'time_range': timelimit,
+        'limit': page_size
     }
-    response = requests.get('https://api.spotify.com/v1/me', headers=headers, timeout=5)
+    if offset:
+        params['offset'] = offset
+    return params
+
+def get_top_items_page(access_token, item_type, timelimit, offset, page_size, user_key=None):
+    """
+    Fetch one page of the user's top tracks or artists.
+
+    Returns:
+        The paging object (with 'items' and 'next'), or None if Spotify did not answer 200.
+    """
+    response = get_spotify_client().get_cached(f'/me/top/{item_type}', access_token,
+                                               params=top_items_params(timelimit, offset,
+                                                                       page_size),
+                                               user_key=user_key)
     return response.json() if response.status_code == 200 else None
 
-def get_user_favorite_tracks(access_token, timelimit):
+def iter_top_items_pages(access_token, item_type, timelimit, limit=None, user_key=None):
+    """
+    Yield successive pages of the user's top tracks or artists until `limit` items
+    (default SPOTIFY_TOP_ITEMS_LIMIT) have been requested or Spotify runs out.
+    A page that could not be fetched is yielded as None and ends the iteration.
+    """
+    limit = limit or getattr(settings, 'SPOTIFY_TOP_ITEMS_LIMIT', 20)
+    for offset, page_size in top_items_pages(limit):
+        page = get_top_items_page(access_token, item_type, timelimit, offset, page_size,
+                                  user_key)
+        yield page
+        if page is None or len(page['items']) < page_size or not page.get('next', True):
+            return
+
+def iter_user_top_items(access_token, item_type, timelimit, limit=None, user_key=None):
+    """
+    Yield the user's top tracks or artists one by one as each page arrives, so callers
+    can process deep lists without waiting for (or holding) every page.
+
+    Parameters:
+        - access_token: the access token associated with the current session
+        - item_type: 'tracks' or 'artists'
+        - timelimit: the desired term
+        - limit: how many items to read in total (defaults to SPOTIFY_TOP_ITEMS_LIMIT)
+        - user_key: identifies the user in the conditional-request cache
+
+    Yields:
+        Spotify track or artist objects. Iteration stops early when Spotify has no
+        more items or a page cannot be fetched.
+    """
+    for page in iter_top_items_pages(access_token, item_type, timelimit, limit, user_key):
+        if page is None:
+            return
+        yield from page['items']
+
+def get_user_top_items(access_token, item_type, timelimit, limit=None, user_key=None):
+    """
+    Return a list of the user's top tracks or artists (see iter_user_top_items).
+
+    Returns:
+        List of items, or None if the first page could not be fetched.
+    """
+    items = []
+    pages = iter_top_items_pages(access_token, item_type, timelimit, limit, user_key)
+    for number, page in enumerate(pages):
+        if page is None:
+            return None if number == 0 else items
+        items.extend(page['items'])
+    return items
+
+def get_user_favorite_tracks(access_token, timelimit, user_key=None, limit=None):
     """
-    Returns a list of 20 user favorite tracks over one of three time periods:
+    Returns a list of the user's favorite tracks (20 unless `limit` or the
+    SPOTIFY_TOP_ITEMS_LIMIT setting says otherwise) over one of three time periods:
     - short-term: 4 weeks
     - medium-term: 6 months
     - long-term: 1 year
@@ -36,27 +133,19 @@ def get_user_favorite_tracks(access_token, timelimit):
     Parameters:
         - access_token: the access token associated with the current session
         - timelimit: the desired term
+        - user_key: identifies the user in the conditional-request cache
+          (defaults to the access token)
+        - limit: how many tracks to read, paging 50 at a time
 
     Returns:
         JSON response containing user favorite tracks
     """
+    return get_user_top_items(access_token, 'tracks', timelimit, limit, user_key)
 
-    # Fetch the user's data from Spotify API
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/x-www-form-urlencoded'
-    }
-    params = {
-        'time_range': timelimit,
-        'limit': 20
-    }
-    response = requests.get('https://api.spotify.com/v1/me/top/tracks',
-                            headers=headers, params=params, timeout=5)
-    return response.json()['items'] if response.status_code == 200 else None
-
-def get_user_favorite_artists(access_token, timelimit):
+def get_user_favorite_artists(access_token, timelimit, user_key=None, limit=None):
     """
-    Returns a list of 20 user favorite artists over one of three time periods:
+    Returns a list of the user's favorite artists (20 unless `limit` or the
+    SPOTIFY_TOP_ITEMS_LIMIT setting says otherwise) over one of three time periods:
     - short-term: 4 weeks
     - medium-term: 6 months
     - long-term: 1 year
@@ -64,23 +153,186 @@ def get_user_favorite_artists(access_token, timelimit):
     Parameters:
         - access_token: the access token associated with the current session
         - timelimit: the desired term
+        - user_key: identifies the user in the conditional-request cache
+          (defaults to the access token)
+        - limit: how many artists to read, paging 50 at a time
 
     Returns:
         JSON response containing user favorite artists
     """
+    return get_user_top_items(access_token, 'artists', timelimit, limit, user_key)
 
-    # Fetch the user's data from Spotify API
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/x-www-form-urlencoded'
+def iter_user_favorite_tracks(access_token, timelimit, limit=None, user_key=None):
+    """Yield the user's favorite tracks page by page (see iter_user_top_items)."""
+    return iter_user_top_items(access_token, 'tracks', timelimit, limit, user_key)
+
+def iter_user_favorite_artists(access_token, timelimit, limit=None, user_key=None):
+    """Yield the user's favorite artists page by page (see iter_user_top_items)."""
+    return iter_user_top_items(access_token, 'artists', timelimit, limit, user_key)
+
+# Fields kept from Spotify payloads when they are stored; everything else (e.g. the
+# ~180-entry available_markets arrays on tracks and albums) is dropped on ingest
+IMAGE_FIELDS = ('url', 'height', 'width')
+ARTIST_FIELDS = ('id', 'name', 'genres', 'popularity')
+ALBUM_FIELDS = ('id', 'name', 'release_date')
+TRACK_FIELDS = ('id', 'name', 'duration_ms', 'popularity')
+
+def _project(item, fields):
+    """Copy the listed fields that are present in a Spotify object."""
+    return {field: item[field] for field in fields if field in item}
+
+def _project_images(images):
+    """Keep the url and size of each image."""
+    return [_project(image, IMAGE_FIELDS) for image in images]
+
+def project_artist(artist):
+    """
+    Keep only the artist fields the app reads (id, name, genres, popularity, images).
+    Simplified artists (as found on tracks) keep just what they have.
+    """
+    projected = _project(artist, ARTIST_FIELDS)
+    if 'images' in artist:
+        projected['images'] = _project_images(artist['images'] or [])
+    return projected
+
+def project_track(track):
+    """
+    Keep only the track fields the app reads: id, name, duration_ms, popularity,
+    the artists and the album's id, name, release date and images.
+    """
+    projected = _project(track, TRACK_FIELDS)
+    if 'artists' in track:
+        projected['artists'] = [project_artist(artist) for artist in track['artists']]
+    if track.get('album') is not None:
+        projected['album'] = _project(track['album'], ALBUM_FIELDS)
+        if 'images' in track['album']:
+            projected['album']['images'] = _project_images(track['album']['images'] or [])
+    return projected
+
+TERMS = ('short', 'medium', 'long')
+
+def build_spotify_user_snapshot(user_data, term_items, terms=TERMS, synced_terms=None,
+                                track_artists=None):
+    """
+    Build the SpotifyUser field values for a freshly fetched Spotify snapshot.
+
+    Parameters:
+        - user_data: the /me profile returned by get_spotify_user_data
+        - term_items: dictionary with 'tracks_<term>' and 'artists_<term>' lists
+          for each of the fetched terms
+        - terms: the terms that were fetched (all three by default)
+        - synced_terms: the user's previous per-term sync times, kept for terms
+          that were not fetched
+        - track_artists: optional dictionary of term to the enriched artists of its
+          top tracks (artists.get_term_track_artists); those not already among the
+          top artists also count towards the term's genres and quirkiest artists
+
+    Returns:
+        Dictionary of SpotifyUser field names to values (profile, favorites trimmed
+        with project_track/project_artist, genres and quirkiest artists for every
+        fetched term, and sync times).
+    """
+    synced_at = timezone.now()
+    snapshot = {
+        'spotify_id': user_data.get('id'),
+        'email': user_data.get('email'),
+        'profile_image_url': user_data.get('images')[0]['url']
+        if user_data.get('images') else None,
+        'last_synced': synced_at,
+        'synced_terms': {**(synced_terms or {}),
+                         **{term: synced_at.isoformat() for term in terms}},
     }
-    params = {
-        'time_range': timelimit,
-        'limit': 20
+    for term in terms:
+        artists = [project_artist(artist) for artist in term_items[f'artists_{term}']]
+        snapshot[f'favorite_tracks_{term}'] = [project_track(track)
+                                               for track in term_items[f'tracks_{term}']]
+        snapshot[f'favorite_artists_{term}'] = artists
+        scored = artists
+        if track_artists and track_artists.get(term):
+            top_ids = {artist.get('id') for artist in artists}
+            scored = artists + [project_artist(artist) for artist in track_artists[term]
+                                if artist['id'] not in top_ids]
+        snapshot[f'favorite_genres_{term}'] = get_top_genres(scored)
+        snapshot[f'quirkiest_artists_{term}'] = get_quirkiest_artists(scored)
+    return snapshot
+
+def get_stale_terms(spotify_user, ttl=None):
+    """
+    Work out which terms of a user's stored snapshot need fetching again.
+
+    Parameters:
+        - spotify_user: the stored SpotifyUser, or None if there is none yet
+        - ttl: seconds a term stays fresh (defaults to the SPOTIFY_SYNC_TTL setting)
+
+    Returns:
+        List of the terms fetched more than `ttl` seconds ago or never; empty
+        when the whole snapshot is still fresh.
+    """
+    if spotify_user is None:
+        return list(TERMS)
+    ttl = getattr(settings, 'SPOTIFY_SYNC_TTL', 15 * 60) if ttl is None else ttl
+    now = timezone.now()
+    synced_terms = spotify_user.synced_terms or {}
+    stale = []
+    for term in TERMS:
+        synced_at = parse_datetime(synced_terms.get(term) or '')
+        if synced_at is None or (now - synced_at).total_seconds() >= ttl:
+            stale.append(term)
+    return stale
+
+def select_term_data(spotify_user, term_selection):
+    """
+    Pick the stored favorites for the term a user selected for their wrapped.
+
+    Parameters:
+        - spotify_user: the SpotifyUser the wrapped is for
+        - term_selection: '0' (short term), '1' (medium term) or '2' (long term)
+
+    Returns:
+        Dictionary with favorite_artists, favorite_tracks, favorite_genres and
+        quirkiest_artists, or None for an unknown term selection.
+    """
+    match term_selection:
+        case '0':
+            term = 'short'
+        case '1':
+            term = 'medium'
+        case '2':
+            term = 'long'
+        case _:
+            return None
+    return {
+        'favorite_artists': getattr(spotify_user, f'favorite_artists_{term}'),
+        'favorite_tracks': getattr(spotify_user, f'favorite_tracks_{term}'),
+        'favorite_genres': getattr(spotify_user, f'favorite_genres_{term}'),
+        'quirkiest_artists': getattr(spotify_user, f'quirkiest_artists_{term}'),
     }
-    response = requests.get('https://api.spotify.com/v1/me/top/artists',
-                            headers=headers, params=params, timeout=5)
-    return response.json()['items'] if response.status_code == 200 else None
+
+def alternate_lists(list1, list2, count1, count2):
+    """
+    Interleave the first count1 items of list1 with the first count2 items of list2.
+    """
+    combined = []
+    for i in range(max(count1, count2)):
+        if i < count1:
+            combined.append(list1[i])
+        if i < count2:
+            combined.append(list2[i])
+    return combined
+
+def select_duo_term_data(spotify_user1, spotify_user2, term_selection):
+    """
+    Combine two users' favorites for the selected term by alternating between them
+    (three items from the inviting user, two from the invited user).
+
+    Returns:
+        Dictionary like select_term_data, or None for an unknown term selection.
+    """
+    data1 = select_term_data(spotify_user1, term_selection)
+    data2 = select_term_data(spotify_user2, term_selection)
+    if data1 is None:
+        return None
+    return {key: alternate_lists(data1[key], data2[key], 3, 2) for key in data1}
 
 
 def get_top_genres(favorite_artists):
@@ -93,14 +345,11 @@ def get_top_genres(favorite_artists):
     Returns:
         List of the top 3 genres.
     """
-    genres = []
-
-    # Extract genres from each artist
+    # Count the occurrences of each genre, one artist at a time so that
+    # favorite_artists can be a generator such as iter_user_favorite_artists
+    genre_counts = Counter()
     for artist in favorite_artists:
-        genres.extend(artist['genres'])
-
-    # Count the occurrences of each genre
-    genre_counts = Counter(genres)
+        genre_counts.update(artist['genres'])
 
     # Get the top 3 genres
     top_genres = genre_counts.most_common(3)
@@ -119,11 +368,151 @@ def get_quirkiest_artists(favorite_artists):
     Returns:
         A list of the 5 quirkiest artists based on popularity scores.
     """
-    # Sort the artists by popularity (lower scores are quirkier)
-    sorted_artists = sorted(favorite_artists, key=lambda x: x['popularity'])
+    # Keep the 5 lowest popularity scores (lower scores are quirkier) without
+    # sorting or holding the whole list; ties keep their original order
+    return heapq.nsmallest(5, favorite_artists, key=lambda x: x['popularity'])
+
+GROQ_MODEL = "llama3-8b-8192"
+ROAST_SYSTEM_PROMPT = ("You are a music analyst who roasts and insults the user "
+                       "(use 2nd perspective) behavior based on their music tastes"
+                       " in less than 100 words.")
+COMPARISON_SYSTEM_PROMPT = ("You are a music critic who roasts and humorously compares two artists "
+                            "(use 2nd perspective) in less than 100 words. Be witty and sarcastic.")
+
+def description_prompt(favorite_artists):
+    """
+    User prompt for create_groq_description. `favorite_artists` is a name, an artist
+    dict or a list of them, rendered compactly by prompts.render_subject.
+    """
+    return (
+        f"Describe how someone who listens to artists like {render_subject(favorite_artists)} "
+        "tends to act, think, and dress."
+    )
+
+def quirky_prompt(favorite_artists):
+    """User prompt for create_groq_quirky (rendered like description_prompt)."""
+    return (
+        f"Describe how someone who only listens to artists like {render_subject(favorite_artists)} "
+        "just to be quirky and stand out from the crowd tends to act, think, and dress."
+    )
+
+def comparison_prompt(artist_1, artist_2):
+    """User prompt for create_groq_comparison; each artist is a name or an artist dict."""
+    return (
+        f"Compare {render_subject(artist_1)} and {render_subject(artist_2)} "
+        "in a funny and way that roasts both. "
+        "Highlight their differences in style, fanbase, and anything else that makes them opposites."
+    )
+
+def groq_messages(system_prompt, user_prompt):
+    """Build the chat messages sent to Groq for one system/user prompt pair."""
+    return [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": user_prompt
+        }
+    ]
+
+def request_groq_completion(groq_api_key, system_prompt, user_prompt, timeout=None):
+    """
+    Send one chat completion request to Groq over the shared client and return its text.
+    Unlike create_groq_completion it neither caches nor catches API errors.
+    `timeout` (seconds) overrides the client's GROQ_TIMEOUT for this request.
+
+    The call goes through the LLM circuit breaker and the request's time budget (see
+    spotify_data/llm_guard): it raises CircuitOpenError or LLMBudgetExceeded without
+    calling Groq while Groq is failing or the budget is spent, and its timeout is
+    cut to what is left of the budget.
+    """
+    record_prompt(system_prompt, user_prompt)
+    with guarded_call(timeout) as timeout:
+        response = get_groq_client(groq_api_key).chat.completions.create(
+            messages=groq_messages(system_prompt, user_prompt),
+            model=GROQ_MODEL,
+            timeout=timeout,
+        )
+    return response.choices[0].message.content
+
+def create_groq_completion(groq_api_key, system_prompt, user_prompt, label="Description",
+                           timeout=None):
+    """
+    Send one chat completion request to Groq and return the generated text.
+
+    Args:
+        - groq_api_key: API key for Groq
+        - system_prompt: instructions describing the analyst persona
+        - user_prompt: the question about the user's music
+        - label: what is generated, used in the fallback text when the API fails
+        - timeout: seconds to wait for Groq (defaults to GROQ_TIMEOUT)
+
+    Returns:
+        - llama_description: the text constructed by the LLM (possibly from the
+          LLM response cache), or an error message
+    """
+    if not groq_api_key:
+        raise GroqError("GROQ_API_KEY environment variable is not set.")
+
+    # Identical prompts are answered from the LLM response cache, and concurrent
+    # misses for the same prompt share one Groq call
+    try:
+        llama_description = get_llm_cache().get_or_generate(
+            GROQ_MODEL, system_prompt, user_prompt,
+            lambda: request_groq_completion(groq_api_key, system_prompt, user_prompt, timeout))
+    except KeyError as e:
+        llama_description = LLMFallback(f"Key error: {str(e)}")
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        llama_description = llm_error_text(label, e)
+    return llama_description
+
+def stream_groq_completion(groq_api_key, system_prompt, user_prompt, label="Description"):
+    """
+    Generate a completion like create_groq_completion, but yield its text as Groq
+    streams it in, so a caller can relay the first tokens before the rest is written.
 
-    # Return the top 5 quirkiest artists
-    return sorted_artists[:5]
+    A cached completion is yielded whole. Once the stream finishes, the complete text
+    is stored in the LLM response cache (unless it is empty). If Groq fails, before or
+    while streaming, the failure counts against the circuit breaker, the fallback
+    message (an LLMFallback) is yielded as the last piece and nothing is cached;
+    callers show it instead of the pieces that came before it.
+
+    Yields:
+        - pieces of text, in order
+    """
+    if not groq_api_key:
+        raise GroqError("GROQ_API_KEY environment variable is not set.")
+
+    cache = get_llm_cache()
+    cached = cache.get(GROQ_MODEL, system_prompt, user_prompt)
+    if cached is not None:
+        yield cached
+        return
+
+    pieces = []
+    try:
+        record_prompt(system_prompt, user_prompt)
+        with guarded_stream() as call:
+            with timed('groq'):
+                stream = get_groq_client(groq_api_key).chat.completions.create(
+                    messages=groq_messages(system_prompt, user_prompt),
+                    model=GROQ_MODEL,
+                    stream=True,
+                    timeout=call.timeout,
+                )
+            call.opened()
+            for chunk in stream:
+                piece = chunk.choices[0].delta.content if chunk.choices else None
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        yield llm_error_text(label, e)
+        return
+    if pieces:
+        cache.set(GROQ_MODEL, system_prompt, user_prompt, ''.join(pieces))
 
 def create_groq_description(groq_api_key, favorite_artists):
     """
@@ -137,41 +526,37 @@ def create_groq_description(groq_api_key, favorite_artists):
         - llama_description: the description construced by the LLM
 
     """
-    if not groq_api_key:
-        raise GroqError("GROQ_API_KEY environment variable is not set.")
+    return create_groq_completion(groq_api_key, ROAST_SYSTEM_PROMPT,
+                                  description_prompt(favorite_artists))
 
-    client = Groq(api_key=groq_api_key)
-    description_prompt = (
-        f"Describe how someone who listens to artists like {favorite_artists} "
-        "tends to act, think, and dress."
-    )
 
-    try:
-        response = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a music analyst who roasts and insults the user "
-                               "(use 2nd perspective) behavior based on their music tastes"
-                               " in less than 100 words."
-                },
-                {
-                    "role": "user",
-                    "content": description_prompt
-                }
-            ],
-            model="llama3-8b-8192",
-        )
+SPOTIFY_SEVERAL_ARTISTS_URL = "/artists"
+SPOTIFY_MAX_ARTIST_IDS = 50
 
-        llama_description = response.choices[0].message.content
-    except KeyError as e:
-        llama_description = f"Key error: {str(e)}"
-    except Exception as e:
-        llama_description = f"Description unavailable due to API error: {str(e)}"  # pylint: disable=broad-exception-caught
-    return llama_description
+def get_several_artists(access_token, artist_ids):
+    """
+    Fetches full artist objects (with genres and popularity) for up to 50 ids per request
+    through Spotify's several-artists endpoint.
 
+    Parameters:
+        - access_token: the access token associated with the current session
+        - artist_ids: Spotify artist ids, any number of them
 
-SPOTIFY_RECOMMENDATIONS_URL = "https://api.spotify.com/v1/recommendations"
+    Returns:
+        List of artist objects (unknown ids are left out), or None if a request failed.
+    """
+    artist_ids = list(artist_ids)
+    artists = []
+    for start in range(0, len(artist_ids), SPOTIFY_MAX_ARTIST_IDS):
+        chunk = artist_ids[start:start + SPOTIFY_MAX_ARTIST_IDS]
+        response = get_spotify_client().get(SPOTIFY_SEVERAL_ARTISTS_URL, access_token,
+                                            params={'ids': ','.join(chunk)})
+        if response.status_code != 200:
+            return None
+        artists.extend(artist for artist in response.json()['artists'] if artist)
+    return artists
+
+SPOTIFY_RECOMMENDATIONS_URL = "/recommendations"
 
 def get_spotify_recommendations(user_token, seed_artists=None,
                                 seed_tracks=None, seed_genres=None):
@@ -189,10 +574,6 @@ def get_spotify_recommendations(user_token, seed_artists=None,
         list: A list of recommended songs, where each song
         is represented as a dictionary with details.
     """
-    headers = {
-        "Authorization": f"Bearer {user_token}"
-    }
-
     params = {
         "limit": 5,
     }
@@ -205,8 +586,8 @@ def get_spotify_recommendations(user_token, seed_artists=None,
 
 
     try:
-        response = requests.get(SPOTIFY_RECOMMENDATIONS_URL,
-                                headers=headers, params=params, timeout=5)
+        response = get_spotify_client().get(SPOTIFY_RECOMMENDATIONS_URL, user_token,
+                                            params=params)
         response.raise_for_status()
         data = response.json()['tracks']
 
@@ -239,38 +620,8 @@ def create_groq_quirky(groq_api_key, favorite_artists):
         - llama_description: the description construced by the LLM
 
     """
-    if not groq_api_key:
-        raise GroqError("GROQ_API_KEY environment variable is not set.")
-
-    client = Groq(api_key=groq_api_key)
-    description_prompt = (
-        f"Describe how someone who only listens to artists like {favorite_artists} "
-        "just to be quirky and stand out from the crowd tends to act, think, and dress."
-    )
-
-    try:
-        response = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a music analyst who roasts and insults the user "
-                               "(use 2nd perspective) behavior based on their music tastes "
-                               "in less than 100 words."
-                },
-                {
-                    "role": "user",
-                    "content": description_prompt
-                }
-            ],
-            model="llama3-8b-8192",
-        )
-
-        llama_description = response.choices[0].message.content
-    except KeyError as e:
-        llama_description = f"Key error: {str(e)}"
-    except Exception as e:
-        llama_description = f"Description unavailable due to API error: {str(e)}"  # pylint: disable=broad-exception-caught
-    return llama_description
+    return create_groq_completion(groq_api_key, ROAST_SYSTEM_PROMPT,
+                                  quirky_prompt(favorite_artists))
 
 def datetime_to_str(dt):
     """
@@ -298,34 +649,207 @@ def create_groq_comparison(groq_api_key, artist_1, artist_2):
     Returns:
         - llama_description: A funny roasty description of the comparison between the two artists
     """
+    return create_groq_completion(groq_api_key, COMPARISON_SYSTEM_PROMPT,
+                                  comparison_prompt(artist_1, artist_2), label="Comparison")
+
+
+BATCH_SYSTEM_PROMPT = ("You are a music analyst who roasts the user (use 2nd perspective) and "
+                       "the music they listen to. You are given numbered requests; answer each "
+                       "one on its own in less than 100 words. Reply with only a JSON array of "
+                       "strings holding one answer per request, in the same order.")
+
+def batch_prompt(user_prompts):
+    """User prompt asking for every item of a slide in one completion."""
+    return "\n".join(f"{number}. {prompt}" for number, prompt in enumerate(user_prompts, 1))
+
+def parse_batch_response(text, count):
+    """
+    Read the JSON array of answers out of a batched completion.
+
+    Returns:
+        List of `count` strings, or None if the text does not hold such an array.
+    """
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end < start:
+        return None
+    try:
+        answers = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if (not isinstance(answers, list) or len(answers) != count
+            or not all(isinstance(answer, str) and answer.strip() for answer in answers)):
+        return None
+    return answers
+
+def create_groq_batch(groq_api_key, prompts):
+    """
+    Generate the texts for every item of a slide with one completion.
+
+    Items already in the LLM response cache are served from it and the rest are
+    asked for together in a single prompt whose JSON array answer is split back into
+    per-item texts (and cached per item). If the answer cannot be parsed, the
+    remaining items fall back to parallel per-item completions (create_groq_completions).
+
+    Args:
+        - groq_api_key: API key for Groq
+        - prompts: list of (system_prompt, user_prompt, label) tuples, one per item
+
+    Returns:
+        - list of texts in the order of `prompts`
+    """
     if not groq_api_key:
         raise GroqError("GROQ_API_KEY environment variable is not set.")
 
-    client = Groq(api_key=groq_api_key)
-    description_prompt = (
-        f"Compare {artist_1} and {artist_2} in a funny and way that roasts both. "
-        "Highlight their differences in style, fanbase, and anything else that makes them opposites."
-    )
+    cache = get_llm_cache()
+    texts = [cache.get(GROQ_MODEL, system, user) for system, user, _ in prompts]
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if len(missing) > 1:
+        try:
+            answer = request_groq_completion(
+                groq_api_key, BATCH_SYSTEM_PROMPT,
+                batch_prompt([prompts[i][1] for i in missing]))
+            answers = parse_batch_response(answer, len(missing))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Batched completion failed: %s", e)
+            answers = None
+        if answers is not None:
+            for i, text in zip(missing, answers):
+                texts[i] = text
+                cache.set(GROQ_MODEL, prompts[i][0], prompts[i][1], text)
+            missing = []
+
+    for i, text in zip(missing, create_groq_completions(groq_api_key,
+                                                        [prompts[i] for i in missing])):
+        texts[i] = text
+    return texts
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """
+    Return the process-wide thread pool used for concurrent outbound calls.
+    Its size (SPOTIFY_FETCH_WORKERS) bounds how many requests one process has in flight.
+    """
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SPOTIFY_FETCH_WORKERS', 8),
+                    thread_name_prefix='spotify-fetch')
+    return _executor
+
+def run_concurrently(calls, deadline=None):
+    """
+    Run several blocking calls at once on the shared executor and wait for all of them
+    together under a single overall deadline.
 
-    try:
-        response = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a music critic who roasts and humorously compares two artists "
-                               "(use 2nd perspective) in less than 100 words. Be witty and sarcastic."
-                },
-                {
-                    "role": "user",
-                    "content": description_prompt
-                }
-            ],
-            model="llama3-8b-8192",
-        )
+    Parameters:
+        - calls: dictionary mapping a name to a (function, args) or
+          (function, args, kwargs) tuple
+        - deadline: seconds to wait for every call to finish (None waits forever)
 
-        llama_description = response.choices[0].message.content
-    except KeyError as e:
-        llama_description = f"Key error: {str(e)}"
-    except Exception as e:
-        llama_description = f"Comparison unavailable due to API error: {str(e)}"  # pylint: disable=broad-exception-caught
-    return llama_description
+    Returns:
+        Dictionary mapping each name to its result. Calls that raised or did not
+        finish before the deadline map to None.
+    """
+    futures = {}
+    for name, call in calls.items():
+        # Each call runs in a copy of the caller's context (e.g. its request priority)
+        context = contextvars.copy_context()
+        futures[name] = get_executor().submit(context.run, call[0], *call[1],
+                                              **(call[2] if len(call) > 2 else {}))
+    wait(futures.values(), timeout=deadline)
+
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            logger.warning("%s did not finish within %s seconds", name, deadline)
+            results[name] = None
+        elif future.exception() is not None:
+            logger.warning("%s failed: %s", name, future.exception())
+            results[name] = None
+        else:
+            results[name] = future.result()
+    return results
+
+_llm_executor = None
+
+def get_llm_executor():
+    """
+    Return the process-wide thread pool for parallel Groq completions. Its size
+    (GROQ_MAX_CONCURRENCY) caps how many completions one process has in flight.
+    """
+    global _llm_executor  # pylint: disable=global-statement
+    if _llm_executor is None:
+        with _executor_lock:
+            if _llm_executor is None:
+                _llm_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'GROQ_MAX_CONCURRENCY', 5),
+                    thread_name_prefix='groq-completion')
+    return _llm_executor
+
+class LLMFallback(str):
+    """
+    A message shown in place of a completion that failed (API, key or timeout error).
+    The views use it as the plain string it is; is_llm_fallback tells it apart from
+    LLM output so that it is never cached or stored.
+    """
+
+def llm_error_text(label, error):
+    """Text shown for an item whose completion failed with `error`."""
+    return LLMFallback(f"{label} unavailable due to API error: {str(error)}")
+
+def llm_timeout_text(label):
+    """Text shown for an item whose completion did not finish before the slide deadline."""
+    return LLMFallback(f"{label} unavailable: the response took too long.")
+
+def is_llm_fallback(text):
+    """Whether `text` is a fallback message (an LLMFallback) rather than LLM output."""
+    return isinstance(text, LLMFallback)
+
+def create_groq_completions(groq_api_key, prompts, call_timeout=None, deadline=None):
+    """
+    Run one create_groq_completion per item in parallel and return the texts in item order.
+
+    At most GROQ_MAX_CONCURRENCY completions run at once, each waits at most
+    `call_timeout` seconds for Groq (GROQ_CALL_TIMEOUT) and the whole slide at most
+    `deadline` seconds (GROQ_SLIDE_DEADLINE), so a slide takes about as long as its
+    slowest item rather than the sum of all of them.
+
+    Args:
+        - groq_api_key: API key for Groq
+        - prompts: list of (system_prompt, user_prompt, label) tuples, one per item
+
+    Returns:
+        - list of texts in the order of `prompts`; items that missed the deadline
+          get llm_timeout_text
+    """
+    if not groq_api_key:
+        raise GroqError("GROQ_API_KEY environment variable is not set.")
+    if call_timeout is None:
+        call_timeout = getattr(settings, 'GROQ_CALL_TIMEOUT', 15)
+    if deadline is None:
+        deadline = getattr(settings, 'GROQ_SLIDE_DEADLINE', 25)
+    if remaining_budget() is not None:
+        deadline = min(deadline, remaining_budget())
+
+    futures = [
+        get_llm_executor().submit(contextvars.copy_context().run, create_groq_completion,
+                                  groq_api_key, system, user, label, call_timeout)
+        for system, user, label in prompts
+    ]
+    wait(futures, timeout=deadline)
+
+    texts = []
+    for (_, _, label), future in zip(prompts, futures):
+        if future.done() and future.exception() is None:
+            texts.append(future.result())
+        else:
+            future.cancel()
+            logger.warning("%s completion did not finish within %s seconds", label, deadline)
+            texts.append(llm_timeout_text(label))
+    return texts
@@ -3,18 +3,21 @@ Views for managing Spotify user data, including updating user profiles,
 fetching favorite tracks and artists, and generating dynamic descriptions using Groq API.
 """
 
-import os
-from dotenv import load_dotenv  # Third-party imports
-from rest_framework import viewsets
+from rest_framework import viewsets  # Third-party imports
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import HttpResponse
 from accounts.models import SpotifyToken  # Local imports
+from .artists import get_term_track_artists
 from .utils import (get_spotify_user_data, get_user_favorite_artists,
                     get_user_favorite_tracks,
-                    get_top_genres, get_quirkiest_artists,
                     create_groq_description,
-                    create_groq_quirky, create_groq_comparison)
+                    run_concurrently, build_spotify_user_snapshot,
+                    TERMS, get_stale_terms,
+                    select_term_data, select_duo_term_data)
+from .slides import get_slide_texts, schedule_slide_texts, stream_slide_events
+from .timing import timed
 from .models import Song, SpotifyUser, SpotifyWrapped, DuoWrapped
 from .serializers import (SongSerializer, SpotifyUserSerializer,
                           DuoWrappedSerializer, SpotifyWrappedSerializer)
@@ -51,51 +54,42 @@ def update_or_add_spotify_user(request):
     except ObjectDoesNotExist:
         return HttpResponse("User add/update failed: missing access token", status=500)
 
-    access_token = token_entry.access_token
+    # Serve the stored snapshot while every term is still fresh, unless ?force=true
+    spotify_user = SpotifyUser.objects.filter(user=user).first()  # pylint: disable=no-member
+    force = request.GET.get('force') in ('1', 'true')
+    terms = list(TERMS) if force else get_stale_terms(spotify_user)
+    if not terms:
+        with timed('serialize'):
+            return JsonResponse({'spotify_user': SpotifyUserSerializer(spotify_user).data})
 
-    # Fetch user data from Spotify API
-    user_data = get_spotify_user_data(access_token)
+    access_token = token_entry.access_token
 
-    if user_data:
+    # Fetch the profile and the stale top-items lists from Spotify API at once
+    term_calls = {}
+    for term in terms:
+        term_args = (access_token, f'{term}_term', user.username)
+        term_calls[f'tracks_{term}'] = (get_user_favorite_tracks, term_args)
+        term_calls[f'artists_{term}'] = (get_user_favorite_artists, term_args)
+    results = run_concurrently(
+        {'user_data': (get_spotify_user_data, (access_token,)), **term_calls},
+        deadline=getattr(settings, 'SPOTIFY_FETCH_DEADLINE', 10))
+    user_data = results['user_data']
+
+    if user_data and all(results[name] is not None for name in term_calls):
+        synced_terms = spotify_user.synced_terms if spotify_user else None
+        track_artists = get_term_track_artists(access_token, results, terms)
         # Update or create the SpotifyUser
-        tracks_short = get_user_favorite_tracks(access_token, 'short_term')
-        tracks_medium = get_user_favorite_tracks(access_token, 'medium_term')
-        tracks_long = get_user_favorite_tracks(access_token, 'long_term')
-        artists_short = get_user_favorite_artists(access_token, 'short_term')
-        artists_medium = get_user_favorite_artists(access_token, 'medium_term')
-        artists_long = get_user_favorite_artists(access_token, 'long_term')
-        genres_short = get_top_genres(artists_short)
-        genres_medium = get_top_genres(artists_medium)
-        genres_long = get_top_genres(artists_long)
-        quirky_short = get_quirkiest_artists(artists_short)
-        quirky_medium = get_quirkiest_artists(artists_medium)
-        quirky_long = get_quirkiest_artists(artists_long)
-        #llama_description = get_groq_description(groq_api_key, artists_long)
-        # this has been added for demonstration purposes
         spotify_user, created = SpotifyUser.objects.update_or_create(  # pylint: disable=no-member
             spotify_id=user_data['id'],
             defaults={
                 'user': user,
-                'spotify_id': user_data.get('id'),
                 'display_name': user.username,
-                'email': user_data.get('email'),
-                'profile_image_url': user_data.get('images')[0]['url']
-                if user_data.get('images') else None,
-                'favorite_tracks_short': tracks_short,
-                'favorite_tracks_medium': tracks_medium,
-                'favorite_tracks_long': tracks_long,
-                'favorite_artists_short': artists_short,
-                'favorite_artists_medium': artists_medium,
-                'favorite_artists_long': artists_long,
-                'favorite_genres_short': genres_short,
-                'favorite_genres_medium': genres_medium,
-                'favorite_genres_long': genres_long,
-                'quirkiest_artists_short': quirky_short,
-                'quirkiest_artists_medium': quirky_medium,
-                'quirkiest_artists_long': quirky_long
+                **build_spotify_user_snapshot(user_data, results, terms, synced_terms,
+                                              track_artists)
             }
         )
-        return JsonResponse({'spotify_user': SpotifyUserSerializer(spotify_user).data})
+        with timed('serialize'):
+            return JsonResponse({'spotify_user': SpotifyUserSerializer(spotify_user).data})
 
 
     return JsonResponse({'error': 'Could not fetch user data from Spotify'}, status=500)
@@ -107,45 +101,25 @@ def add_spotify_wrapped(request):
         - request: incoming web request.
         - term_selection: short_term, medium_term, or long_term. User-selected.
     """
-    load_dotenv()
-    groq_api_key = os.getenv('GROQ_API_KEY')
+    groq_api_key = settings.GROQ_API_KEY
     term_selection = request.GET.get('termselection')
     user = request.user
     spotify_user = SpotifyUser.objects.get(display_name=user.username) # pylint: disable=no-member
-    favorite_artists = None
-    favorite_tracks = None
-    favorite_genres = None
-    quirkiest_artists = None
-    match term_selection:
-        case '0':
-            favorite_artists = spotify_user.favorite_artists_short
-            favorite_tracks = spotify_user.favorite_tracks_short
-            favorite_genres = spotify_user.favorite_genres_short
-            quirkiest_artists = spotify_user.quirkiest_artists_short
-        case '1':
-            favorite_artists = spotify_user.favorite_artists_medium
-            favorite_tracks = spotify_user.favorite_tracks_medium
-            favorite_genres = spotify_user.favorite_genres_medium
-            quirkiest_artists = spotify_user.quirkiest_artists_medium
-        case '2':
-            favorite_artists = spotify_user.favorite_artists_long
-            favorite_tracks = spotify_user.favorite_tracks_long
-            favorite_genres = spotify_user.favorite_genres_long
-            quirkiest_artists = spotify_user.quirkiest_artists_long
-    if favorite_artists is None:
+    term_data = select_term_data(spotify_user, term_selection)
+    if term_data is None:
         return HttpResponse("Bad term selection", status=400)
     wrapped = SpotifyWrapped.objects.create(  # pylint: disable=no-member
         user=spotify_user.display_name,
-        favorite_artists=favorite_artists,
-        favorite_tracks=favorite_tracks,
-        favorite_genres=favorite_genres,
-        quirkiest_artists=quirkiest_artists,
-        llama_description=create_groq_description(groq_api_key, favorite_artists),
+        **term_data,
+        llama_description=create_groq_description(groq_api_key, term_data['favorite_artists']),
         llama_songrecs=["placeholder1", "placeholder2", "placeholder3"],)
 
-    wrapped_data = SpotifyWrappedSerializer(wrapped).data
+    with timed('serialize'):
+        wrapped_data = SpotifyWrappedSerializer(wrapped).data
     spotify_user.past_roasts.append(wrapped_data)
     spotify_user.save(update_fields=['past_roasts'])
+    # Generate every slide's text now so the display endpoints only read it
+    schedule_slide_texts(SpotifyWrapped, wrapped_data, is_duo=False)
     return JsonResponse({'spotify_wrapped': wrapped_data})
 
 
@@ -157,8 +131,7 @@ def add_duo_wrapped(request):
         - user2: display name of invited user.
         - term_selection: short_term, medium_term, or long_term. Selected by user1.
     """
-    load_dotenv()
-    groq_api_key = os.getenv('GROQ_API_KEY')
+    groq_api_key = settings.GROQ_API_KEY
     user1 = request.GET.get('user1')
     user2 = request.GET.get('user2')
     term_selection = request.GET.get('termselection')
@@ -169,76 +142,31 @@ def add_duo_wrapped(request):
     except SpotifyUser.DoesNotExist:  # pylint: disable=no-member
         return HttpResponse("User display name not found", status=500)
 
-    favorite_artists = None
-    favorite_tracks = None
-    favorite_genres = None
-    quirkiest_artists = None
-
-    # Helper function to alternate between two lists
-    def alternate_lists(list1, list2, count1, count2):
-        combined = []
-        for i in range(max(count1, count2)):
-            if i < count1:
-                combined.append(list1[i])
-            if i < count2:
-                combined.append(list2[i])
-        return combined
-
-    match term_selection:
-        case '0':
-            favorite_artists = alternate_lists(
-                spotify_user1.favorite_artists_short, spotify_user2.favorite_artists_short, 3, 2)
-            favorite_tracks = alternate_lists(
-                spotify_user1.favorite_tracks_short, spotify_user2.favorite_tracks_short, 3, 2)
-            favorite_genres = alternate_lists(
-                spotify_user1.favorite_genres_short, spotify_user2.favorite_genres_short, 3, 2)
-            quirkiest_artists = alternate_lists(
-                spotify_user1.quirkiest_artists_short, spotify_user2.quirkiest_artists_short, 3, 2)
-        case '1':
-            favorite_artists = alternate_lists(
-                spotify_user1.favorite_artists_medium, spotify_user2.favorite_artists_medium, 3, 2)
-            favorite_tracks = alternate_lists(
-                spotify_user1.favorite_tracks_medium, spotify_user2.favorite_tracks_medium, 3, 2)
-            favorite_genres = alternate_lists(
-                spotify_user1.favorite_genres_medium, spotify_user2.favorite_genres_medium, 3, 2)
-            quirkiest_artists = alternate_lists(
-                spotify_user1.quirkiest_artists_medium, spotify_user2.quirkiest_artists_medium, 3, 2)
-        case '2':
-            favorite_artists = alternate_lists(
-                spotify_user1.favorite_artists_long, spotify_user2.favorite_artists_long, 3, 2)
-            favorite_tracks = alternate_lists(
-                spotify_user1.favorite_tracks_long, spotify_user2.favorite_tracks_long, 3, 2)
-            favorite_genres = alternate_lists(
-                spotify_user1.favorite_genres_long, spotify_user2.favorite_genres_long, 3, 2)
-            quirkiest_artists = alternate_lists(
-                spotify_user1.quirkiest_artists_long, spotify_user2.quirkiest_artists_long, 3, 2)
-
-    if favorite_artists is None:
+    term_data = select_duo_term_data(spotify_user1, spotify_user2, term_selection)
+    if term_data is None:
         return HttpResponse("Bad term selection", status=400)
 
     wrapped = DuoWrapped.objects.create(  # pylint: disable=no-member
         user=spotify_user1.display_name,
         user2=spotify_user2.display_name,
-        favorite_artists=favorite_artists,
-        favorite_tracks=favorite_tracks,
-        quirkiest_artists=quirkiest_artists,
-        favorite_genres=favorite_genres,
-        llama_description=create_groq_description(groq_api_key, favorite_artists),
+        **term_data,
+        llama_description=create_groq_description(groq_api_key, term_data['favorite_artists']),
         llama_songrecs='none'
     )
 
-    wrapped_data = DuoWrappedSerializer(wrapped).data
+    with timed('serialize'):
+        wrapped_data = DuoWrappedSerializer(wrapped).data
     spotify_user1.past_roasts.append(wrapped_data)
     spotify_user1.save(update_fields=['past_roasts'])
     spotify_user2.past_roasts.append(wrapped_data)
     spotify_user2.save(update_fields=['past_roasts'])
+    schedule_slide_texts(DuoWrapped, wrapped_data, is_duo=True)
 
     print(wrapped.id)
     return JsonResponse({'duo_wrapped': wrapped_data})
 
 def display_artists(request):
     """Displays artists for the frontend depending on the timeframe"""
-    load_dotenv()
     id = request.GET.get('id')
     is_duo = request.GET.get('isDuo')
     if is_duo == 'true':
@@ -257,37 +185,27 @@ def display_artists(request):
     # Assume artists are limited to top 5 as per the original code
     artists = wrapped_data['favorite_artists'][:5]
 
+    # Texts stored at wrap creation (or one batched completion if they are missing)
+    descriptions = get_slide_texts(settings.GROQ_API_KEY, wrapped_data, is_duo == 'true',
+                                   'artists')
     out = []
-    for i, artist in enumerate(artists):
-        artist_info = {
+    for artist, desc in zip(artists, descriptions):
+        out.append({
             'name': artist['name'],
             'image': artist['images'][0]['url'],
-            'desc': create_groq_description(os.getenv('GROQ_API_KEY'), artist['name']),
-        }
-        if is_duo == 'true':
-        # Add comparison with the next artist if it exists
-            if i + 1 < len(artists):
-                next_artist = artists[i + 1]
-                comparison = create_groq_comparison(
-                    os.getenv('GROQ_API_KEY'),
-                    {'name': artist['name'], 'popularity': artist.get('popularity', 0)},
-                    {'name': next_artist['name'], 'popularity': next_artist.get('popularity', 0)}
-                )
-                artist_info['desc'] = comparison
-
-        out.append(artist_info)
+            'desc': desc,
+        })
 
     return JsonResponse(out, safe=False, status=200)
 
 def display_genres(request):
     '''Displays the genres for the frontend depending on the timeframe'''
-    load_dotenv()
     id = request.GET.get('id')
     is_duo = request.GET.get('isDuo')
 
     if is_duo == 'true':
         try:
-            wrapped_data = DuoWrapped.objects.get(id=id)
+            wrapped_data = DuoWrapped.objects.filter(id=id).values()
         except ObjectDoesNotExist:
             return HttpResponse("Wrapped grab failed: no data", status=500)
     else:
@@ -300,13 +218,13 @@ def display_genres(request):
 
     out = {
         'genres': ', '.join(genres),
-        'desc': create_groq_description(os.getenv('GROQ_API_KEY'), ', '.join(genres))
+        'desc': get_slide_texts(settings.GROQ_API_KEY, wrapped_data, is_duo == 'true',
+                                'genres')[0]
     }
     return JsonResponse(out, safe=False, status=200)
 
 def display_songs(request):
     """Displays the songs for the frontend depending on the timeframe."""
-    load_dotenv()
     id = request.GET.get('id')
     is_duo = request.GET.get('isDuo')
 
@@ -324,33 +242,22 @@ def display_songs(request):
     # Get the top 5 tracks
     tracks = wrapped_data['favorite_tracks'][:5]
 
+    # Texts stored at wrap creation (or one batched completion if they are missing)
+    descriptions = get_slide_texts(settings.GROQ_API_KEY, wrapped_data, is_duo == 'true',
+                                   'songs')
     out = []
-    for i, track in enumerate(tracks):
-        artist_info = {
+    for track, desc in zip(tracks, descriptions):
+        out.append({
             'name': track['name'],
             'artist': track['artists'][0]['name'],
             'image': track['album']['images'][0]['url'],
-            'desc': create_groq_description(os.getenv('GROQ_API_KEY'),
-                                            track['name'] + ' by ' + track['artists'][0]['name'])
-        }
-
-        # Add duo comparison logic
-        if is_duo == 'true' and i + 1 < len(tracks):
-            next_track = tracks[i + 1]
-            comparison = create_groq_comparison(
-                os.getenv('GROQ_API_KEY'),
-                track['name'] + " by " + track['artists'][0]['name'],
-                next_track['name'] + " by " + next_track['artists'][0]['name'],
-            )
-            artist_info['desc'] = comparison
-
-        out.append(artist_info)
+            'desc': desc,
+        })
 
     return JsonResponse(out, safe=False, status=200)
 
 def display_quirky(request):
     '''Displays the songs for the frontend depending on the timeframe'''
-    load_dotenv()
     id = request.GET.get('id')
 
     is_duo = request.GET.get('isDuo')
@@ -366,18 +273,47 @@ def display_quirky(request):
         except ObjectDoesNotExist:
             return HttpResponse("Wrapped grab failed: no data", status=500)
     wrapped_data = list(wrapped_data)[0]
-    tracks = wrapped_data['quirkiest_artists'][:5]
-    out = []
-    for track in tracks:
-        out.append(track['name'])
-
-    desc = create_groq_quirky(os.getenv('GROQ_API_KEY'),
-                                            ', '.join(out))
+    desc = get_slide_texts(settings.GROQ_API_KEY, wrapped_data, is_duo == 'true', 'quirky')[0]
     return JsonResponse(desc, safe=False, status=200)
 
+def _stream_slide(request, slide):
+    """
+    Stream a slide's items and texts as server-sent events (see
+    slides.stream_slide_events), so the page can show Groq's first tokens instead of
+    waiting for the complete texts.
+    """
+    id = request.GET.get('id')
+    is_duo = request.GET.get('isDuo') == 'true'
+    model = DuoWrapped if is_duo else SpotifyWrapped
+    wrapped_data = list(model.objects.filter(id=id).values())  # pylint: disable=no-member
+    if not wrapped_data:
+        return HttpResponse("Wrapped grab failed: no data", status=500)
+
+    response = StreamingHttpResponse(
+        stream_slide_events(settings.GROQ_API_KEY, wrapped_data[0], is_duo, slide),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the events
+    return response
+
+def stream_artists(request):
+    """Streaming display_artists: one `item` event per artist, then its text token by token."""
+    return _stream_slide(request, 'artists')
+
+def stream_songs(request):
+    """Streaming display_songs: one `item` event per track, then its text token by token."""
+    return _stream_slide(request, 'songs')
+
+def stream_genres(request):
+    """Streaming display_genres: the genres as an `item` event, then the text token by token."""
+    return _stream_slide(request, 'genres')
+
+def stream_quirky(request):
+    """Streaming display_quirky: the roast of the quirkiest artists token by token."""
+    return _stream_slide(request, 'quirky')
+
 def display_summary(request):
     '''Displays a summary of a users music taste'''
-    load_dotenv()
     id = request.GET.get('id')
 
     is_duo = request.GET.get('isDuo')
@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
+from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# .env is read once here rather than on every request
+load_dotenv()
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -41,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "spotify_data.timing.ServerTimingMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -49,6 +56,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "spotify_data.llm_guard.LLMBudgetMiddleware",
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -158,3 +166,136 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Spotify, Groq and LLM integration (spotify_data)
+
+# Spotify Web API client (spotify_data/spotify_client.py). The base URLs can point at
+# another server speaking Spotify's API, e.g. the local stand-in (manage.py run_spotify_standin)
+SPOTIFY_API_BASE_URL = os.getenv('SPOTIFY_API_BASE_URL', 'https://api.spotify.com/v1')
+SPOTIFY_ACCOUNTS_BASE_URL = os.getenv('SPOTIFY_ACCOUNTS_BASE_URL', 'https://accounts.spotify.com')
+SPOTIFY_API_POOL_SIZE = 20
+SPOTIFY_API_CONNECT_TIMEOUT = 3.05
+SPOTIFY_API_READ_TIMEOUT = 5
+# How many top tracks/artists are read per term (paged 50 at a time)
+SPOTIFY_TOP_ITEMS_LIMIT = 20
+# Worker threads for concurrent Spotify fetches, and the overall wait for one fan-out
+SPOTIFY_FETCH_WORKERS = 8
+SPOTIFY_FETCH_DEADLINE = 10
+# updateuser serves the stored snapshot for terms fetched within the last
+# SPOTIFY_SYNC_TTL seconds instead of asking Spotify again (?force=true always refetches)
+SPOTIFY_SYNC_TTL = 15 * 60
+# prewarm_spotify_users: users who logged in within SPOTIFY_PREWARM_ACTIVE_DAYS are synced
+# SPOTIFY_PREWARM_BATCH_SIZE at a time, waiting at most SPOTIFY_PREWARM_DEADLINE per batch;
+# with --loop a pass starts every SPOTIFY_PREWARM_INTERVAL seconds
+SPOTIFY_PREWARM_ACTIVE_DAYS = 7
+SPOTIFY_PREWARM_BATCH_SIZE = 10
+SPOTIFY_PREWARM_DEADLINE = 60
+SPOTIFY_PREWARM_INTERVAL = 5 * 60
+# Artist metadata (spotify_data/artists.py) is refetched once older than this many seconds
+SPOTIFY_ARTIST_METADATA_TTL = 7 * 24 * 60 * 60
+# Conditional-request (ETag) cache for top-items responses (spotify_data/response_cache.py):
+# served without a request while fresh, served and revalidated in the background while
+# stale, then revalidated with If-None-Match. Entries are kept for SPOTIFY_CACHE_TIMEOUT.
+SPOTIFY_CACHE_ALIAS = 'default'
+SPOTIFY_CACHE_FRESH_SECONDS = 0
+SPOTIFY_CACHE_STALE_SECONDS = 60
+SPOTIFY_CACHE_TIMEOUT = 24 * 60 * 60
+# Token bucket shared by every worker process through a locked state file
+# (spotify_data/ratelimit.py). Callers wait at most SPOTIFY_RATE_LIMIT_MAX_WAIT seconds
+# for a slot, and a 429 is retried after its Retry-After up to SPOTIFY_RATE_LIMIT_RETRIES times.
+# LOW-priority callers in any process (prewarm_spotify_users) leave the last
+# SPOTIFY_RATE_LIMIT_LOW_PRIORITY_HEADROOM tokens to user-facing requests.
+SPOTIFY_RATE_LIMIT_PER_SECOND = 10
+SPOTIFY_RATE_LIMIT_BURST = 20
+SPOTIFY_RATE_LIMIT_LOW_PRIORITY_HEADROOM = 5
+SPOTIFY_RATE_LIMIT_STATE_FILE = os.path.join(tempfile.gettempdir(), 'spotify_ratelimit.json')
+SPOTIFY_RATE_LIMIT_MAX_WAIT = 30
+SPOTIFY_RATE_LIMIT_RETRIES = 2
+
+# Groq completions are cached under a hash of (model, system prompt, user prompt)
+# (spotify_data/llm_cache.py). LLM_CACHE_BACKEND is 'db' (LLMResponse table), 'file'
+# (one JSON file per entry in LLM_CACHE_DIR) or None to disable the cache.
+LLM_CACHE_BACKEND = 'db'
+LLM_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'spotify_wrapper_llm_cache')
+LLM_CACHE_TTL = 7 * 24 * 60 * 60
+LLM_CACHE_MAX_ENTRIES = 10000
+# A hit records its use at most once per LLM_CACHE_TOUCH_INTERVAL seconds, and the
+# cache is trimmed to LLM_CACHE_MAX_ENTRIES once every LLM_CACHE_EVICT_EVERY stores
+LLM_CACHE_TOUCH_INTERVAL = 60 * 60
+LLM_CACHE_EVICT_EVERY = 100
+# Hot entries are regenerated shortly before they expire ("XFetch"); a higher
+# LLM_CACHE_XFETCH_BETA refreshes earlier, 0 turns it off. Concurrent misses for one
+# prompt share a single Groq call; across processes the generating one holds a lease
+# file in LLM_SINGLE_FLIGHT_LOCK_DIR (abandoned after LLM_SINGLE_FLIGHT_LEASE seconds)
+# and the others poll the cache every LLM_SINGLE_FLIGHT_POLL_INTERVAL seconds, for at
+# most LLM_SINGLE_FLIGHT_LOCK_TIMEOUT seconds (and never past the request's LLM budget).
+LLM_CACHE_XFETCH_BETA = 1.0
+LLM_SINGLE_FLIGHT_LOCK_DIR = os.path.join(tempfile.gettempdir(), 'spotify_wrapper_llm_locks')
+LLM_SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+LLM_SINGLE_FLIGHT_LEASE = 60
+LLM_SINGLE_FLIGHT_POLL_INTERVAL = 0.1
+
+# Groq (spotify_data/groq_client.py). Completions in a process share one keep-alive pool
+# of GROQ_POOL_SIZE connections.
+GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+# Another server speaking Groq's API, e.g. the local stand-in (manage.py run_llm_standin)
+GROQ_BASE_URL = os.getenv('GROQ_BASE_URL')
+GROQ_POOL_SIZE = 10
+GROQ_TIMEOUT = 30
+# Per-item completions of one slide run in parallel: at most GROQ_MAX_CONCURRENCY at once,
+# each waiting GROQ_CALL_TIMEOUT seconds, the whole slide GROQ_SLIDE_DEADLINE seconds
+GROQ_MAX_CONCURRENCY = 5
+GROQ_CALL_TIMEOUT = 15
+GROQ_SLIDE_DEADLINE = 25
+# The text of every slide is generated when a wrapped is created and stored on it,
+# on SLIDE_TEXTS_WORKERS background threads unless SLIDE_TEXTS_IN_BACKGROUND is False
+SLIDE_TEXTS_IN_BACKGROUND = True
+SLIDE_TEXTS_WORKERS = 2
+# Display views that arrive while the background job runs poll the wrapped's row every
+# SLIDE_TEXTS_POLL_INTERVAL seconds, until SLIDE_TEXTS_WAIT seconds after the job started
+# (and never past the request's LLM_REQUEST_BUDGET, which the wait uses up)
+SLIDE_TEXTS_WAIT = 15
+SLIDE_TEXTS_POLL_INTERVAL = 0.25
+
+# Shared descriptions of single artists and tracks (spotify_data/entities.py) are
+# regenerated after ENTITY_DESCRIPTION_TTL seconds; warm_entity_descriptions describes
+# the ENTITY_DESCRIPTION_WARM_TOP most common artists and tracks ahead of time.
+ENTITY_DESCRIPTION_TTL = 30 * 24 * 60 * 60
+ENTITY_DESCRIPTION_WARM_TOP = 500
+
+# Groq circuit breaker and time budget (spotify_data/llm_guard.py). The breaker opens
+# once LLM_BREAKER_FAILURE_RATE of the calls in the last LLM_BREAKER_WINDOW seconds
+# (at least LLM_BREAKER_MIN_CALLS of them) failed or took over LLM_BREAKER_SLOW_CALL
+# seconds, and then fails calls fast for LLM_BREAKER_OPEN_SECONDS. All Groq calls of
+# one request share LLM_REQUEST_BUDGET seconds; a streamed slide gets its own, from its
+# first event on.
+LLM_BREAKER_WINDOW = 30
+LLM_BREAKER_MIN_CALLS = 5
+LLM_BREAKER_FAILURE_RATE = 0.5
+LLM_BREAKER_SLOW_CALL = 10
+LLM_BREAKER_OPEN_SECONDS = 30
+LLM_REQUEST_BUDGET = 20
+
+# What goes into a Groq prompt (spotify_data/prompts.py): at most LLM_PROMPT_MAX_ITEMS
+# artists, rendered as names plus genres and popularity, in LLM_PROMPT_MAX_CHARS characters
+LLM_PROMPT_MAX_ITEMS = 10
+LLM_PROMPT_MAX_CHARS = 1000
+
+# Per-request timing breakdown (spotify_data/timing.py): SERVER_TIMING_SAMPLE_RATE of the
+# requests (1% by default, 1.0 to profile every one) are timed and logged on
+# spotify_data.timing. Timed responses get a Server-Timing header only with DEBUG on or
+# SERVER_TIMING_HEADER=True, since it tells clients how long the DB and the APIs took
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE', '0.01'))
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'spotify_data.timing': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}